@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+loadtest.py - Throughput and latency of the sync, threaded and async clients
+over replayed traffic.
+
+Requests are answered by a ``ReplayTransport`` with the injected latency and
+failure rate given on the command line, so runs are repeatable for a given
+seed and never touch the exchange.  Traffic is replayed from the test
+fixtures unless a recorded session is given with ``--replay``; ``--record``
+records a session against the local HTTPS stand-in.
+
+Run from the repository root::
+
+    python benchmarks/loadtest.py [--requests 2000] [--concurrency 16]
+        [--latency 20] [--jitter 5] [--error-rate 0.01] [--retry]
+    python benchmarks/loadtest.py --record session.jsonl
+    python benchmarks/loadtest.py --replay session.jsonl
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from coinspot import AsyncCoinSpot, CoinSpot, CoinSpotError, RetryPolicy  # noqa: E402
+from coinspot.metrics import LatencyHistogram  # noqa: E402
+from coinspot.replay import (  # noqa: E402
+    AsyncReplayTransport,
+    RecordingTransport,
+    ReplayTransport,
+    from_fixtures,
+    load,
+)
+from coinspot.transport import ConnectionPool  # noqa: E402
+import fixtures  # noqa: E402
+
+# the calls each run cycles through, as (method, arguments)
+WORKLOAD = (
+    ("spot", ()),
+    ("orders", ("DOGE",)),
+    ("spot", ()),
+    ("orderhistory", ("DOGE",)),
+    ("balances", ()),
+    ("myorders", ()),
+)
+
+
+def calls(count):
+    return [WORKLOAD[i % len(WORKLOAD)] for i in range(count)]
+
+
+def timed(client, method, args, histogram, errors):
+    started = time.perf_counter()
+    try:
+        getattr(client, method)(*args)
+    except CoinSpotError:
+        errors.append(method)
+    histogram.record(time.perf_counter() - started)
+
+
+async def timed_async(client, method, args, histogram, errors, semaphore):
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            await getattr(client, method)(*args)
+        except CoinSpotError:
+            errors.append(method)
+        histogram.record(time.perf_counter() - started)
+
+
+def timed_all(client, workload):
+    histogram, errors = LatencyHistogram(), []
+    for method, args in workload:
+        timed(client, method, args, histogram, errors)
+    return histogram, errors
+
+
+def run_sync(make_client, workload, concurrency):
+    return timed_all(make_client(ReplayTransport), workload)
+
+
+def run_threaded(make_client, workload, concurrency):
+    # each thread records into its own histogram, merged once they finish,
+    # since a histogram is not safe to share between threads
+    client = make_client(ReplayTransport)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(timed_all, client, workload[share::concurrency])
+            for share in range(concurrency)
+        ]
+        # result() raises what a worker raised instead of hiding it
+        results = [future.result() for future in futures]
+    histogram, errors = LatencyHistogram(), []
+    for share_histogram, share_errors in results:
+        histogram.merge(share_histogram)
+        errors.extend(share_errors)
+    return histogram, errors
+
+
+def run_async(make_client, workload, concurrency):
+    histogram, errors = LatencyHistogram(), []
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        async with make_client(AsyncReplayTransport, AsyncCoinSpot) as client:
+            await asyncio.gather(
+                *[
+                    timed_async(client, method, args, histogram, errors, semaphore)
+                    for method, args in workload
+                ]
+            )
+
+    asyncio.run(run())
+    return histogram, errors
+
+
+def record(filename, requests):
+    from standin import StandInServer
+
+    with StandInServer() as server:
+        recorder = RecordingTransport(
+            ConnectionPool(server.endpoint, context=server.client_context)
+        )
+        client = CoinSpot(transport=recorder)
+        for method, args in calls(requests):
+            getattr(client, method)(*args)
+        recorder.clear()
+    recorder.save(filename)
+    print("recorded %d exchanges to %s" % (len(recorder.exchanges), filename))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=20.0, help="mean ms per request")
+    parser.add_argument("--jitter", type=float, default=5.0, help="standard deviation in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retry", action="store_true", help="retry failed reads")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--replay", metavar="FILE", help="replay a recorded session")
+    parser.add_argument("--record", metavar="FILE", help="record a session to FILE and exit")
+    parser.add_argument("--modes", default="sync,threaded,async")
+    options = parser.parse_args()
+
+    if options.record:
+        record(options.record, len(WORKLOAD))
+        return
+
+    exchanges = load(options.replay) if options.replay else from_fixtures(fixtures.calls())
+    workload = calls(options.requests)
+
+    def make_client(transport_class, client_class=CoinSpot):
+        jitter = random.Random(options.seed)
+        mean, deviation = options.latency / 1000.0, options.jitter / 1000.0
+        transport = transport_class(
+            exchanges,
+            latency=lambda: max(0.0, jitter.gauss(mean, deviation)),
+            error_rate=options.error_rate,
+            seed=options.seed,
+        )
+        retry = RetryPolicy(base=0.01) if options.retry else None
+        return client_class(transport=transport, retry=retry)
+
+    print(
+        "%d requests, concurrency %d, latency %.1f +- %.1f ms, error rate %.3f%s"
+        % (
+            options.requests,
+            options.concurrency,
+            options.latency,
+            options.jitter,
+            options.error_rate,
+            ", retrying reads" if options.retry else "",
+        )
+    )
+    runners = {"sync": run_sync, "threaded": run_threaded, "async": run_async}
+    for mode in options.modes.split(","):
+        started = time.perf_counter()
+        histogram, errors = runners[mode](make_client, workload, options.concurrency)
+        elapsed = time.perf_counter() - started
+        print(
+            "%-9s %8.1f req/s   p50 %7.2f ms   p99 %7.2f ms   errors %d"
+            % (
+                mode,
+                histogram.count / elapsed,
+                histogram.percentile(50) * 1000,
+                histogram.percentile(99) * 1000,
+                len(errors),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+models_benchmark.py - Allocations and CPU time of parsing responses into
+slotted models against walking the decoded dicts.
+
+The dict baseline is what callers do today: ``json.loads`` the raw bytes in
+every consumer and convert the string prices each time they are read.  The
+models path parses once and every consumer reads the typed attributes.
+
+Run from the repository root::
+
+    python benchmarks/models_benchmark.py [consumers]
+"""
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+from coinspot.models import parse  # noqa: E402
+import fixtures  # noqa: E402
+
+
+def scaled(path, key, size):
+    data = fixtures.calls()[path]
+    rows = data[key]
+    data[key] = [dict(rows[i % len(rows)]) for i in range(size)]
+    return data
+
+
+def responses():
+    book = scaled("/api/orders", "buyorders", 500)
+    book["sellorders"] = scaled("/api/orders", "sellorders", 500)["sellorders"]
+    return {
+        "/api/spot": json.dumps(fixtures.calls()["/api/spot"]).encode("utf-8"),
+        "/api/orders": json.dumps(book).encode("utf-8"),
+        "/api/orders/history": json.dumps(
+            scaled("/api/orders/history", "orders", 1000)
+        ).encode("utf-8"),
+    }
+
+
+def with_dicts(raw, consumers):
+    for _ in range(consumers):
+        spot = json.loads(raw["/api/spot"])
+        btc = next(Decimal(item["btcspot"]) for item in spot["spot"] if "btcspot" in item)
+        book = json.loads(raw["/api/orders"])
+        bid = max(Decimal(str(row["rate"])) for row in book["buyorders"])
+        history = json.loads(raw["/api/orders/history"])
+        volume = sum(Decimal(str(row["amount"])) for row in history["orders"])
+    return btc, bid, volume
+
+
+def with_models(raw, consumers):
+    spot = parse("/api/spot", raw["/api/spot"])
+    book = parse("/api/orders", raw["/api/orders"])
+    history = parse("/api/orders/history", raw["/api/orders/history"])
+    for _ in range(consumers):
+        btc = spot["BTC"].price
+        bid = max(order.rate for order in book.buyorders)
+        volume = sum(order.amount for order in history)
+    return btc, bid, volume
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def retained(func, *args):
+    """
+    Memory and allocated blocks still held by the value ``func`` returns
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    held = func(*args)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    del held
+    return sum(s.count_diff for s in stats), sum(s.size_diff for s in stats)
+
+
+def main(consumers=4):
+    raw = responses()
+    assert with_dicts(raw, 1) == with_models(raw, 1)
+    history = raw["/api/orders/history"]
+
+    print("%d consumers of spot, a 1000 order book and 1000 trades" % consumers)
+    for name, func in (("dicts", with_dicts), ("models", with_models)):
+        runs = 20
+        seconds = min(timeit.repeat(lambda: func(raw, consumers), number=runs, repeat=3)) / runs
+        print(
+            "%-8s %8.3f ms per response set   %8d KiB peak"
+            % (name, seconds * 1000, peak_memory(func, raw, consumers) // 1024)
+        )
+
+    print("holding 1000 parsed trades")
+    for name, func in (
+        ("dicts", json.loads),
+        ("models", lambda raw: parse("/api/orders/history", raw)),
+    ):
+        blocks, size = retained(func, history)
+        print("%-8s %8d blocks   %8d KiB" % (name, blocks, size // 1024))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+orderbook_benchmark.py - Replays a sequence of order book snapshots through
+OrderBookTracker and compares the work done downstream per poll with
+rebuilding a sorted book from every full snapshot.
+
+Snapshots are read from a file of one ``orders`` response per line, as
+written by ``--record``; without a file a synthetic sequence is generated in
+which a handful of levels change between polls.
+
+Run from the repository root::
+
+    python benchmarks/orderbook_benchmark.py [--record FILE] [FILE]
+
+The tracker diffs each snapshot once however many consumers subscribe, so the
+comparison is made for several consumers each keeping a sorted book.
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from coinspot.orderbook import OrderBookTracker  # noqa: E402
+
+
+def generate(polls=500, levels=500, changes=5, seed=1):
+    rng = random.Random(seed)
+    book = {
+        "buyorders": {round(0.0003 - i * 1e-7, 7): rng.randint(1, 10 ** 6) for i in range(levels)},
+        "sellorders": {round(0.0003 + (i + 1) * 1e-7, 7): rng.randint(1, 10 ** 6) for i in range(levels)},
+    }
+    snapshots = []
+    for _ in range(polls):
+        for _ in range(changes):
+            side = book[rng.choice(("buyorders", "sellorders"))]
+            rate = rng.choice(list(side))
+            roll = rng.random()
+            if roll < 0.2:
+                del side[rate]
+            elif roll < 0.4:
+                side[round(rate + rng.choice((-1, 1)) * 5e-8, 8)] = rng.randint(1, 10 ** 6)
+            else:
+                side[rate] = rng.randint(1, 10 ** 6)
+        snapshots.append(
+            json.dumps(
+                {
+                    "status": "ok",
+                    "buyorders": [
+                        {"amount": amount, "rate": rate, "total": amount * rate, "coin": "DOGE"}
+                        for rate, amount in book["buyorders"].items()
+                    ],
+                    "sellorders": [
+                        {"amount": amount, "rate": rate, "total": amount * rate, "coin": "DOGE"}
+                        for rate, amount in book["sellorders"].items()
+                    ],
+                }
+            )
+        )
+    return snapshots
+
+
+def rebuild(decoded):
+    """
+    What a consumer does without deltas: rebuild sorted levels every poll
+    """
+    book = {}
+    for side in ("buyorders", "sellorders"):
+        levels = {}
+        for row in decoded[side]:
+            levels[row["rate"]] = levels.get(row["rate"], 0) + row["amount"]
+        book[side] = sorted(levels.items())
+    return book
+
+
+CONSUMERS = 4
+
+
+def main(argv):
+    record = None
+    if argv[:1] == ["--record"]:
+        record, argv = argv[1], argv[2:]
+    if argv:
+        with open(argv[0]) as f:
+            snapshots = [line for line in f if line.strip()]
+    else:
+        snapshots = generate()
+    if record:
+        with open(record, "w") as f:
+            f.write("\n".join(snapshots) + "\n")
+    decoded = [json.loads(snapshot) for snapshot in snapshots]
+
+    start = time.perf_counter()
+    for snapshot in decoded:
+        for _ in range(CONSUMERS):
+            rebuild(snapshot)
+    rebuild_seconds = time.perf_counter() - start
+
+    tracker = OrderBookTracker()
+    applied = [0]
+
+    def consumer():
+        state = {}
+
+        def consume(delta):
+            levels = state.setdefault(delta.side, {})
+            for rate in delta.removed:
+                del levels[rate]
+            for rate, amount in delta.added + delta.changed:
+                levels[rate] = amount
+            applied[0] += len(delta)
+
+        return consume
+
+    for _ in range(CONSUMERS):
+        tracker.subscribe(consumer())
+
+    start = time.perf_counter()
+    for snapshot in decoded:
+        tracker.update("DOGE", snapshot)
+    tracker_seconds = time.perf_counter() - start
+
+    polls = len(decoded)
+    levels = len(decoded[-1]["buyorders"]) + len(decoded[-1]["sellorders"])
+    changes = applied[0] / CONSUMERS / polls
+    print(
+        "%d polls of a ~%d level book, %.1f level changes per poll, %d consumers"
+        % (polls, levels, changes, CONSUMERS)
+    )
+    print("rebuild per consumer      %8.3f ms per poll" % (rebuild_seconds / polls * 1000))
+    print("tracker deltas + consumers %7.3f ms per poll" % (tracker_seconds / polls * 1000))
+    print("consumer work             %8.1f levels per poll instead of %d" % (changes, levels))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
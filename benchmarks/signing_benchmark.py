@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+signing_benchmark.py - Cost of serialising and signing one request.
+
+The baseline is the previous request preparation: ``json.dumps`` with custom
+separators, which builds a new encoder every call, ``hmac.new`` keyed from the
+secret every call, and the headers dict built up key by key.  The context path
+is ``SigningContext.prepare``.
+
+Run from the repository root::
+
+    python benchmarks/signing_benchmark.py
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from coinspot.signing import USER_AGENT, SigningContext  # noqa: E402
+
+KEY = "0123456789abcdef0123456789abcdef"
+SECRET = "SECRET-" + "x" * 57
+PAYLOADS = {
+    "spot": {"nonce": 1414029447346000},
+    "buy": {"cointype": "DOGE", "amount": 12345.678, "rate": 0.00000017, "nonce": 1414029447346000},
+}
+
+
+def baseline(postdata):
+    params = json.dumps(postdata, separators=(",", ":"))
+    sign = hmac.new(SECRET.encode("utf-8"), params.encode("utf-8"), hashlib.sha512).hexdigest()
+    headers = {}
+    headers["Content-type"] = "application/json"
+    headers["Accept"] = "text/plain"
+    headers["key"] = KEY
+    headers["sign"] = sign
+    headers["User-Agent"] = USER_AGENT % "0.3.0"
+    return params, headers
+
+
+def allocated(func, postdata, runs=1000):
+    tracemalloc.start()
+    for _ in range(runs):
+        func(postdata)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    context = SigningContext(KEY, SECRET, "0.3.0")
+    for postdata in PAYLOADS.values():
+        body, headers = context.prepare(postdata)
+        params, expected = baseline(postdata)
+        assert body == params.encode("utf-8") and headers == expected
+
+    for name, postdata in PAYLOADS.items():
+        print("%s payload" % name)
+        for label, func in (("baseline", baseline), ("context", context.prepare)):
+            runs = 20000
+            seconds = min(timeit.repeat(lambda: func(postdata), number=runs, repeat=5)) / runs
+            print(
+                "%-9s %8.2f us per request   %6d B peak"
+                % (label, seconds * 1e6, allocated(func, postdata))
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+standin.py - A local TLS stand-in for the CoinSpot API used by the benchmarks.
+
+The server answers every POST with the matching fixture from
+``tests/fixtures.py`` over HTTP/1.1 keep-alive.  A throwaway self-signed
+certificate is generated with the ``openssl`` command line tool.
+"""
+
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+import fixtures  # noqa: E402
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    responses_by_path = {}
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = self.responses_by_path.get(self.path)
+        if body is None:
+            body = b'{"status":"error","message":"unknown path"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory):
+    """
+    Generate a self-signed certificate for localhost
+
+    :return:
+        a ``(certfile, keyfile)`` tuple
+    """
+    if shutil.which("openssl") is None:
+        raise RuntimeError("the openssl command line tool is required")
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", keyfile, "-out", certfile, "-days", "1",
+            "-subj", "/CN=localhost",
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return certfile, keyfile
+
+
+class StandInServer:
+    """
+    Run the stand-in server on a background thread
+
+    Use as a context manager; ``endpoint`` and ``client_context`` are ready
+    to hand to ``CoinSpot`` once the block is entered.
+
+    :param responses:
+        an optional ``{path: data}`` mapping, defaulting to the test fixtures
+    """
+
+    def __init__(self, responses=None):
+        if responses is None:
+            responses = fixtures.calls()
+        self.responses = {
+            path: json.dumps(data).encode("utf-8") for path, data in responses.items()
+        }
+        self._tmp = None
+        self._httpd = None
+        self._thread = None
+
+    def __enter__(self):
+        self._tmp = tempfile.mkdtemp()
+        certfile, keyfile = make_certificate(self._tmp)
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(certfile, keyfile)
+
+        handler = type("Handler", (StandInHandler,), {"responses_by_path": self.responses})
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._httpd.daemon_threads = True
+        self._httpd.socket = server_context.wrap_socket(
+            self._httpd.socket, server_side=True
+        )
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+        self.endpoint = "localhost:%d" % self._httpd.server_address[1]
+        self.client_context = ssl.create_default_context(cafile=certfile)
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
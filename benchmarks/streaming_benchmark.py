@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+streaming_benchmark.py - Peak memory and time of decoding order history
+responses of growing size whole with ``json.loads`` against row by row with
+``ArrayStreamDecoder``.
+
+Each row is consumed and dropped, as a caller aggregating a book would.
+The body is read from an in-memory file in 8 KiB chunks, standing in for
+the socket.
+
+Run from the repository root::
+
+    python benchmarks/streaming_benchmark.py
+"""
+
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from coinspot.jsonstream import ArrayStreamDecoder  # noqa: E402
+
+ROW = {"amount": 108070, "rate": 0.00036, "total": 38.9052, "coin": "DOGE", "solddate": 1414029447346}
+
+
+def whole(body):
+    data = body.read()
+    volume = 0
+    for row in json.loads(data)["orders"]:
+        volume += row["amount"]
+    return volume
+
+
+def streamed(body, chunk_size=8192):
+    decoder = ArrayStreamDecoder(("orders",))
+    volume = 0
+    while True:
+        chunk = body.read(chunk_size)
+        for _, row in decoder.feed(chunk) if chunk else decoder.close():
+            volume += row["amount"]
+        if not chunk:
+            return volume
+
+
+def measure(func, payload):
+    start = time.perf_counter()
+    func(io.BytesIO(payload))
+    seconds = time.perf_counter() - start
+    body = io.BytesIO(payload)
+    tracemalloc.start()
+    func(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    print("%8s %10s   %22s   %22s" % ("rows", "body", "json.loads", "streamed"))
+    for rows in (1000, 10000, 100000):
+        payload = json.dumps({"status": "ok", "orders": [ROW] * rows}).encode("utf-8")
+        # the body itself is held by the stand-in file either way, so only
+        # the decoding overhead is counted
+        results = [measure(func, payload) for func in (whole, streamed)]
+        print(
+            "%8d %7d KiB   %8.1f ms %8d KiB   %8.1f ms %8d KiB"
+            % (
+                rows,
+                len(payload) // 1024,
+                results[0][0] * 1000,
+                results[0][1] // 1024,
+                results[1][0] * 1000,
+                results[1][1] // 1024,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
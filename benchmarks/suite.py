@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+suite.py - The benchmark suite, with stored results for regression checks.
+
+Each benchmark is a generator registered with ``@benchmark``: it does its
+setup, yields the zero-argument callable to be timed, and cleans up after
+the ``yield``.  The runner calibrates how many calls make up a measurement
+(as ``timeit`` does), takes several measurements, and records the per-call
+minimum and median.
+
+Results are written as JSON together with the commit, Python version and
+machine they came from.  ``--compare`` checks a run against an earlier
+result file by the per-call minimum, the figure least disturbed by other
+load on the machine, and exits non-zero if any benchmark slowed by more
+than ``--threshold``.
+
+Run from the repository root::
+
+    python benchmarks/suite.py [--filter signing] [--output results.json]
+        [--compare benchmarks/results/<earlier>.json] [--threshold 0.10]
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from array import array
+from decimal import Decimal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "tests"))
+
+from coinspot import CoinSpot  # noqa: E402
+from coinspot.columnar import orderbook_columns  # noqa: E402
+from coinspot.jsonstream import ArrayStreamDecoder  # noqa: E402
+from coinspot.models import parse  # noqa: E402
+from coinspot.portfolio import Portfolio, value_accounts  # noqa: E402
+from coinspot.replay import ReplayTransport, from_fixtures  # noqa: E402
+from coinspot.signing import SigningContext  # noqa: E402
+from coinspot.store import TickStore  # noqa: E402
+import fixtures  # noqa: E402
+from models_benchmark import scaled  # noqa: E402
+
+BENCHMARKS = {}
+
+# order book and history sizes of a busy coin
+BOOK_SIZE = 1000
+HISTORY_SIZE = 1000
+
+# a year of one trade a minute
+STORE_SIZE = 525600
+
+# coins held, roughly every coin listed
+PORTFOLIO_COINS = 400
+
+
+def benchmark(func):
+    """
+    Register a benchmark under its function name
+    """
+    BENCHMARKS[func.__name__] = contextlib.contextmanager(func)
+    return func
+
+
+def large_orders():
+    book = scaled("/api/orders", "buyorders", BOOK_SIZE)
+    book["sellorders"] = scaled("/api/orders", "sellorders", BOOK_SIZE)["sellorders"]
+    return json.dumps(book).encode("utf-8")
+
+
+def large_history():
+    return json.dumps(scaled("/api/orders/history", "orders", HISTORY_SIZE)).encode("utf-8")
+
+
+def offline_client(responses=None, **kwargs):
+    exchanges = from_fixtures(responses or fixtures.calls())
+    client = CoinSpot(transport=ReplayTransport(exchanges), **kwargs)
+    client._api_key = "0123456789abcdef0123456789abcdef"
+    client._api_secret = "secret-" + "x" * 57
+    return client
+
+
+BUY = {"cointype": "DOGE", "amount": 12345.678, "rate": 0.00000017, "nonce": 1414029447346000}
+
+
+# signing and serialisation
+
+
+@benchmark
+def signing_get_signed_request():
+    client = offline_client()
+    params = json.dumps(BUY, separators=(",", ":"))
+    yield lambda: client._get_signed_request(params)
+
+
+@benchmark
+def signing_prepare_request():
+    client = offline_client()
+    yield lambda: client._prepare_request(dict(BUY))
+
+
+@benchmark
+def signing_context_prepare():
+    context = SigningContext("key", "secret", "0.3.0")
+    yield lambda: context.prepare(BUY)
+
+
+@benchmark
+def serialise_json_dumps():
+    yield lambda: json.dumps(BUY, separators=(",", ":"))
+
+
+# parsing
+
+
+@benchmark
+def parse_orders_json_loads():
+    raw = large_orders()
+    yield lambda: json.loads(raw)
+
+
+@benchmark
+def parse_orders_models():
+    raw = large_orders()
+    yield lambda: parse("/api/orders", raw)
+
+
+@benchmark
+def parse_orders_columnar():
+    raw = large_orders()
+    yield lambda: orderbook_columns(raw)
+
+
+@benchmark
+def parse_history_models():
+    raw = large_history()
+    yield lambda: parse("/api/orders/history", raw)
+
+
+@benchmark
+def parse_history_stream():
+    raw = large_history()
+    chunks = [raw[i : i + 8192] for i in range(0, len(raw), 8192)]
+
+    def decode():
+        decoder = ArrayStreamDecoder(("orders",), parse_float=Decimal)
+        for chunk in chunks:
+            decoder.feed(chunk)
+        decoder.close()
+
+    yield decode
+
+
+# history store
+
+
+@contextlib.contextmanager
+def filled_store():
+    root = tempfile.mkdtemp()
+    store = TickStore(root)
+    times = array("q", range(0, STORE_SIZE * 60000, 60000))
+    values = array("d", (1.0 + (i % 100) / 100 for i in range(STORE_SIZE)))
+    store._get("BTC", "trades").append(times, [values, values, values])
+    try:
+        yield store
+    finally:
+        store.close()
+        shutil.rmtree(root)
+
+
+@benchmark
+def store_range_day():
+    with filled_store() as store:
+        day = 86400000
+        yield lambda: store.range("BTC", 180 * day, 181 * day)
+
+
+@benchmark
+def store_ohlcv_year_hourly():
+    with filled_store() as store:
+        yield lambda: store.ohlcv("BTC", 3600000)
+
+
+# portfolio valuation
+
+
+def priced_portfolio():
+    coins = ["C%d" % i for i in range(PORTFOLIO_COINS)]
+    return coins, Portfolio({coin: 1.0 for coin in coins}, {coin: 1.0 for coin in coins})
+
+
+@benchmark
+def portfolio_tick_five_prices():
+    coins, portfolio = priced_portfolio()
+    ticks = [{coin: 1.0 + tick for coin in coins[tick % 100 : tick % 100 + 5]} for tick in range(64)]
+    ticks = itertools.cycle(ticks)
+    yield lambda: portfolio.set_prices(next(ticks))
+
+
+@benchmark
+def portfolio_value_accounts():
+    coins = ["C%d" % i for i in range(PORTFOLIO_COINS)]
+    balances = {"account%d" % i: {coin: float(i) for coin in coins} for i in range(50)}
+    prices = {coin: 1.5 for coin in coins}
+    yield lambda: value_accounts(balances, prices)
+
+
+# end to end
+
+
+@benchmark
+def client_spot_replay():
+    client = offline_client()
+    yield client.spot
+
+
+@benchmark
+def client_orders_models_replay():
+    client = offline_client({"/api/orders": json.loads(large_orders())}, models=True)
+    yield lambda: client.orders("DOGE")
+
+
+@benchmark
+def client_spot_https_standin():
+    from standin import StandInServer
+
+    with StandInServer() as server:
+        client = CoinSpot(ssl_context=server.client_context)
+        client._pool.host = server.endpoint
+        try:
+            yield client.spot
+        finally:
+            client._pool.clear()
+
+
+@benchmark
+def client_orders_https_standin():
+    from standin import StandInServer
+
+    responses = fixtures.calls()
+    responses["/api/orders"] = json.loads(large_orders())
+    with StandInServer(responses) as server:
+        client = CoinSpot(ssl_context=server.client_context)
+        client._pool.host = server.endpoint
+        try:
+            yield lambda: client.orders("DOGE")
+        finally:
+            client._pool.clear()
+
+
+def measure(func, repeat, min_time):
+    """
+    :return:
+        a dict of the per-call ``min`` and ``median`` in seconds, and the
+        ``number`` of calls in each of the ``repeat`` measurements
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / elapsed))
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def units(seconds):
+    for unit, scale in (("s ", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return "%8.3f %s" % (seconds / scale, unit)
+    return "%8.1f ns" % (seconds / 1e-9)
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each benchmark's change against ``baseline``
+
+    :return:
+        the names of the benchmarks that slowed by more than ``threshold``
+    """
+    regressions = []
+    print("\nagainst %s (%s)" % (baseline["meta"].get("commit"), baseline["meta"].get("date")))
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print("%-32s %s" % (name, "new"))
+            continue
+        ratio = result["min"] / before["min"]
+        if ratio > 1 + threshold:
+            verdict = "SLOWER"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            verdict = "faster"
+        else:
+            verdict = ""
+        print(
+            "%-32s %s -> %s  x%.2f %s"
+            % (name, units(before["min"]), units(result["min"]), ratio, verdict)
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--filter", default="", help="only run benchmarks containing this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per measurement")
+    parser.add_argument("--output", help="result file, benchmarks/results/<commit>.json by default")
+    parser.add_argument("--compare", metavar="FILE", help="an earlier result file")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--list", action="store_true")
+    options = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if options.filter in name]
+    if options.list:
+        print("\n".join(names))
+        return 0
+
+    results = {}
+    for name in names:
+        with BENCHMARKS[name]() as func:
+            func()
+            results[name] = measure(func, options.repeat, options.min_time)
+        print(
+            "%-32s min %s   median %s"
+            % (name, units(results[name]["min"]), units(results[name]["median"]))
+        )
+
+    meta = metadata()
+    output = options.output or os.path.join(HERE, "results", "%s.json" % (meta["commit"] or "results"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as stored:
+        json.dump({"meta": meta, "results": results}, stored, indent=2, sort_keys=True)
+    print("results written to %s" % output)
+
+    if options.compare:
+        with open(options.compare) as stored:
+            regressions = compare(results, json.load(stored), options.threshold)
+        if regressions:
+            print("\n%d regression(s): %s" % (len(regressions), ", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
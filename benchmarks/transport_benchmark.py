@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+transport_benchmark.py - Per-call latency of pooled keep-alive connections
+against opening and closing a connection for every call, and the cost of
+recording metrics on top.  The phase breakdown of the traced clients is
+printed at the end.
+
+Run from the repository root::
+
+    python benchmarks/transport_benchmark.py [calls]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from coinspot import CoinSpot  # noqa: E402
+from coinspot.metrics import PHASES, Metrics  # noqa: E402
+from standin import StandInServer  # noqa: E402
+
+
+def measure(client, calls):
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client.spot()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        "%-12s mean %8.3f ms   p50 %8.3f ms   p99 %8.3f ms"
+        % (
+            name,
+            statistics.mean(latencies) * 1000,
+            statistics.median(latencies) * 1000,
+            p99 * 1000,
+        )
+    )
+
+
+def report_phases(name, metrics):
+    latency = metrics.stats()["/api/spot"]["latency"]
+    print(
+        "%-12s p50 %s"
+        % (
+            name,
+            "  ".join(
+                "%s %.3f" % (phase, latency[phase]["p50"] * 1000)
+                for phase in PHASES
+                if phase in latency
+            ),
+        )
+    )
+
+
+def main(calls=200):
+    with StandInServer() as server:
+        context = server.client_context
+        clients = {
+            # a pool size of zero closes every connection after use, which is
+            # the old open/request/close behaviour
+            "open/close": CoinSpot(pool_size=0, ssl_context=context),
+            "pooled": CoinSpot(pool_size=4, ssl_context=context),
+            "open/close+m": CoinSpot(pool_size=0, ssl_context=context, metrics=Metrics()),
+            "pooled+m": CoinSpot(pool_size=4, ssl_context=context, metrics=Metrics()),
+        }
+        for name, client in clients.items():
+            client._endpoint = server.endpoint
+            client._pool.host = server.endpoint
+            measure(client, 5)
+            if client._metrics is not None:
+                client._metrics.reset()
+            report(name, measure(client, calls))
+        print("phase p50 in ms")
+        for name, client in clients.items():
+            if client._metrics is not None:
+                report_phases(name, client._metrics)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -1,2 +1,46 @@
-from .coinspot import CoinSpot
+"""
+A python library for the CoinSpot API.
 
+The names below are imported from their submodules the first time they are
+used, so ``import coinspot`` loads next to nothing and a script only pays
+for the parts it touches; ``from coinspot import CoinSpot`` does not load
+asyncio, for example.
+"""
+
+_EXPORTS = {
+    "CoinSpot": "coinspot",
+    "CoinSpotConfig": "config",
+    "CoinSpotPool": "accounts",
+    "Portfolio": "portfolio",
+    "Profile": "config",
+    "AsyncCoinSpot": "aio",
+    "BulkResult": "bulk",
+    "RequestScheduler": "ratelimit",
+    "ResponseCache": "cache",
+    "MonotonicNonce": "nonce",
+    "SharedNonce": "nonce",
+    "CircuitBreaker": "resilience",
+    "RetryPolicy": "resilience",
+    "APIError": "errors",
+    "CircuitOpenError": "errors",
+    "CoinSpotError": "errors",
+    "ConfigError": "errors",
+    "HTTPStatusError": "errors",
+    "TransportError": "errors",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    # __import__ rather than importlib, so -X importtime reports the import
+    value = getattr(__import__(module, globals(), None, [name], 1), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
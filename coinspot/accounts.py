@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+accounts.py - Several CoinSpot accounts run from one process.
+
+``CoinSpotPool`` makes a client per profile of a ``CoinSpotConfig``.  Every
+client gets its own nonce sequence, ``RequestScheduler`` and connection pool,
+because the API counts nonces and rate limits per key, and its own logger,
+so the accounts share nothing that one of them could upset.  Calls that
+cover every account run concurrently::
+
+    accounts = CoinSpotPool(CoinSpotConfig.load())
+    balances = accounts.balances_all()
+    holdings = accounts.balances_total()
+"""
+
+from decimal import Decimal
+
+from .coinspot import CoinSpot
+from .config import CoinSpotConfig
+from .errors import APIError
+from .models import PARSERS, Balance, decode
+from .nonce import MonotonicNonce, SharedNonce
+from .ratelimit import DEFAULT_BURST, DEFAULT_RATE, RequestScheduler
+
+BALANCES = "/api/my/balances"
+
+
+def _balances(account, response):
+    """
+    :return:
+        the dict of ``Balance`` in one account's ``balances`` response
+    :raises APIError:
+        when the API answered with an error
+    """
+    if isinstance(response, dict) and "status" not in response:
+        # a client made with models=True has parsed it already
+        return response
+    data = response if isinstance(response, dict) else decode(response)
+    if data.get("status") != "ok":
+        raise APIError(
+            "%s failed for %s: %s" % (BALANCES, account, data.get("message", data)),
+            BALANCES,
+            response=data,
+        )
+    return PARSERS[BALANCES](data)
+
+
+class CoinSpotPool:
+    """
+    A client per account, with the accounts' calls made concurrently
+
+    :param config:
+        a ``CoinSpotConfig``, or a list of ``Profile``, one per account
+    :param accounts:
+        the names of the profiles to use, all of them by default
+    :param rate:
+        requests per second allowed for each account
+    :param burst:
+        the most requests each account may send back to back
+    :param budgets:
+        an optional ``{path: (rate, burst)}`` dict of per endpoint limits,
+        applied to each account separately
+    :param nonce_directory:
+        keep each account's nonces in a ``SharedNonce`` file in this
+        directory, for accounts also used by other processes; by default
+        every account has its own ``MonotonicNonce``
+    :param max_workers:
+        the most requests in flight at once across the accounts, by default
+        one per account
+    :param client_class:
+        the client made for each account, ``CoinSpot`` by default
+    :param options:
+        passed to every client, such as ``pool_size`` or ``models``; objects
+        passed here are shared by the accounts, and a shared ``cache`` keeps
+        each account's balances apart
+    """
+
+    def __init__(
+        self,
+        config,
+        accounts=None,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        budgets=None,
+        nonce_directory=None,
+        max_workers=None,
+        client_class=CoinSpot,
+        **options
+    ):
+        import logging
+
+        if not isinstance(config, CoinSpotConfig):
+            config = CoinSpotConfig(config)
+        self.config = config
+        self.max_workers = max_workers
+        self._clients = {}
+        self._nonces = []
+        for name in config.names if accounts is None else accounts:
+            profile = config.profile(name)
+            if nonce_directory is not None:
+                nonce = SharedNonce.for_key(profile.key, nonce_directory)
+                self._nonces.append(nonce)
+            else:
+                nonce = MonotonicNonce()
+            self._clients[name] = client_class(
+                config=profile,
+                nonce=nonce,
+                scheduler=RequestScheduler(rate, burst, budgets),
+                logger=logging.getLogger("%s.%s" % (__name__, name)),
+                **options
+            )
+
+    @property
+    def names(self):
+        """
+        The account names, in the order they were configured
+        """
+        return list(self._clients)
+
+    def __getitem__(self, name):
+        return self._clients[name]
+
+    def __contains__(self, name):
+        return name in self._clients
+
+    def __iter__(self):
+        return iter(self._clients)
+
+    def __len__(self):
+        return len(self._clients)
+
+    def items(self):
+        return self._clients.items()
+
+    def map(self, call, accounts=None, max_workers=None):
+        """
+        Make the same API call on several accounts concurrently
+
+        :param call:
+            an endpoint method name, or a tuple of the name and its
+            arguments, example value ('orders', 'BTC')
+        :param accounts:
+            the accounts to call, all of them by default
+        :param max_workers:
+            the most requests to have in flight at once
+        :return:
+            a dict of responses keyed by account, in the order of
+            ``accounts``; an account whose call failed maps to the
+            exception raised
+        :raises AttributeError:
+            when ``call`` is not an API call
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        names = self.names if accounts is None else list(accounts)
+        bound = {name: self._clients[name]._bound_calls([call])[0] for name in names}
+        if not bound:
+            return {}
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers or self.max_workers or len(bound)
+        )
+        try:
+            futures = {
+                name: executor.submit(method, *args) for name, (method, args) in bound.items()
+            }
+            results = {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as error:
+                    results[name] = error
+            return results
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def balances_all(self, accounts=None, max_workers=None):
+        """
+        Fetch the balances of every account concurrently
+
+        :return:
+            a dict of ``balances`` responses keyed by account; an account
+            whose request failed maps to the exception raised
+        """
+        return self.map("balances", accounts, max_workers)
+
+    def balances_total(self, accounts=None, max_workers=None):
+        """
+        The balances of every account added together
+
+        :return:
+            a dict of ``Balance`` keyed by coin, holding the amount across
+            the accounts
+        :raises CoinSpotError:
+            the first failure, when any account's balances could not be
+            fetched, since a total missing an account would be wrong
+        """
+        totals = {}
+        for account, response in self.balances_all(accounts, max_workers).items():
+            if isinstance(response, Exception):
+                raise response
+            for coin, balance in _balances(account, response).items():
+                totals[coin] = totals.get(coin, Decimal(0)) + balance.amount
+        return {coin: Balance(coin, amount) for coin, amount in totals.items()}
+
+    def close(self):
+        """
+        Close the idle connections held by every account, and any nonce
+        files
+        """
+        for client in self._clients.values():
+            client._pool.clear()
+        for nonce in self._nonces:
+            nonce.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
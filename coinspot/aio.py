@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+aio.py - An asyncio client for the CoinSpot API.
+
+``AsyncCoinSpot`` has the same endpoint methods as ``CoinSpot`` but each one
+returns an awaitable, so a single event loop can keep many requests in
+flight over one pool of keep-alive connections::
+
+    client = AsyncCoinSpot()
+    spot, balances = await asyncio.gather(client.spot(), client.balances())
+"""
+
+import asyncio
+import http.client
+import time
+
+from .aiotransport import AsyncConnectionPool
+from .coinspot import CoinSpot
+from .errors import CoinSpotError
+from .resilience import HEDGED_PATHS
+from .trades import TradeDeduplicator, history_rows
+
+
+# asyncio.TimeoutError is not an OSError before Python 3.11, and a response
+# cut short raises asyncio.IncompleteReadError, an EOFError
+ASYNC_TRANSPORT_ERRORS = (OSError, EOFError, asyncio.TimeoutError, http.client.HTTPException)
+
+
+class AsyncCoinSpot(CoinSpot):
+    """
+    coinspot class implementing awaitable API calls for the coinspot API
+
+    Configuration, nonces and request signing are shared with ``CoinSpot``;
+    only the transport differs.  Every endpoint method (``spot``,
+    ``balances``, ``orders``, ``buy`` and so on) returns a coroutine which
+    resolves to the raw response body.  ``iter_orders``,
+    ``iter_orderhistory``, ``iter_trades``, ``orders_stream`` and
+    ``orderhistory_stream`` are async generators, used with ``async for``.
+    """
+
+    def _make_pool(self, ssl_context):
+        return AsyncConnectionPool(
+            self._endpoint,
+            maxsize=self._pool_size,
+            idle_timeout=self._pool_idle_timeout,
+            context=ssl_context,
+        )
+
+    async def _request(self, path, postdata):
+        if self._cache is not None and self._cache.cacheable(path):
+            return await self._cache.fetch_async(
+                path, postdata, lambda: self._send(path, postdata), self._api_key
+            )
+        return await self._send(path, postdata)
+
+    async def _send(self, path, postdata):
+        retry = self._retry.delays(path) if self._retry is not None else iter(())
+        while True:
+            try:
+                return await self._attempt(path, postdata)
+            except CoinSpotError as error:
+                delay = next(retry, None) if error.retryable else None
+                if delay is None:
+                    raise
+                if self._debug:
+                    self.logger.debug("retrying %s in %.3fs after %s", path, delay, error)
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, path, postdata):
+        breaker = self._breaker
+        if breaker is not None:
+            breaker.before(path)
+        try:
+            if self._hedge_after is not None and path in HEDGED_PATHS:
+                response_data = await self._hedged(path, postdata)
+            else:
+                response_data = await self._fetch(path, postdata)
+        except Exception:
+            # any error counts, a body that does not parse included
+            if breaker is not None:
+                breaker.failure(path)
+            raise
+        except BaseException:
+            # a cancelled request says nothing about the endpoint, but must
+            # not leave a half-open circuit waiting on its trial for good
+            if breaker is not None:
+                breaker.abandon(path)
+            raise
+        if breaker is not None:
+            breaker.success(path)
+        return response_data
+
+    async def _hedged(self, path, postdata):
+        tasks = [asyncio.ensure_future(self._fetch(path, dict(postdata)))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_after)
+            if not done:
+                tasks.append(asyncio.ensure_future(self._fetch(path, dict(postdata))))
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    if not isinstance(task.exception(), CoinSpotError):
+                        raise task.exception()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch(self, path, postdata):
+        if self._scheduler is not None:
+            await self._scheduler.acquire_async(path)
+        params, headers = self._prepare_request(postdata)
+        trace = self._start_trace(path)
+        if trace is not None:
+            trace.bytes_out = len(params)
+        try:
+            try:
+                response, response_data = await self._pool.request(
+                    "POST", path, params, headers, trace=trace
+                )
+            except ASYNC_TRANSPORT_ERRORS as error:
+                raise self._transport_error(path, error) from error
+            if self._debug:
+                self._log_response(response, response_data)
+            if trace is not None:
+                self._trace_response(trace, response, response_data)
+            self._check_status(path, response, response_data)
+            if trace is None:
+                return self._decode(path, response_data)
+            started = time.perf_counter()
+            result = self._decode(path, response_data)
+            trace.parse = time.perf_counter() - started
+        except BaseException as error:
+            if trace is not None:
+                self._finish_trace(trace, error)
+            raise
+        self._finish_trace(trace)
+        return result
+
+    async def _stream(self, path, postdata, keys, chunk_size):
+        if self._scheduler is not None:
+            await self._scheduler.acquire_async(path)
+        params, headers = self._prepare_request(postdata)
+        trace = self._start_trace(path)
+        if trace is not None:
+            trace.bytes_out = len(params)
+        decoder = self._stream_decoder(keys)
+        try:
+            try:
+                async with self._pool.stream(
+                    "POST", path, params, headers, trace=trace
+                ) as response:
+                    if trace is not None:
+                        self._trace_response(trace, response, None)
+                    self._check_status(path, response, None)
+                    while True:
+                        chunk = await response.body.read(chunk_size)
+                        if trace is not None:
+                            trace.bytes_in += len(chunk)
+                        rows = decoder.feed(chunk) if chunk else decoder.close()
+                        for key, row in rows:
+                            yield key, self._stream_row(row)
+                        if not chunk:
+                            break
+            except ASYNC_TRANSPORT_ERRORS as error:
+                raise self._transport_error(path, error) from error
+            self._check_stream(path, decoder)
+        except GeneratorExit:
+            if trace is not None:
+                self._finish_trace(trace)
+            raise
+        except BaseException as error:
+            if trace is not None:
+                self._finish_trace(trace, error)
+            raise
+        if trace is not None:
+            self._finish_trace(trace)
+
+    async def orderhistory_stream(self, cointype, chunk_size=8192):
+        request_data = {"cointype": cointype}
+        async for _, order in self._stream(
+            "/api/orders/history", request_data, ("orders",), chunk_size
+        ):
+            yield order
+
+    async def _fan_out(self, method, cointypes, max_workers):
+        semaphore = asyncio.Semaphore(max_workers or self._max_workers)
+
+        async def call(cointype):
+            async with semaphore:
+                try:
+                    return cointype, await method(cointype)
+                except Exception as error:
+                    return cointype, error
+
+        tasks = [asyncio.ensure_future(call(cointype)) for cointype in cointypes]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def orders_many(self, cointypes, max_workers=None):
+        return {
+            cointype: result
+            async for cointype, result in self.iter_orders(cointypes, max_workers)
+        }
+
+    async def orderhistory_many(self, cointypes, max_workers=None):
+        return {
+            cointype: result
+            async for cointype, result in self.iter_orderhistory(cointypes, max_workers)
+        }
+
+    async def map_requests(self, calls, max_workers=None):
+        semaphore = asyncio.Semaphore(max_workers or self._max_workers)
+
+        async def call(method, args):
+            async with semaphore:
+                return await method(*args)
+
+        return await asyncio.gather(
+            *(call(method, args) for method, args in self._bound_calls(calls)),
+            return_exceptions=True,
+        )
+
+    async def _submit(self, path, payloads, depth):
+        from .bulk import submit_async
+
+        return await submit_async(self, path, payloads, depth or self._max_workers)
+
+    async def iter_trades(self, cointypes, interval=5.0, max_workers=None, maxlen=2048):
+        trades = TradeDeduplicator(maxlen)
+        while True:
+            started = time.monotonic()
+            async for cointype, response in self.iter_orderhistory(cointypes, max_workers):
+                if isinstance(response, Exception):
+                    continue
+                for trade in trades.new_trades(cointype, history_rows(response)):
+                    yield cointype, trade
+            await asyncio.sleep(max(0, interval - (time.monotonic() - started)))
+
+    async def close(self):
+        """
+        Close the idle connections held by the client
+        """
+        self._pool.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+aiotransport.py - Keep-alive HTTPS connection pooling for the asyncio client.
+
+``AsyncConnectionPool`` is the asyncio counterpart of
+``coinspot.transport.ConnectionPool``.  It speaks just enough HTTP/1.1 over
+asyncio streams to POST a request and read back the response, or to
+pipeline several requests over one connection.
+"""
+
+import asyncio
+import contextlib
+import http.client
+import io
+import ssl
+import time
+from collections import deque
+
+from .resilience import SAFE_PATHS
+from .transport import STALE_ERRORS
+
+
+ASYNC_STALE_ERRORS = STALE_ERRORS + (asyncio.IncompleteReadError,)
+
+
+class AsyncResponse:
+    """
+    The status line and headers of a response read by ``AsyncConnectionPool``
+
+    Mirrors the ``status``, ``reason``, ``msg`` and ``will_close`` attributes
+    of ``http.client.HTTPResponse``.
+    """
+
+    def __init__(self, version, status, reason, msg):
+        self.version = version
+        self.status = status
+        self.reason = reason
+        self.msg = msg
+        connection = (msg.get("Connection") or "").lower()
+        self.will_close = connection == "close" or (
+            version == "HTTP/1.0" and connection != "keep-alive"
+        )
+
+    def __repr__(self):
+        return "<AsyncResponse [%d %s]>" % (self.status, self.reason)
+
+
+class _AsyncBody:
+    """
+    Reads a response body framed by Content-Length, chunked encoding or the
+    connection closing
+    """
+
+    def __init__(self, reader, response):
+        self.reader = reader
+        self.complete = False
+        msg = response.msg
+        self.chunked = (msg.get("Transfer-Encoding") or "").lower() == "chunked"
+        self.remaining = None
+        if self.chunked:
+            self.remaining = 0
+        elif msg.get("Content-Length") is not None:
+            self.remaining = int(msg["Content-Length"])
+        else:
+            response.will_close = True
+        if self.remaining == 0 and not self.chunked:
+            self.complete = True
+
+    async def _next_chunk_size(self):
+        size = int((await self.reader.readline()).split(b";", 1)[0], 16)
+        if size == 0:
+            # skip any trailers up to the blank line ending the body
+            while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            self.complete = True
+        return size
+
+    async def read(self, n=-1):
+        """
+        Read up to ``n`` bytes of the body, or all of the rest if ``n`` is -1
+
+        :return:
+            the bytes read, empty once the body is complete
+        """
+        if self.complete:
+            return b""
+        if self.remaining is None:
+            data = await (self.reader.read() if n < 0 else self.reader.read(n))
+            if not data or n < 0:
+                self.complete = True
+            return data
+        if n < 0:
+            parts = []
+            while not self.complete:
+                parts.append(await self.read(1 << 16))
+            return b"".join(parts)
+        if self.chunked and self.remaining == 0:
+            self.remaining = await self._next_chunk_size()
+            if self.complete:
+                return b""
+        data = await self.reader.read(min(n, self.remaining))
+        if not data:
+            raise asyncio.IncompleteReadError(data, self.remaining)
+        self.remaining -= len(data)
+        if self.remaining == 0:
+            if self.chunked:
+                await self.reader.readexactly(2)
+            else:
+                self.complete = True
+        return data
+
+
+class _AsyncConnection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @property
+    def closed(self):
+        return self.writer.is_closing() or self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncPipeline:
+    """
+    The asyncio counterpart of ``coinspot.transport.Pipeline``, made by
+    ``AsyncConnectionPool.pipeline``
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+        self.outstanding = 0
+        self.closed = False
+        self.failed = False
+
+    async def send(self, method, path, body=None, headers=None):
+        """
+        Write a request without waiting for the responses before it
+        """
+        try:
+            if self._conn is None:
+                self._conn = await self._pool._new_connection()
+            self._conn.writer.write(
+                self._pool._encode_request(method, path, body, headers or {})
+            )
+            await self._conn.writer.drain()
+        except BaseException:
+            self.failed = True
+            raise
+        self.outstanding += 1
+
+    async def receive(self):
+        """
+        Read the response to the oldest request not yet answered
+
+        :return:
+            a ``(response, data)`` tuple
+        """
+        if self._conn is None:
+            raise ConnectionError("the pipeline never connected")
+        timeout = self._pool.timeout
+        try:
+            response = await asyncio.wait_for(self._pool._read_response(self._conn), timeout)
+            data = await asyncio.wait_for(response.body.read(), timeout)
+        except BaseException:
+            self.failed = True
+            raise
+        self.outstanding -= 1
+        if response.will_close:
+            self.closed = True
+        return response, data
+
+    def close(self):
+        if self._conn is None:
+            return
+        if self.failed or self.closed or self.outstanding:
+            self._conn.close()
+        else:
+            self._pool._put(self._conn)
+
+
+class AsyncConnectionPool:
+    """
+    A pool of persistent HTTPS connections for use from a single event loop
+
+    Takes the same arguments as ``ConnectionPool``.  Connections are opened
+    on demand, so the number of requests in flight is not capped by
+    ``maxsize``, only the number of idle connections kept afterwards.
+    """
+
+    def __init__(self, host, maxsize=4, idle_timeout=30.0, timeout=None, context=None):
+        self.netloc = host
+        self.host, _, port = host.partition(":")
+        self.port = int(port) if port else 443
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.context = context
+        self.debuglevel = 0
+        self._idle = deque()
+
+    async def _new_connection(self):
+        context = self.context
+        if context is None:
+            context = ssl.create_default_context()
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+        return _AsyncConnection(reader, writer)
+
+    async def _get(self, trace=None):
+        now = time.monotonic()
+        while self._idle:
+            conn, released = self._idle.pop()
+            if now - released <= self.idle_timeout and not conn.closed:
+                return conn, True
+            conn.close()
+        return await self._connect(trace), False
+
+    async def _connect(self, trace):
+        # asyncio opens the socket and completes the TLS handshake in one
+        # call, so both are timed as the connect phase
+        if trace is None:
+            return await self._new_connection()
+        started = time.perf_counter()
+        conn = await self._new_connection()
+        trace.connect = time.perf_counter() - started
+        return conn
+
+    def _put(self, conn):
+        if not conn.closed and len(self._idle) < self.maxsize:
+            self._idle.append((conn, time.monotonic()))
+        else:
+            conn.close()
+
+    def _encode_request(self, method, path, body, headers):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        body = body or b""
+        lines = ["%s %s HTTP/1.1" % (method, path), "Host: %s" % self.netloc]
+        for name, value in headers.items():
+            lines.append("%s: %s" % (name, value))
+        lines.append("Content-Length: %d" % len(body))
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    async def _write(self, conn, request, trace=None):
+        """
+        Write the whole request to ``conn``
+
+        :return:
+            when it was written, for the trace
+        """
+        if trace is None:
+            conn.writer.write(request)
+            await conn.writer.drain()
+            return None
+        started = time.perf_counter()
+        conn.writer.write(request)
+        await conn.writer.drain()
+        sent = time.perf_counter()
+        trace.send = sent - started
+        return sent
+
+    async def _read_head(self, conn, trace=None, sent=None):
+        response = await self._read_response(conn)
+        if trace is not None:
+            trace.ttfb = time.perf_counter() - sent
+        return response
+
+    async def _exchange(self, conn, request, trace=None):
+        sent = await self._write(conn, request, trace)
+        return await self._read_head(conn, trace, sent)
+
+    async def _read_response(self, conn):
+        """
+        Read the status line and headers of the next response on ``conn``
+
+        :return:
+            an ``AsyncResponse`` whose ``body`` is ready to be read
+        """
+        reader = conn.reader
+        status_line = await reader.readline()
+        if not status_line:
+            raise http.client.RemoteDisconnected(
+                "Remote end closed connection without response"
+            )
+        parts = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise http.client.BadStatusLine(status_line)
+        version, status = parts[0], parts[1]
+        reason = parts[2] if len(parts) > 2 else ""
+        header_block = await reader.readuntil(b"\r\n\r\n")
+        msg = http.client.parse_headers(io.BytesIO(header_block))
+        response = AsyncResponse(version, int(status), reason, msg)
+        response.body = _AsyncBody(reader, response)
+        return response
+
+    async def _send(self, method, path, body, headers, trace=None):
+        request = self._encode_request(method, path, body, headers or {})
+        conn, reused = await self._get(trace)
+        try:
+            written = False
+            try:
+                sent = await asyncio.wait_for(self._write(conn, request, trace), self.timeout)
+                written = True
+                return conn, await asyncio.wait_for(
+                    self._read_head(conn, trace, sent), self.timeout
+                )
+            except ASYNC_STALE_ERRORS:
+                # as in ConnectionPool, a request the server may have acted on
+                # is only sent again to a read-only endpoint
+                if not reused or (written and path not in SAFE_PATHS):
+                    raise
+                conn.close()
+                conn = await self._connect(trace)
+                return conn, await asyncio.wait_for(
+                    self._exchange(conn, request, trace), self.timeout
+                )
+        except BaseException:
+            conn.close()
+            raise
+
+    def _release(self, conn, response):
+        if response.will_close or not response.body.complete:
+            conn.close()
+        else:
+            self._put(conn)
+
+    async def request(self, method, path, body=None, headers=None, trace=None):
+        """
+        Send a request over a pooled connection and read the whole response
+
+        :return:
+            a ``(response, data)`` tuple
+        """
+        conn, response = await self._send(method, path, body, headers, trace)
+        try:
+            if trace is None:
+                data = await asyncio.wait_for(response.body.read(), self.timeout)
+            else:
+                started = time.perf_counter()
+                data = await asyncio.wait_for(response.body.read(), self.timeout)
+                trace.read = time.perf_counter() - started
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn, response)
+        return response, data
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, path, body=None, headers=None, trace=None):
+        """
+        Send a request and yield the response, whose ``body.read(n)`` reads
+        the body incrementally
+
+        The connection goes back to the pool if the body was read to the end,
+        otherwise it is closed.
+        """
+        conn, response = await self._send(method, path, body, headers, trace)
+        try:
+            yield response
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn, response)
+
+    @contextlib.asynccontextmanager
+    async def pipeline(self):
+        """
+        Yield an ``AsyncPipeline`` for sending several requests over one
+        connection without waiting for each response
+        """
+        pipeline = AsyncPipeline(self)
+        try:
+            yield pipeline
+        finally:
+            pipeline.close()
+
+    def clear(self):
+        """
+        Close every idle connection held by the pool
+        """
+        while self._idle:
+            conn, _ = self._idle.pop()
+            conn.close()
+
+    def __len__(self):
+        return len(self._idle)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+board.py - The latest spot prices in shared memory, for many processes.
+
+One process polls ``spot`` and writes the prices to a ``SpotBoardWriter``.
+Any number of processes attach a ``SpotBoardReader`` by name and read them
+straight out of the shared block, with no requests, copies of the table or
+system calls per read.
+
+The block has a fixed layout: a header, a table of coin symbols, and a
+float64 price per symbol, in the slot order of the symbol table::
+
+    0   magic "CSPB"     4   version (uint32)
+    8   sequence (uint64)
+    16  updated, seconds since the epoch (float64)
+    24  capacity (uint32)   28  coins (uint32)
+    32  capacity * 16 byte ASCII symbols
+    ..  capacity * float64 prices
+
+Updates are published with a seqlock.  The writer makes the sequence odd,
+writes, then makes it even again.  A reader retries any read that saw an
+odd sequence, or a sequence that changed while it was reading, so it never
+returns a half-written table.  Prices are held as floats; use ``spot`` with
+``models=True`` where exact ``Decimal`` prices matter.
+"""
+
+import mmap
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+try:
+    import _posixshmem
+except ImportError:
+    _posixshmem = None
+
+from .errors import APIError
+from .models import SpotPrice, parse
+
+MAGIC = b"CSPB"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sIQdII")
+_SEQUENCE = struct.Struct("<Q")
+_SEQUENCE_OFFSET = 8
+_UPDATED = struct.Struct("<d")
+_UPDATED_OFFSET = 16
+_COUNT = struct.Struct("<I")
+_COUNT_OFFSET = 28
+_SYMBOL = struct.Struct("16s")
+_PRICE = struct.Struct("<d")
+
+# spins on a busy sequence before a reader starts yielding the processor
+_SPINS = 100
+
+
+def _size(capacity):
+    return _HEADER.size + capacity * (_SYMBOL.size + _PRICE.size)
+
+
+def _attach(name):
+    """
+    Map an existing board read-only
+
+    ``SharedMemory`` would register the block with the resource tracker,
+    which unlinks it when the reader exits, so on POSIX the block is opened
+    and mapped directly.
+
+    :return:
+        the mapped buffer and the function that unmaps it
+    """
+    if _posixshmem is None:
+        # Windows has no resource tracker; the block lives while it is mapped
+        memory = shared_memory.SharedMemory(name)
+        return memory.buf, memory.close
+    fd = _posixshmem.shm_open("/" + name.lstrip("/"), os.O_RDONLY, mode=0o600)
+    try:
+        view = mmap.mmap(fd, os.fstat(fd).st_size, prot=mmap.PROT_READ)
+    finally:
+        os.close(fd)
+    return view, view.close
+
+
+class SpotBoardWriter:
+    """
+    Creates a price board and publishes spot prices to it
+
+    Only one process may write to a board.
+
+    :param name:
+        the shared memory name readers attach with, generated when None
+    :param capacity:
+        the most coins the board can hold
+    """
+
+    def __init__(self, name=None, capacity=256):
+        self.capacity = capacity
+        self._memory = shared_memory.SharedMemory(name, create=True, size=_size(capacity))
+        self.name = self._memory.name
+        self._prices_offset = _HEADER.size + capacity * _SYMBOL.size
+        self._slots = {}
+        self._sequence = 0
+        _HEADER.pack_into(self._memory.buf, 0, MAGIC, VERSION, 0, 0.0, capacity, 0)
+
+    def update(self, prices, updated=None):
+        """
+        Publish prices, leaving coins that are not in ``prices`` as they were
+
+        :param prices:
+            a dict of prices keyed by coin, each a ``SpotPrice`` or a number
+        :param updated:
+            when the prices were taken, now by default
+        :raises ValueError:
+            when the prices would need more than ``capacity`` coins
+        """
+        new = [coin for coin in prices if coin not in self._slots]
+        if len(self._slots) + len(new) > self.capacity:
+            raise ValueError(
+                "%d coins do not fit on a board of %d"
+                % (len(self._slots) + len(new), self.capacity)
+            )
+        buf = self._memory.buf
+        self._sequence += 1
+        _SEQUENCE.pack_into(buf, _SEQUENCE_OFFSET, self._sequence)
+        try:
+            for coin in new:
+                slot = self._slots[coin] = len(self._slots)
+                _SYMBOL.pack_into(
+                    buf, _HEADER.size + slot * _SYMBOL.size, coin.encode("ascii")
+                )
+            for coin, price in prices.items():
+                if isinstance(price, SpotPrice):
+                    price = price.price
+                _PRICE.pack_into(
+                    buf, self._prices_offset + self._slots[coin] * _PRICE.size, float(price)
+                )
+            _COUNT.pack_into(buf, _COUNT_OFFSET, len(self._slots))
+            _UPDATED.pack_into(buf, _UPDATED_OFFSET, time.time() if updated is None else updated)
+        finally:
+            self._sequence += 1
+            _SEQUENCE.pack_into(buf, _SEQUENCE_OFFSET, self._sequence)
+
+    def poll(self, client):
+        """
+        Fetch ``spot`` with ``client`` and publish the prices
+
+        :return:
+            the dict of ``SpotPrice`` published
+        :raises APIError:
+            when the API answers with an error
+        """
+        prices = client.spot()
+        if not isinstance(prices, dict):
+            prices = parse("/api/spot", prices)
+        if "status" in prices:
+            raise APIError(
+                "/api/spot failed: %s" % prices.get("message", prices),
+                "/api/spot",
+                response=prices,
+            )
+        self.update(prices)
+        return prices
+
+    def close(self):
+        self._memory.close()
+
+    def unlink(self):
+        """
+        Remove the board; attached readers keep their mapping until closed
+        """
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        self.unlink()
+
+
+class SpotBoardReader:
+    """
+    Reads the prices published to a board by another process
+
+    :param name:
+        the writer's ``name``
+    :param timeout:
+        seconds to keep retrying a read while the board is being written,
+        after which the writer is assumed to have died mid-update
+    :raises ValueError:
+        when ``name`` is not a price board
+    """
+
+    def __init__(self, name, timeout=1.0):
+        self.name = name
+        self.timeout = timeout
+        self._buf, self._unmap = _attach(name)
+        magic, version, _, _, capacity, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self._unmap()
+            raise ValueError("%s is not a version %d price board" % (name, VERSION))
+        self.capacity = capacity
+        self._prices_offset = _HEADER.size + capacity * _SYMBOL.size
+        self._slots = {}
+
+    def _read(self, read):
+        """
+        Call ``read(buf)`` until it runs without the writer touching the board
+
+        :raises TimeoutError:
+            when the board stays mid-update for ``timeout`` seconds
+        """
+        buf = self._buf
+        spins = 0
+        deadline = None
+        while True:
+            before = _SEQUENCE.unpack_from(buf, _SEQUENCE_OFFSET)[0]
+            if not before & 1:
+                try:
+                    value = read(buf)
+                except UnicodeDecodeError:
+                    # a symbol the writer was halfway through, so a torn read
+                    pass
+                else:
+                    if _SEQUENCE.unpack_from(buf, _SEQUENCE_OFFSET)[0] == before:
+                        return value
+            spins += 1
+            if spins > _SPINS:
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + self.timeout
+                elif now > deadline:
+                    raise TimeoutError("price board %s is stuck mid-update" % self.name)
+                os.sched_yield()
+
+    def _read_symbols(self, buf):
+        count = _COUNT.unpack_from(buf, _COUNT_OFFSET)[0]
+        return {
+            _SYMBOL.unpack_from(buf, _HEADER.size + slot * _SYMBOL.size)[0]
+            .rstrip(b"\0")
+            .decode("ascii"): slot
+            for slot in range(len(self._slots), count)
+        }
+
+    def _slot(self, coin):
+        slot = self._slots.get(coin)
+        if slot is None:
+            # the symbol table only grows, so only new entries are read
+            self._slots.update(self._read(self._read_symbols))
+            slot = self._slots.get(coin)
+        return slot
+
+    def price(self, coin):
+        """
+        :return:
+            the latest price of ``coin`` as a float, None if it has none
+        """
+        slot = self._slot(coin)
+        if slot is None:
+            return None
+        offset = self._prices_offset + slot * _PRICE.size
+        return self._read(lambda buf: _PRICE.unpack_from(buf, offset)[0])
+
+    def __getitem__(self, coin):
+        price = self.price(coin)
+        if price is None:
+            raise KeyError(coin)
+        return price
+
+    def prices(self):
+        """
+        :return:
+            a consistent snapshot of every price, a dict keyed by coin
+        """
+
+        def read(buf):
+            symbols = self._read_symbols(buf)
+            count = _COUNT.unpack_from(buf, _COUNT_OFFSET)[0]
+            values = struct.unpack_from("<%dd" % count, buf, self._prices_offset)
+            slots = dict(self._slots, **symbols)
+            return symbols, {coin: values[slot] for coin, slot in slots.items() if slot < count}
+
+        # symbols from a torn read are thrown away with it, so only merge
+        # them once the read is known to be whole
+        symbols, prices = self._read(read)
+        self._slots.update(symbols)
+        return prices
+
+    @property
+    def updated(self):
+        """
+        When the latest prices were taken, in seconds since the epoch, 0.0
+        before the first update
+        """
+        return self._read(lambda buf: _UPDATED.unpack_from(buf, _UPDATED_OFFSET)[0])
+
+    @property
+    def sequence(self):
+        """
+        Grows by two with every update, so a reader can tell when prices
+        have changed
+        """
+        return _SEQUENCE.unpack_from(self._buf, _SEQUENCE_OFFSET)[0]
+
+    def close(self):
+        self._unmap()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
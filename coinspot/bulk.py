@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bulk.py - Placing and cancelling many orders in one pipelined batch.
+
+Sending one order per round trip makes a ladder of fifty orders take fifty
+round trips.  Concurrent requests would be quicker, but CoinSpot rejects a
+nonce that is not greater than the last one it saw for the key, and
+requests racing over separate connections arrive in any order.
+
+Instead the orders are pipelined: each is paced by the client's scheduler,
+stamped with the next nonce and written to one connection without waiting
+for the responses before it, keeping up to ``depth`` in flight.  The
+requests reach the server in nonce order and the whole batch costs about
+one round trip per ``depth`` orders.  Responses come back in the same
+order.  A response saying the connection will close means the server
+processes no later request, so those are sent again on a new connection
+with new nonces, even if writing them failed.  Orders in flight on a
+connection that breaks without saying so are reported as a
+``TransportError`` and never sent twice, since their outcome is unknown.
+
+A transport without ``pipeline``, such as ``RecordingTransport``, sends the
+legs one after another instead.
+"""
+
+import time
+from collections import deque
+
+from .errors import CoinSpotError, TransportError
+from .models import decode
+
+
+class BulkResult:
+    """
+    The outcome of a bulk submission, one entry per leg in the order given
+
+    ``results`` holds each leg's response, as the single call would have
+    returned it, or the exception it failed with.  ``latencies`` holds the
+    seconds from sending each leg to its response, None for a leg that
+    never got one.
+
+    :param legs:
+        the legs submitted
+    """
+
+    __slots__ = ("legs", "results", "latencies", "elapsed", "resent", "pipelined")
+
+    def __init__(self, legs):
+        self.legs = list(legs)
+        self.results = [None] * len(self.legs)
+        self.latencies = [None] * len(self.legs)
+        self.elapsed = 0.0
+        self.resent = 0
+        self.pipelined = False
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __getitem__(self, index):
+        return self.results[index]
+
+    @staticmethod
+    def succeeded(result):
+        """
+        Whether a leg's result is a response with an ``ok`` status
+        """
+        if isinstance(result, Exception) or result is None:
+            return False
+        if not isinstance(result, dict):
+            try:
+                result = decode(result)
+            except ValueError:
+                return False
+        return result.get("status") == "ok"
+
+    @property
+    def failed(self):
+        """
+        The ``(index, result)`` of every leg that failed or was refused
+        """
+        return [
+            (index, result)
+            for index, result in enumerate(self.results)
+            if not self.succeeded(result)
+        ]
+
+    def summary(self):
+        """
+        :return:
+            a dict of the number of ``legs``, how many were ``ok`` and
+            ``failed``, how many were ``resent`` after the server closed the
+            connection, whether they were ``pipelined``, and the
+            ``elapsed`` time and the ``latency_mean`` and ``latency_max`` of
+            the legs, in seconds
+        """
+        failed = len(self.failed)
+        latencies = [latency for latency in self.latencies if latency is not None]
+        return {
+            "legs": len(self.results),
+            "ok": len(self.results) - failed,
+            "failed": failed,
+            "resent": self.resent,
+            "pipelined": self.pipelined,
+            "elapsed": self.elapsed,
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_max": max(latencies) if latencies else None,
+        }
+
+    def __repr__(self):
+        summary = self.summary()
+        return "BulkResult(legs=%d, ok=%d, failed=%d, elapsed=%.3f)" % (
+            summary["legs"],
+            summary["ok"],
+            summary["failed"],
+            summary["elapsed"],
+        )
+
+
+def _sending(client, path, payload):
+    """
+    Stamp and sign a leg once the breaker lets it through, and start its
+    trace
+
+    :return:
+        the ``(params, headers, trace)`` to send
+    """
+    if client._breaker is not None:
+        client._breaker.before(path)
+    params, headers = client._prepare_request(dict(payload))
+    trace = client._start_trace(path)
+    if trace is not None:
+        trace.bytes_out = len(params)
+    return params, headers, trace
+
+
+def _answered(client, path, result, leg, response, data):
+    """
+    Record the response to an in flight ``leg``
+    """
+    index, sent, trace = leg
+    result.latencies[index] = time.perf_counter() - sent
+    if client._debug:
+        client._log_response(response, data)
+    if trace is not None:
+        client._trace_response(trace, response, data)
+    try:
+        client._check_status(path, response, data)
+        value = client._decode(path, data)
+    except Exception as error:
+        # a body that does not parse fails only its own leg, as a bad status does
+        if client._breaker is not None:
+            client._breaker.failure(path)
+        if trace is not None:
+            client._finish_trace(trace, error)
+        result.results[index] = error
+        return
+    if client._breaker is not None:
+        client._breaker.success(path)
+    result.results[index] = value
+    if trace is not None:
+        client._finish_trace(trace)
+
+
+def _failed(client, path, result, legs, error):
+    """
+    Fail every leg in ``legs`` with ``error``
+    """
+    if legs and client._breaker is not None:
+        client._breaker.failure(path)
+    for index, _, trace in legs:
+        result.results[index] = error
+        if trace is not None:
+            client._finish_trace(trace, error)
+
+
+def _requeue(client, path, result, queue, inflight):
+    """
+    Put the legs the server will not answer back at the head of the queue
+    """
+    error = TransportError("%s closed the connection before answering" % path, path)
+    for index, _, trace in reversed(inflight):
+        queue.appendleft(index)
+        if trace is not None:
+            client._finish_trace(trace, error)
+    result.resent += len(inflight)
+    inflight.clear()
+
+
+def submit(client, path, payloads, depth):
+    """
+    Send every payload to ``path``, pipelined when the transport can
+
+    :return:
+        a ``BulkResult`` in the order of ``payloads``
+    """
+    from .coinspot import transport_errors
+
+    started = time.perf_counter()
+    result = BulkResult(payloads)
+    pipeline = getattr(client._pool, "pipeline", None)
+    if pipeline is None:
+        for index, payload in enumerate(result.legs):
+            sent = time.perf_counter()
+            try:
+                result.results[index] = client._request(path, dict(payload))
+            except CoinSpotError as error:
+                result.results[index] = error
+            result.latencies[index] = time.perf_counter() - sent
+        result.elapsed = time.perf_counter() - started
+        return result
+    result.pipelined = True
+    queue = deque(range(len(result.legs)))
+    while queue:
+        inflight = deque()
+        with pipeline() as connection:
+            broken = None
+            while inflight or (queue and broken is None):
+                if broken is None and queue and len(inflight) < depth:
+                    index = queue.popleft()
+                    if client._scheduler is not None:
+                        client._scheduler.acquire(path)
+                    try:
+                        params, headers, trace = _sending(client, path, result.legs[index])
+                    except CoinSpotError as error:
+                        _failed(client, path, result, [(index, None, None)], error)
+                        continue
+                    leg = (index, time.perf_counter(), trace)
+                    try:
+                        connection.send("POST", path, params, headers)
+                    except transport_errors() as error:
+                        # the server may have said it would close and hung up;
+                        # read its answers before judging the legs in flight
+                        broken = client._transport_error(path, error)
+                    inflight.append(leg)
+                    continue
+                leg = inflight.popleft()
+                try:
+                    response, data = connection.receive()
+                except transport_errors() as error:
+                    inflight.appendleft(leg)
+                    error = broken or client._transport_error(path, error)
+                    _failed(client, path, result, inflight, error)
+                    break
+                _answered(client, path, result, leg, response, data)
+                if connection.closed:
+                    _requeue(client, path, result, queue, inflight)
+                    break
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def submit_async(client, path, payloads, depth):
+    """
+    ``submit`` for ``AsyncCoinSpot``
+    """
+    from .aio import ASYNC_TRANSPORT_ERRORS
+
+    started = time.perf_counter()
+    result = BulkResult(payloads)
+    pipeline = getattr(client._pool, "pipeline", None)
+    if pipeline is None:
+        for index, payload in enumerate(result.legs):
+            sent = time.perf_counter()
+            try:
+                result.results[index] = await client._request(path, dict(payload))
+            except CoinSpotError as error:
+                result.results[index] = error
+            result.latencies[index] = time.perf_counter() - sent
+        result.elapsed = time.perf_counter() - started
+        return result
+    result.pipelined = True
+    queue = deque(range(len(result.legs)))
+    while queue:
+        inflight = deque()
+        async with pipeline() as connection:
+            broken = None
+            while inflight or (queue and broken is None):
+                if broken is None and queue and len(inflight) < depth:
+                    index = queue.popleft()
+                    if client._scheduler is not None:
+                        await client._scheduler.acquire_async(path)
+                    try:
+                        params, headers, trace = _sending(client, path, result.legs[index])
+                    except CoinSpotError as error:
+                        _failed(client, path, result, [(index, None, None)], error)
+                        continue
+                    leg = (index, time.perf_counter(), trace)
+                    try:
+                        await connection.send("POST", path, params, headers)
+                    except ASYNC_TRANSPORT_ERRORS as error:
+                        # the server may have said it would close and hung up;
+                        # read its answers before judging the legs in flight
+                        broken = client._transport_error(path, error)
+                    inflight.append(leg)
+                    continue
+                leg = inflight.popleft()
+                try:
+                    response, data = await connection.receive()
+                except ASYNC_TRANSPORT_ERRORS as error:
+                    inflight.appendleft(leg)
+                    error = broken or client._transport_error(path, error)
+                    _failed(client, path, result, inflight, error)
+                    break
+                _answered(client, path, result, leg, response, data)
+                if connection.closed:
+                    _requeue(client, path, result, queue, inflight)
+                    break
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+cache.py - An in-memory response cache for the read-only CoinSpot endpoints.
+
+Only the public market data and balance paths in ``CACHEABLE_PATHS`` are ever
+cached; orders, sends and quotes always go to the exchange.  Each path has its
+own time to live, the cache as a whole is capped in size with least recently
+used entries evicted first, and concurrent callers asking for the same key
+while a request is already in flight wait for that request instead of making
+their own.  Responses from the account paths under ``/api/my/`` are keyed by
+the account as well, so clients for different accounts can share a cache.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_TTLS = {
+    "/api/spot": 1.0,
+    "/api/orders": 1.0,
+    "/api/orders/history": 5.0,
+    "/api/my/balances": 1.0,
+}
+
+CACHEABLE_PATHS = frozenset(DEFAULT_TTLS)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    A TTL and LRU bounded cache of raw responses, keyed by path and payload
+
+    :param ttls:
+        an optional ``{path: seconds}`` dict overriding ``DEFAULT_TTLS``;
+        a ttl of 0 turns caching off for that path but keeps coalescing
+    :param maxsize:
+        the most responses held before the least recently used is evicted
+    """
+
+    def __init__(self, ttls=None, maxsize=256):
+        self.ttls = dict(DEFAULT_TTLS)
+        for path, ttl in (ttls or {}).items():
+            if path not in CACHEABLE_PATHS:
+                raise ValueError("%s responses can not be cached" % path)
+            self.ttls[path] = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def cacheable(self, path):
+        return path in CACHEABLE_PATHS
+
+    @staticmethod
+    def key(path, postdata, owner=None):
+        if not path.startswith("/api/my/"):
+            owner = None
+        return path, owner, tuple(sorted(postdata.items()))
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            del self._entries[key]
+        return False, None
+
+    def _store(self, key, value):
+        ttl = self.ttls[key[0]]
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def fetch(self, path, postdata, request, owner=None):
+        """
+        Return the cached response for ``path`` and ``postdata``, calling
+        ``request()`` to fetch it when there is none
+
+        Callers that miss while another thread is already fetching the same
+        key wait for and share that thread's response or exception.  ``owner``
+        names the account making the call; responses from the account paths
+        are only shared between callers with the same owner.
+        """
+        key = self.key(path, postdata, owner)
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = request()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None:
+                    self._store(key, call.value)
+            call.done.set()
+        return call.value
+
+    async def fetch_async(self, path, postdata, request, owner=None):
+        """
+        The asyncio version of ``fetch``, where ``request()`` returns an awaitable
+        """
+        import asyncio
+
+        key = self.key(path, postdata, owner)
+        inflight_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            future = self._inflight.get(inflight_key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = self._inflight[inflight_key] = asyncio.ensure_future(request())
+                future.add_done_callback(lambda done: self._finish_async(inflight_key, done))
+        return await asyncio.shield(future)
+
+    def _finish_async(self, inflight_key, future):
+        with self._lock:
+            del self._inflight[inflight_key]
+            if not future.cancelled() and future.exception() is None:
+                self._store(inflight_key[1], future.result())
+
+    def invalidate(self, path=None):
+        """
+        Drop every cached response, or only those for ``path``
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+    def stats(self):
+        """
+        :return:
+            - **size** - the number of responses held
+            - **hits** - lookups answered from the cache
+            - **misses** - lookups that went to the exchange
+            - **coalesced** - lookups that shared a request already in flight
+        """
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    def __len__(self):
+        return len(self._entries)
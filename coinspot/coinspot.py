@@ -25,20 +25,40 @@ GNU General Public License for more details.
 
 """
 
-import hmac
-import hashlib
+import os
+import threading
+from decimal import Decimal
+from time import monotonic, perf_counter, sleep, strftime
+
+from .config import CoinSpotConfig, Profile, default_path
+from .errors import APIError, CoinSpotError, HTTPStatusError, TransportError
+from .jsonstream import ArrayStreamDecoder
+from .metrics import HookChain, RequestTrace
+from .models import parse, parse_order
+from .nonce import default_nonce
+from .resilience import HEDGED_PATHS
+from .signing import SigningContext, redacted
+from .trades import TradeDeduplicator, history_rows
+
+
+def transport_errors():
+    """
+    The errors that mean a request could not be sent or its response read
 
-try:
-    import httplib
-except:
+    Used as ``except transport_errors():``, which is only evaluated once
+    something has been raised, so importing the client does not load
+    ``http.client``.
+    """
     import http.client
-import json
-import yaml
-import os
-import sys
-import logging
-from time import time, strftime
-import requests
+
+    return (IOError, http.client.HTTPException)
+
+
+LOG_FORMAT = "%(asctime)s %(message)s"
+LOG_DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+# guards adding the log file handler when clients start up in several threads
+_logging_lock = threading.Lock()
 
 
 class CoinSpot:
@@ -51,118 +71,479 @@ class CoinSpot:
     _endpoint = "www.coinspot.com.au"
     _logging = "coinspot.log"
     _debug = False
+    # the Profile the credentials came from, None when nothing was configured
+    profile = None
+    _pool_size = 4
+    _pool_idle_timeout = 30.0
+    _max_workers = 8
+
+    # the endpoint methods that make one request, which map_requests runs
+    _api_calls = frozenset(
+        (
+            "sendcoin",
+            "coindeposit",
+            "quotebuy",
+            "quotesell",
+            "spot",
+            "balances",
+            "orderhistory",
+            "orders",
+            "myorders",
+            "buy",
+            "sell",
+            "cancelbuy",
+            "cancelsell",
+        )
+    )
 
     """
     coinspot class implementing API calls for the coinspot API
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        pool_size=None,
+        pool_idle_timeout=None,
+        ssl_context=None,
+        scheduler=None,
+        cache=None,
+        models=False,
+        nonce=None,
+        retry=None,
+        breaker=None,
+        hedge_after=None,
+        metrics=None,
+        transport=None,
+        logger=None,
+        config=None,
+        profile=None,
+    ):
+        """
+        :param pool_size:
+            the number of idle keep-alive connections to hold open, default 4
+        :param pool_idle_timeout:
+            seconds before an idle connection is dropped, default 30
+        :param ssl_context:
+            an optional ``ssl.SSLContext`` for the HTTPS connections
+        :param scheduler:
+            an optional ``RequestScheduler`` pacing every request
+        :param cache:
+            an optional ``ResponseCache`` for the read-only endpoints
+        :param models:
+            return parsed ``coinspot.models`` objects instead of raw JSON
+        :param nonce:
+            a callable returning increasing nonces, such as a ``SharedNonce``
+            when several processes use the same key; by default one
+            ``MonotonicNonce`` is shared by every client in the process
+        :param retry:
+            an optional ``RetryPolicy`` for failed read-only requests
+        :param breaker:
+            an optional ``CircuitBreaker`` shared by the endpoints
+        :param hedge_after:
+            seconds after which a ``spot`` request that has not been answered
+            is sent again, the first response winning; off by default
+        :param metrics:
+            an optional ``MetricsHook``, such as ``coinspot.metrics.Metrics``,
+            or a list of them, told about every request
+        :param transport:
+            send requests through this object instead of a new connection
+            pool; it needs the ``request``, ``stream`` and ``clear`` methods
+            of ``coinspot.transport.ConnectionPool``, see ``coinspot.replay``
+        :param logger:
+            the ``logging.Logger`` debug output goes to, by default the
+            ``coinspot.coinspot`` logger
+        :param config:
+            a ``CoinSpotConfig`` or ``Profile`` to take the credentials,
+            endpoint and logging options from, instead of the environment
+            and ``config.yml``
+        :param profile:
+            the name of the profile in ``config`` to use, its default when
+            None; given without ``config``, the profile is loaded from
+            ``config.yml``
+        :raises ConfigError:
+            when ``config`` or ``profile`` was given and names no usable
+            profile, or when ``config.yml`` exists but cannot be read or
+            parsed
+        """
+        # when the client was made; log lines carry their own time
         self.timestamp = strftime("%d/%m/%Y %H:%M:%S")
-        self.loader()
+        self._logger = logger
+        self._scheduler = scheduler
+        self._cache = cache
+        self._models = models
+        self._nonce_source = nonce or default_nonce
+        self._retry = retry
+        self._breaker = breaker
+        self._hedge_after = hedge_after
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+        if isinstance(metrics, (list, tuple)):
+            metrics = HookChain(metrics)
+        self._metrics = metrics
+        if isinstance(config, Profile):
+            self.use_profile(config)
+        elif config is not None or profile is not None:
+            if config is None:
+                config = CoinSpotConfig.load()
+            self.use_profile(config.profile(profile))
+        else:
+            self.loader()
+        if pool_size is not None:
+            self._pool_size = pool_size
+        if pool_idle_timeout is not None:
+            self._pool_idle_timeout = pool_idle_timeout
+        if transport is None:
+            transport = self._make_pool(ssl_context)
+        self._pool = transport
         if self._debug:
+            self._pool.debuglevel = 1
             self.start_logging()
 
+    def _make_pool(self, ssl_context):
+        from .transport import ConnectionPool
+
+        return ConnectionPool(
+            self._endpoint,
+            maxsize=self._pool_size,
+            idle_timeout=self._pool_idle_timeout,
+            context=ssl_context,
+        )
+
     def loader(self):
         """
         Step 1 First we look for globals in the form:
          COINSPOT_API_KEY
          COINSPOT_SECRET_KEY
-        """
-        try:
-            self._api_key = os.environ["COINSPOT_API_KEY"]
-            self._api_secret = os.environ["COINSPOT_SECRET_KEY"]
-            # ok got enough to run
-            return
-        except:
-            pass
 
+        Step 2 Second we look for the localest yaml file - closest to executing
+        code, read once per process and again only when it changes
+
+        Step 3 Carry on - we dont care if there is no config file - we might be
+        testing; a config file that is there but broken raises ``ConfigError``
+        rather than leaving the client without credentials
         """
-        Step 2  Second we look for the localest yaml file - closest to executing code
+        settings = CoinSpotConfig.from_env()
+        if settings is None:
+            path = default_path()
+            if not os.path.exists(path):
+                return
+            settings = CoinSpotConfig.load(path)
+        self.use_profile(settings.profile())
+
+    def use_profile(self, profile):
         """
-        try:
-            config = yaml.load(
-                open(
-                    os.path.realpath(os.path.dirname(sys.argv[0])) + "/config.yml", "r"
-                ),
-                Loader=yaml.SafeLoader,
-            )
-            # these must be set
-            self._api_key = config["api"]["key"]
-            self._api_secret = config["api"]["secret"]
-            # these are optional  - wrap some code around this
-            self._endpoint = config["api"]["endpoint"]
-            self._logging = config["logfile"]
-            self._debug = config["debug"]
-            # ok we are good to run
-            print(self)
-            return
-        except IOError as error:
-            pass
-        except:
-            pass
+        Take the credentials, endpoint and logging options of a ``Profile``
 
+        Call before the first request; the connection pool is made for the
+        endpoint in use when the client is created.
         """
-        Step 3 Carry on - we dont care if there is no config file - we might be testing
+        self.profile = profile
+        self._api_key = profile.key
+        self._api_secret = profile.secret
+        self._endpoint = profile.endpoint
+        self._logging = profile.logfile
+        self._debug = profile.debug
+
+    @property
+    def logger(self):
         """
+        The ``logging.Logger`` debug output goes to, by default the
+        ``coinspot.coinspot`` logger; ``logging`` is only imported once a
+        client needs it
+        """
+        if self._logger is None:
+            import logging
+
+            self._logger = logging.getLogger(__name__)
+        return self._logger
+
+    @logger.setter
+    def logger(self, logger):
+        self._logger = logger
 
     def start_logging(self):
-        logging.basicConfig(
-            filename=os.path.realpath(os.path.dirname(sys.argv[0]))
-            + "/"
-            + self._logging,
-            level=logging.DEBUG,
-        )
+        """
+        Send this client's debug output to the configured log file, adding
+        the file to ``self.logger`` once however many clients share it, and
+        leaving the root logger alone
+        """
+        import logging
+
+        filename = os.path.join(os.path.dirname(default_path()), self._logging)
+        with _logging_lock:
+            for handler in self.logger.handlers:
+                if getattr(handler, "baseFilename", None) == filename:
+                    break
+            else:
+                handler = logging.FileHandler(filename)
+                handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+                self.logger.addHandler(handler)
+            self.logger.setLevel(logging.DEBUG)
+
+    def _signing_context(self):
+        """
+        The ``SigningContext`` for the current key and secret, rebuilt only
+        when either has been changed
+        """
+        signer = self.__dict__.get("_signer")
+        if (
+            signer is None
+            or signer.api_key is not self._api_key
+            or signer.api_secret is not self._api_secret
+        ):
+            signer = self._signer = SigningContext(
+                self._api_key, self._api_secret, __version__
+            )
+        return signer
 
     def _get_signed_request(self, data):
-        print(self)
-        # print(hmac.new(key.encode('utf-8'), data.encode('utf-8'), hashlib.sha512).hexdigest()
-        return hmac.new(
-            str((self._api_secret)).encode("utf-8"),
-            data.encode("utf-8"),
-            hashlib.sha512,
-        ).hexdigest()
+        return self._signing_context().sign(data)
+
+    def _nonce(self):
+        return self._nonce_source()
+
+    def _prepare_request(self, postdata):
+        """
+        Stamp the payload with a nonce, serialise and sign it
+
+        :return:
+            a ``(params, headers)`` tuple ready to POST
+        """
+        postdata["nonce"] = self._nonce()
+        params, headers = self._signing_context().prepare(postdata)
+        if self._debug:
+            self.logger.debug("%s", redacted(headers))
+        return params, headers
+
+    def _log_response(self, response, response_data):
+        self.logger.debug("%s", response)
+        self.logger.debug("%s", response.msg)
+        self.logger.debug("%s", response_data)
 
     def _request(self, path, postdata):
-        nonce = int(time() * 1000000)
-        postdata["nonce"] = nonce
-        params = json.dumps(postdata, separators=(",", ":"))
-        signedMessage = self._get_signed_request(params)
-        headers = {}
-        headers["Content-type"] = "application/json"
-        headers["Accept"] = "text/plain"
-        headers["key"] = self._api_key
-        headers["sign"] = signedMessage
-        headers["User-Agent"] = (
-            "py-coinspot-api/%s (https://github.com/geekpete/py-coinspot-api)"
-            % __version__
+        if self._cache is not None and self._cache.cacheable(path):
+            return self._cache.fetch(
+                path, postdata, lambda: self._send(path, postdata), self._api_key
+            )
+        return self._send(path, postdata)
+
+    def _send(self, path, postdata):
+        """
+        Send a request through the circuit breaker, retrying it as the retry
+        policy allows, and decode the response
+
+        :raises CoinSpotError:
+            if the request failed for good
+        """
+        retry = self._retry.delays(path) if self._retry is not None else iter(())
+        while True:
+            try:
+                return self._attempt(path, postdata)
+            except CoinSpotError as error:
+                delay = next(retry, None) if error.retryable else None
+                if delay is None:
+                    raise
+                if self._debug:
+                    self.logger.debug("retrying %s in %.3fs after %s", path, delay, error)
+                sleep(delay)
+
+    def _attempt(self, path, postdata):
+        breaker = self._breaker
+        if breaker is not None:
+            breaker.before(path)
+        try:
+            if self._hedge_after is not None and path in HEDGED_PATHS:
+                response_data = self._hedged(path, postdata)
+            else:
+                response_data = self._fetch(path, postdata)
+        except Exception:
+            # any error counts, a body that does not parse included
+            if breaker is not None:
+                breaker.failure(path)
+            raise
+        except BaseException:
+            # a cancelled request says nothing about the endpoint, but must
+            # not leave a half-open circuit waiting on its trial for good
+            if breaker is not None:
+                breaker.abandon(path)
+            raise
+        if breaker is not None:
+            breaker.success(path)
+        return response_data
+
+    def _hedged(self, path, postdata):
+        """
+        Send the request, and a second copy if the first has not been answered
+        within ``hedge_after`` seconds
+
+        :return:
+            whichever response arrives first
+        """
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self._max_workers)
+            executor = self._hedge_executor
+        first = executor.submit(self._fetch, path, dict(postdata))
+        done, _ = wait((first,), timeout=self._hedge_after)
+        if done:
+            return first.result()
+        pending = {first, executor.submit(self._fetch, path, dict(postdata))}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except CoinSpotError as failure:
+                    error = failure
+        raise error
+
+    def _fetch(self, path, postdata):
+        """
+        Send one request and decode its response
+
+        :raises TransportError:
+            if the request could not be sent or the response not read
+        :raises HTTPStatusError:
+            on a 429 or 5xx response
+        """
+        if self._scheduler is not None:
+            self._scheduler.acquire(path)
+        params, headers = self._prepare_request(postdata)
+        # started once there is a request to send, so a payload that fails to
+        # sign never counts as in flight
+        trace = self._start_trace(path)
+        if trace is not None:
+            trace.bytes_out = len(params)
+        try:
+            try:
+                response, response_data = self._pool.request(
+                    "POST", path, params, headers, trace=trace
+                )
+            except transport_errors() as error:
+                raise self._transport_error(path, error) from error
+            if self._debug:
+                self._log_response(response, response_data)
+            if trace is not None:
+                self._trace_response(trace, response, response_data)
+            self._check_status(path, response, response_data)
+            if trace is None:
+                return self._decode(path, response_data)
+            started = perf_counter()
+            result = self._decode(path, response_data)
+            trace.parse = perf_counter() - started
+        except BaseException as error:
+            if trace is not None:
+                self._finish_trace(trace, error)
+            raise
+        self._finish_trace(trace)
+        return result
+
+    def _start_trace(self, path):
+        if self._metrics is None:
+            return None
+        trace = RequestTrace(path)
+        self._metrics.request_started(trace)
+        return trace
+
+    def _trace_response(self, trace, response, response_data):
+        trace.status = response.status
+        if response_data is not None:
+            trace.bytes_in = len(response_data)
+
+    def _finish_trace(self, trace, error=None):
+        trace.finish(error)
+        self._metrics.request_finished(trace)
+
+    def _transport_error(self, path, error):
+        error_text = "Attempting to make request I/O error({0}): {1}".format(
+            getattr(error, "errno", None), getattr(error, "strerror", None) or error
         )
         if self._debug:
-            logging.warning(self.timestamp + " " + str(headers))
-        conn = http.client.HTTPSConnection(self._endpoint)
-        if self._debug:
-            conn.set_debuglevel(1)
-        response_data = '{"status":"invalid","error": "Did not make request"}'
+            self.logger.debug("%s", error_text)
+        return TransportError(error_text, path)
+
+    def _check_status(self, path, response, response_data):
+        if response.status == 429 or response.status >= 500:
+            raise HTTPStatusError(
+                "%s returned HTTP %d %s" % (path, response.status, response.reason),
+                path,
+                status=response.status,
+                body=response_data,
+            )
+
+    def _stream(self, path, postdata, keys, chunk_size):
+        """
+        Send a request and decode the elements of the ``keys`` arrays as
+        they arrive
+
+        A traced stream records its connect, send and time to first byte
+        phases but not read or parse, which run interleaved with the caller.
+
+        :return:
+            a generator of ``(key, row)`` tuples
+        :raises TransportError:
+            if the connection fails
+        :raises APIError:
+            if the response status is not ok
+        """
+        if self._scheduler is not None:
+            self._scheduler.acquire(path)
+        params, headers = self._prepare_request(postdata)
+        trace = self._start_trace(path)
+        if trace is not None:
+            trace.bytes_out = len(params)
+        decoder = self._stream_decoder(keys)
         try:
-            conn.request("POST", path, params, headers)
-            response = conn.getresponse()
-            if self._debug:
-                logging.warning(self.timestamp + " " + str(response))
-                logging.warning(self.timestamp + " " + str(response.msg))
-            # print response.status, response.reason
-            response_data = response.read()
-            if self._debug:
-                logging.warning(self.timestamp + " " + str(response_data))
-            conn.close()
-        except IOError as error:
-            if self._debug:
-                error_text = "Attempting to make request I/O error({0}): {1}".format(
-                    error.errno, error.strerror
-                )
-                logging.warning(self.timestamp + " " + error_text)
-                response_data = '{"status":"invalid","error": "' + error_text + '"}'
-        except:
-            exit("Unexpected error: {0}".format(sys.exc_info()[0]))
+            try:
+                with self._pool.stream(
+                    "POST", path, params, headers, trace=trace
+                ) as response:
+                    if trace is not None:
+                        self._trace_response(trace, response, None)
+                    self._check_status(path, response, None)
+                    while True:
+                        chunk = response.read(chunk_size)
+                        if trace is not None:
+                            trace.bytes_in += len(chunk)
+                        rows = decoder.feed(chunk) if chunk else decoder.close()
+                        for key, row in rows:
+                            yield key, self._stream_row(row)
+                        if not chunk:
+                            break
+            except transport_errors() as error:
+                raise self._transport_error(path, error) from error
+            self._check_stream(path, decoder)
+        except GeneratorExit:
+            if trace is not None:
+                self._finish_trace(trace)
+            raise
+        except BaseException as error:
+            if trace is not None:
+                self._finish_trace(trace, error)
+            raise
+        if trace is not None:
+            self._finish_trace(trace)
+
+    def _stream_decoder(self, keys):
+        return ArrayStreamDecoder(keys, parse_float=Decimal if self._models else None)
+
+    def _stream_row(self, row):
+        return parse_order(row) if self._models else row
+
+    def _check_stream(self, path, decoder):
+        if decoder.values.get("status") != "ok":
+            raise APIError(
+                "%s failed: %s" % (path, decoder.values.get("message", decoder.values)),
+                path,
+                response=decoder.values,
+            )
 
+    def _decode(self, path, response_data):
+        if self._models:
+            return parse(path, response_data)
         return response_data
 
     def sendcoin(self, cointype, address, amount):
@@ -285,6 +666,46 @@ class CoinSpot:
         request_data = {"cointype": cointype}
         return self._request("/api/orders", request_data)
 
+    def orders_stream(self, cointype, chunk_size=8192):
+        """
+        Lists all open orders, decoded incrementally as the response arrives
+
+        Memory use stays bounded by ``chunk_size`` however large the book is.
+        The response is not cached.
+
+        :param cointype:
+            the coin shortname in uppercase, example value 'BTC', 'LTC', 'DOGE'
+        :param chunk_size:
+            bytes read from the connection at a time
+        :return:
+            a generator of ``("buyorders", order)`` and ``("sellorders", order)``
+            tuples, in the order the response lists them
+        """
+        request_data = {"cointype": cointype}
+        return self._stream(
+            "/api/orders", request_data, ("buyorders", "sellorders"), chunk_size
+        )
+
+    def orderhistory_stream(self, cointype, chunk_size=8192):
+        """
+        Lists the last 1000 completed orders, decoded incrementally as the
+        response arrives
+
+        :param cointype:
+            the coin shortname in uppercase, example value 'BTC', 'LTC', 'DOGE'
+        :param chunk_size:
+            bytes read from the connection at a time
+        :return:
+            a generator of completed orders
+        """
+        request_data = {"cointype": cointype}
+        return (
+            order
+            for _, order in self._stream(
+                "/api/orders/history", request_data, ("orders",), chunk_size
+            )
+        )
+
     def myorders(self):
         """
         List my buy and sell orders
@@ -329,4 +750,262 @@ class CoinSpot:
 
         """
         request_data = {"cointype": cointype, "amount": amount, "rate": rate}
-        self._request("/api/my/sell", request_data)
+        return self._request("/api/my/sell", request_data)
+
+    def cancelbuy(self, orderid):
+        """
+        Cancel a buy order
+
+        :param orderid:
+            the id of the order to cancel
+        :return:
+            - **status** - ok, error
+
+        """
+        request_data = {"id": orderid}
+        return self._request("/api/my/buy/cancel", request_data)
+
+    def cancelsell(self, orderid):
+        """
+        Cancel a sell order
+
+        :param orderid:
+            the id of the order to cancel
+        :return:
+            - **status** - ok, error
+
+        """
+        request_data = {"id": orderid}
+        return self._request("/api/my/sell/cancel", request_data)
+
+    def _submit(self, path, payloads, depth):
+        from .bulk import submit
+
+        return submit(self, path, payloads, depth or self._max_workers)
+
+    def buy_many(self, legs, depth=None):
+        """
+        Place several buy orders in one pipelined batch, see ``coinspot.bulk``
+
+        The orders are sent in the order given, with increasing nonces, over
+        one connection without waiting a round trip for each, paced by the
+        client's scheduler.
+
+        :param legs:
+            a list of ``(cointype, amount, rate)`` tuples, example value
+            [('BTC', 0.01, 50000), ('BTC', 0.01, 49500)]
+        :param depth:
+            the most orders sent ahead of their responses, default 8
+        :return:
+            a ``BulkResult`` of the responses in the order of ``legs``, with
+            a failed order's exception in place of its response, and a
+            ``summary()`` of counts and timings
+        """
+        payloads = [
+            {"cointype": cointype, "amount": amount, "rate": rate}
+            for cointype, amount, rate in legs
+        ]
+        return self._submit("/api/my/buy", payloads, depth)
+
+    def sell_many(self, legs, depth=None):
+        """
+        Place several sell orders in one pipelined batch, see ``buy_many``
+
+        :param legs:
+            a list of ``(cointype, amount, rate)`` tuples
+        :param depth:
+            the most orders sent ahead of their responses, default 8
+        :return:
+            a ``BulkResult`` of the responses in the order of ``legs``
+        """
+        payloads = [
+            {"cointype": cointype, "amount": amount, "rate": rate}
+            for cointype, amount, rate in legs
+        ]
+        return self._submit("/api/my/sell", payloads, depth)
+
+    def cancelbuy_many(self, orderids, depth=None):
+        """
+        Cancel several buy orders in one pipelined batch, see ``buy_many``
+
+        :param orderids:
+            a list of the ids of the orders to cancel
+        :param depth:
+            the most requests sent ahead of their responses, default 8
+        :return:
+            a ``BulkResult`` of the responses in the order of ``orderids``
+        """
+        return self._submit("/api/my/buy/cancel", [{"id": i} for i in orderids], depth)
+
+    def cancelsell_many(self, orderids, depth=None):
+        """
+        Cancel several sell orders in one pipelined batch, see ``buy_many``
+
+        :param orderids:
+            a list of the ids of the orders to cancel
+        :param depth:
+            the most requests sent ahead of their responses, default 8
+        :return:
+            a ``BulkResult`` of the responses in the order of ``orderids``
+        """
+        return self._submit("/api/my/sell/cancel", [{"id": i} for i in orderids], depth)
+
+    def _fan_out(self, method, cointypes, max_workers):
+        """
+        Call ``method`` once per coin over a bounded pool of worker threads
+
+        :return:
+            a generator of ``(cointype, result)`` tuples in completion order,
+            where a failed call yields the exception instead of a result
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        executor = ThreadPoolExecutor(max_workers=max_workers or self._max_workers)
+        try:
+            futures = {
+                executor.submit(method, cointype): cointype for cointype in cointypes
+            }
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as error:
+                    yield futures[future], error
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_orders(self, cointypes, max_workers=None):
+        """
+        Fetch the open orders for several coins concurrently
+
+        :param cointypes:
+            a list of coin shortnames, example value ['BTC', 'LTC', 'DOGE']
+        :param max_workers:
+            the most requests to have in flight at once, default 8
+        :return:
+            a generator of ``(cointype, response)`` tuples yielded as each
+            request completes; a failed request yields its exception
+        """
+        return self._fan_out(self.orders, cointypes, max_workers)
+
+    def iter_orderhistory(self, cointypes, max_workers=None):
+        """
+        Fetch the last 1000 completed orders for several coins concurrently
+
+        :param cointypes:
+            a list of coin shortnames, example value ['BTC', 'LTC', 'DOGE']
+        :param max_workers:
+            the most requests to have in flight at once, default 8
+        :return:
+            a generator of ``(cointype, response)`` tuples yielded as each
+            request completes; a failed request yields its exception
+        """
+        return self._fan_out(self.orderhistory, cointypes, max_workers)
+
+    def orders_many(self, cointypes, max_workers=None):
+        """
+        Lists all open orders for several coins, fetched concurrently
+
+        :param cointypes:
+            a list of coin shortnames, example value ['BTC', 'LTC', 'DOGE']
+        :param max_workers:
+            the most requests to have in flight at once, default 8
+        :return:
+            a dict of ``orders`` responses keyed by coin; a coin whose request
+            failed maps to the exception raised
+        """
+        return dict(self.iter_orders(cointypes, max_workers))
+
+    def orderhistory_many(self, cointypes, max_workers=None):
+        """
+        Lists the last 1000 completed orders for several coins, fetched concurrently
+
+        :param cointypes:
+            a list of coin shortnames, example value ['BTC', 'LTC', 'DOGE']
+        :param max_workers:
+            the most requests to have in flight at once, default 8
+        :return:
+            a dict of ``orderhistory`` responses keyed by coin; a coin whose
+            request failed maps to the exception raised
+        """
+        return dict(self.iter_orderhistory(cointypes, max_workers))
+
+    def _bound_calls(self, calls):
+        """
+        Resolve each of ``calls`` to a ``(method, args)`` pair
+
+        :raises AttributeError:
+            for a name that is not one of the ``_api_calls``
+        """
+        bound = []
+        for call in calls:
+            if isinstance(call, str):
+                call = (call,)
+            name, args = call[0], tuple(call[1:])
+            if name not in self._api_calls:
+                raise AttributeError("%r is not an API call" % name)
+            bound.append((getattr(self, name), args))
+        return bound
+
+    def map_requests(self, calls, max_workers=None):
+        """
+        Make several API calls in parallel over the client's connection pool
+
+        One client may be shared by any number of threads, so this is the
+        same as calling each method from its own thread.
+
+        :param calls:
+            a list of endpoint method names, or tuples of the name and its
+            arguments, example value ['spot', ('orders', 'BTC'),
+            ('quotebuy', 'BTC', 0.5)]
+        :param max_workers:
+            the most requests to have in flight at once, default 8
+        :return:
+            the list of responses in the order of ``calls``; a failed call
+            gives the exception it raised in place of its response
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        bound = self._bound_calls(calls)
+        executor = ThreadPoolExecutor(max_workers=max_workers or self._max_workers)
+        try:
+            futures = [executor.submit(method, *args) for method, args in bound]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    results.append(error)
+            return results
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_trades(self, cointypes, interval=5.0, max_workers=None, maxlen=2048):
+        """
+        Poll the order history of several coins and yield only new trades
+
+        Each poll fetches the coins concurrently and drops trades already
+        yielded, matching on solddate, amount and rate.  Memory use is bounded
+        by ``maxlen`` per coin however long the generator runs.  Coins whose
+        request fails are skipped until the next poll.
+
+        :param cointypes:
+            a list of coin shortnames, example value ['BTC', 'LTC', 'DOGE']
+        :param interval:
+            seconds between the start of one poll and the next
+        :param max_workers:
+            the most requests to have in flight at once, default 8
+        :param maxlen:
+            trades remembered per coin for de-duplication
+        :return:
+            a generator of ``(cointype, trade)`` tuples, each coin's trades
+            oldest first
+        """
+        trades = TradeDeduplicator(maxlen)
+        while True:
+            started = monotonic()
+            for cointype, response in self.iter_orderhistory(cointypes, max_workers):
+                if isinstance(response, Exception):
+                    continue
+                for trade in trades.new_trades(cointype, history_rows(response)):
+                    yield cointype, trade
+            sleep(max(0, interval - (monotonic() - started)))
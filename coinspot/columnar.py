@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+columnar.py - Column oriented views of order books and order history.
+
+Each side of a book, or a coin's trade history, is held as contiguous
+``array`` columns of rate, amount, total and solddate instead of a list of
+dicts, and the analytics helpers work a whole column at a time.  When NumPy
+is installed the helpers use it, and ``as_numpy`` hands out zero-copy NumPy
+views of the columns; without it they fall back to the builtins, which still
+run over the arrays in C rather than per row in Python.
+"""
+
+import itertools
+import json
+import math
+import operator
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class OrderColumns:
+    """
+    Orders stored column-wise
+
+    ``rate``, ``amount`` and ``total`` are ``array('d')``; ``solddate`` is an
+    ``array('q')`` of milliseconds since the epoch, 0 for open orders.
+    """
+
+    __slots__ = ("coin", "rate", "amount", "total", "solddate")
+
+    def __init__(self, coin=None, rate=(), amount=(), total=(), solddate=()):
+        self.coin = coin
+        self.rate = array("d", rate)
+        self.amount = array("d", amount)
+        self.total = array("d", total)
+        self.solddate = array("q", solddate)
+
+    @classmethod
+    def from_rows(cls, rows, coin=None):
+        """
+        Build the columns from decoded order dicts or ``coinspot.models.Order``
+        """
+        if rows and not isinstance(rows[0], dict):
+            get = operator.attrgetter
+            solddates = (order.solddate or 0 for order in rows)
+        else:
+            get = operator.itemgetter
+            solddates = (row.get("solddate") or 0 for row in rows)
+        if coin is None and rows:
+            coin = get("coin")(rows[0])
+        return cls(
+            coin,
+            map(float, map(get("rate"), rows)),
+            map(float, map(get("amount"), rows)),
+            map(float, map(get("total"), rows)),
+            solddates,
+        )
+
+    def __len__(self):
+        return len(self.rate)
+
+    def as_numpy(self):
+        """
+        :return:
+            a dict of NumPy arrays sharing memory with the columns
+        """
+        if numpy is None:
+            raise ImportError("numpy is required for as_numpy()")
+        return {
+            "rate": numpy.frombuffer(self.rate, dtype=numpy.float64),
+            "amount": numpy.frombuffer(self.amount, dtype=numpy.float64),
+            "total": numpy.frombuffer(self.total, dtype=numpy.float64),
+            "solddate": numpy.frombuffer(self.solddate, dtype=numpy.int64),
+        }
+
+    def volume(self):
+        """
+        The total amount of coin across all orders
+        """
+        return math.fsum(self.amount)
+
+    def vwap(self):
+        """
+        The volume weighted average rate, None when there are no orders
+        """
+        amount = math.fsum(self.amount)
+        if not amount:
+            return None
+        return math.fsum(self.total) / amount
+
+    def cumulative_volume(self):
+        """
+        The running total of amount, in the order the orders are stored
+
+        :return:
+            an ``array('d')``, or a NumPy array when NumPy is installed
+        """
+        if numpy is not None:
+            return numpy.cumsum(self.as_numpy()["amount"])
+        return array("d", itertools.accumulate(self.amount))
+
+    def volume_where(self, predicate, price):
+        """
+        The amount of coin in orders whose rate satisfies ``predicate(rate, price)``
+
+        :param predicate:
+            a comparison from the ``operator`` module, example ``operator.ge``
+        """
+        if numpy is not None:
+            columns = self.as_numpy()
+            return float(columns["amount"][predicate(columns["rate"], price)].sum())
+        return math.fsum(
+            itertools.compress(self.amount, map(predicate, self.rate, itertools.repeat(price)))
+        )
+
+
+class OrderBookColumns:
+    """
+    A coin's open buy and sell orders as two ``OrderColumns``
+    """
+
+    __slots__ = ("coin", "buyorders", "sellorders")
+
+    def __init__(self, coin, buyorders, sellorders):
+        self.coin = coin
+        self.buyorders = buyorders
+        self.sellorders = sellorders
+
+    @classmethod
+    def from_response(cls, data):
+        buyorders = OrderColumns.from_rows(data["buyorders"])
+        sellorders = OrderColumns.from_rows(data["sellorders"])
+        return cls(buyorders.coin or sellorders.coin, buyorders, sellorders)
+
+    def best_bid(self):
+        return max(self.buyorders.rate) if len(self.buyorders) else None
+
+    def best_ask(self):
+        return min(self.sellorders.rate) if len(self.sellorders) else None
+
+    def depth_at(self, price):
+        """
+        The coin available to trade at ``price`` or better
+
+        :return:
+            a ``(bid, ask)`` tuple of the amount bid at or above ``price`` and
+            the amount offered at or below it
+        """
+        return (
+            self.buyorders.volume_where(operator.ge, price),
+            self.sellorders.volume_where(operator.le, price),
+        )
+
+
+def _decode(raw):
+    if isinstance(raw, (bytes, str)):
+        return json.loads(raw)
+    return raw
+
+
+def orderbook_columns(raw):
+    """
+    Build an ``OrderBookColumns`` from a raw or decoded ``orders`` response
+    """
+    return OrderBookColumns.from_response(_decode(raw))
+
+
+def orderhistory_columns(raw):
+    """
+    Build an ``OrderColumns`` from a raw or decoded ``orderhistory`` response
+    """
+    return OrderColumns.from_rows(_decode(raw)["orders"])
+
+
+def vwap_by_coin(columns_by_coin):
+    """
+    The volume weighted average rate of every coin at once
+
+    :param columns_by_coin:
+        a dict of ``OrderColumns`` keyed by coin, such as the order histories
+        of a whole market
+    :return:
+        a dict of vwap keyed by coin, None for coins without orders
+    """
+    coins = list(columns_by_coin)
+    if numpy is None or not coins:
+        return {coin: columns_by_coin[coin].vwap() for coin in coins}
+    lengths = numpy.array([len(columns_by_coin[coin]) for coin in coins])
+    offsets = numpy.concatenate(([0], numpy.cumsum(lengths)[:-1]))
+    amount = numpy.concatenate([columns_by_coin[coin].as_numpy()["amount"] for coin in coins])
+    total = numpy.concatenate([columns_by_coin[coin].as_numpy()["total"] for coin in coins])
+    result = {}
+    nonempty = lengths > 0
+    if nonempty.any():
+        starts = offsets[nonempty]
+        amounts = numpy.add.reduceat(amount, starts)
+        totals = numpy.add.reduceat(total, starts)
+        for coin, summed_amount, summed_total in zip(
+            itertools.compress(coins, nonempty), amounts, totals
+        ):
+            result[coin] = float(summed_total / summed_amount) if summed_amount else None
+    for coin in itertools.compress(coins, ~nonempty):
+        result[coin] = None
+    return {coin: result[coin] for coin in coins}
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+config.py - The client's settings, read once per process.
+
+A ``CoinSpotConfig`` holds one or more named ``Profile`` objects, each an
+API key and secret with the endpoint and logging options that go with it.
+It is loaded from a YAML file once and can be shared by any number of
+clients::
+
+    settings = CoinSpotConfig.load("/etc/coinspot.yml")
+    trading = CoinSpot(config=settings, profile="trading")
+    reporting = CoinSpot(config=settings, profile="reporting")
+
+The file may hold a single account, in the original layout, or several
+under ``profiles``; ``default`` names the profile used when none is asked
+for::
+
+    api:
+      key: 'KEY'
+      secret: 'SECRET'
+    profiles:
+      trading:
+        key: 'KEY'
+        secret: 'SECRET'
+        endpoint: 'www.coinspot.com.au'
+        debug: false
+        logfile: 'trading.log'
+    default: trading
+
+The top level ``api`` account is the profile named ``default``, and its
+``endpoint``, ``debug`` and ``logfile`` settings are inherited by the
+other profiles.  Loaded files are kept for the life of the process and
+read again only once their modification time or size changes.  PyYAML is
+only imported when there is a file to parse.
+"""
+
+import os
+import sys
+import threading
+
+from .errors import ConfigError
+
+DEFAULT_ENDPOINT = "www.coinspot.com.au"
+DEFAULT_LOGFILE = "coinspot.log"
+DEFAULT_PROFILE = "default"
+
+_lock = threading.Lock()
+_files = {}
+
+
+def default_path():
+    """
+    The ``config.yml`` in the directory of the running script
+    """
+    return os.path.realpath(os.path.dirname(sys.argv[0])) + "/config.yml"
+
+
+class Profile:
+    """
+    One account's credentials and the endpoint they are used with
+
+    :param name:
+        the profile's name in its ``CoinSpotConfig``
+    :param key:
+        the API key
+    :param secret:
+        the API secret
+    :param endpoint:
+        the API host
+    :param logfile:
+        the file debug output is written to
+    :param debug:
+        log every request and response
+    """
+
+    __slots__ = ("name", "key", "secret", "endpoint", "logfile", "debug")
+
+    def __init__(
+        self,
+        name,
+        key,
+        secret,
+        endpoint=DEFAULT_ENDPOINT,
+        logfile=DEFAULT_LOGFILE,
+        debug=False,
+    ):
+        self.name = name
+        self.key = key
+        self.secret = secret
+        self.endpoint = endpoint
+        self.logfile = logfile
+        self.debug = debug
+
+    def __eq__(self, other):
+        if not isinstance(other, Profile):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __hash__(self):
+        return hash((self.name, self.key, self.endpoint))
+
+    def __repr__(self):
+        # the secret stays out of logs and tracebacks
+        return "Profile(name=%r, key=%r, endpoint=%r)" % (self.name, self.key, self.endpoint)
+
+
+def _profile(name, settings, inherited, path):
+    if not isinstance(settings, dict):
+        raise ConfigError("profile %r in %s is not a mapping" % (name, path), path)
+    options = dict(inherited)
+    options.update(settings)
+    for required in ("key", "secret"):
+        if not isinstance(options.get(required), str) or not options[required]:
+            raise ConfigError("profile %r in %s has no %s" % (name, path, required), path)
+    unknown = set(options) - {"key", "secret", "endpoint", "logfile", "debug"}
+    if unknown:
+        raise ConfigError(
+            "profile %r in %s has unknown settings %s" % (name, path, ", ".join(sorted(unknown))),
+            path,
+        )
+    return Profile(name, **options)
+
+
+class CoinSpotConfig:
+    """
+    A set of named profiles, loaded once and shared by clients
+
+    :param profiles:
+        the ``Profile`` objects, in any order
+    :param default:
+        the name of the profile used when none is asked for, by default
+        the one named ``default``, or the only one
+    :param path:
+        the file the profiles were read from, if any
+    :raises ConfigError:
+        when there are no profiles or ``default`` is not one of them
+    """
+
+    def __init__(self, profiles, default=None, path=None):
+        self.path = path
+        self._profiles = {profile.name: profile for profile in profiles}
+        if not self._profiles:
+            raise ConfigError("no profiles in %s" % (path or "config"), path)
+        if default is None:
+            default = next(iter(self._profiles))
+            if DEFAULT_PROFILE in self._profiles:
+                default = DEFAULT_PROFILE
+        if default not in self._profiles:
+            raise ConfigError(
+                "default profile %r is not in %s" % (default, path or "config"), path
+            )
+        self.default = default
+
+    @classmethod
+    def from_dict(cls, settings, path=None):
+        """
+        Build the profiles from parsed settings, in the layout of the file
+
+        :raises ConfigError:
+            when the settings do not describe at least one complete profile
+        """
+        if not isinstance(settings, dict):
+            raise ConfigError("%s is not a mapping" % (path or "config"), path)
+        api = settings.get("api") or {}
+        if not isinstance(api, dict):
+            raise ConfigError("api in %s is not a mapping" % (path or "config"), path)
+        inherited = {
+            option: value
+            for option, value in (
+                ("endpoint", api.get("endpoint")),
+                ("logfile", settings.get("logfile")),
+                ("debug", settings.get("debug")),
+            )
+            if value is not None
+        }
+        profiles = []
+        if "key" in api or "secret" in api:
+            account = {"key": api.get("key"), "secret": api.get("secret")}
+            profiles.append(_profile(DEFAULT_PROFILE, account, inherited, path))
+        named = settings.get("profiles") or {}
+        if not isinstance(named, dict):
+            raise ConfigError("profiles in %s is not a mapping" % (path or "config"), path)
+        for name, options in named.items():
+            profiles.append(_profile(str(name), options, inherited, path))
+        return cls(profiles, settings.get("default"), path)
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """
+        The single profile given by ``COINSPOT_API_KEY`` and
+        ``COINSPOT_SECRET_KEY``
+
+        :return:
+            the config, or None when the variables are not set
+        """
+        environ = os.environ if environ is None else environ
+        key = environ.get("COINSPOT_API_KEY")
+        secret = environ.get("COINSPOT_SECRET_KEY")
+        if key is None or secret is None:
+            return None
+        return cls([Profile(DEFAULT_PROFILE, key, secret)])
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Read the profiles in a YAML file, or return them from the process
+        cache if the file has not changed since it was last read
+
+        :param path:
+            the file, ``config.yml`` next to the running script by default
+        :raises ConfigError:
+            when the file cannot be read or parsed, or holds no profiles
+        """
+        entry = _read(default_path() if path is None else path)
+        if entry.error is not None:
+            raise entry.error
+        return entry.config
+
+    def profile(self, name=None):
+        """
+        :return:
+            the ``Profile`` called ``name``, the default profile when None
+        :raises ConfigError:
+            when there is no such profile
+        """
+        name = self.default if name is None else name
+        try:
+            return self._profiles[name]
+        except KeyError:
+            raise ConfigError(
+                "no profile %r in %s" % (name, self.path or "config"), self.path
+            ) from None
+
+    @property
+    def names(self):
+        """
+        The profile names, in the order they were configured
+        """
+        return list(self._profiles)
+
+    def __contains__(self, name):
+        return name in self._profiles
+
+    def __iter__(self):
+        return iter(self._profiles.values())
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __repr__(self):
+        return "CoinSpotConfig(%r, default=%r, path=%r)" % (self.names, self.default, self.path)
+
+
+class _File:
+    """
+    A settings file as it was when last read
+    """
+
+    __slots__ = ("stamp", "settings", "config", "error")
+
+    def __init__(self, stamp, settings=None, config=None, error=None):
+        self.stamp = stamp
+        self.settings = settings
+        self.config = config
+        self.error = error
+
+
+def _read(path):
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError as error:
+        # a missing file is not cached, so creating it takes effect
+        return _File(None, error=ConfigError("cannot read %s: %s" % (path, error), path))
+    stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    with _lock:
+        entry = _files.get(path)
+    if entry is not None and entry.stamp == stamp:
+        return entry
+    entry = _File(stamp)
+    try:
+        with open(path) as source:
+            text = source.read()
+    except OSError as error:
+        entry.error = ConfigError("cannot read %s: %s" % (path, error), path)
+        return entry
+    import yaml
+
+    try:
+        entry.settings = yaml.load(text, Loader=yaml.SafeLoader)
+    except yaml.YAMLError as error:
+        entry.error = ConfigError("cannot parse %s: %s" % (path, error), path)
+    else:
+        try:
+            entry.config = CoinSpotConfig.from_dict(entry.settings, path)
+        except ConfigError as error:
+            entry.error = error
+    with _lock:
+        _files[path] = entry
+    return entry
+
+
+def read_file(path):
+    """
+    :return:
+        the parsed contents of the YAML file at ``path``, or None if it
+        cannot be read or parsed; the result is kept until the file changes
+    """
+    return _read(path).settings
+
+
+def clear():
+    """
+    Forget the files read so far, so the next client reads them again
+    """
+    with _lock:
+        _files.clear()
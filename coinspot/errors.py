@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+errors.py - Exceptions raised by the CoinSpot client.
+
+Everything the client raises for a failed request derives from
+``CoinSpotError``.  The ``retryable`` flag says whether sending the same
+request again could succeed, which is what ``RetryPolicy`` checks.
+"""
+
+
+class CoinSpotError(Exception):
+    """
+    A request to the CoinSpot API failed
+
+    :param path:
+        the API path of the request
+    """
+
+    retryable = False
+
+    def __init__(self, message, path=None):
+        super().__init__(message)
+        self.path = path
+
+
+class TransportError(CoinSpotError, IOError):
+    """
+    The request could not be sent or its response could not be read,
+    because of a connection, TLS or timeout failure
+    """
+
+    retryable = True
+
+
+class HTTPStatusError(CoinSpotError):
+    """
+    The server answered with a status that carries no API response,
+    ``429 Too Many Requests`` or a ``5xx``
+
+    :param status:
+        the HTTP status code
+    :param body:
+        the response body
+    """
+
+    retryable = True
+
+    def __init__(self, message, path=None, status=None, body=None):
+        super().__init__(message, path)
+        self.status = status
+        self.body = body
+
+
+class APIError(CoinSpotError, ValueError):
+    """
+    The API answered with a status other than ``ok``
+
+    :param response:
+        the decoded response
+    """
+
+    def __init__(self, message, path=None, response=None):
+        super().__init__(message, path)
+        self.response = response
+
+
+class CircuitOpenError(CoinSpotError):
+    """
+    The endpoint has failed repeatedly and requests to it are being refused
+    until its circuit breaker lets a trial request through
+
+    :param retry_after:
+        seconds until the next trial request is allowed
+    """
+
+    def __init__(self, message, path=None, retry_after=None):
+        super().__init__(message, path)
+        self.retry_after = retry_after
+
+
+class ConfigError(CoinSpotError, ValueError):
+    """
+    A settings file could not be read or does not describe a usable profile
+
+    :param path:
+        the settings file, when there is one
+    """
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+feed.py - One poller of market data shared by any number of consumers.
+
+``MarketDataHub`` polls ``spot`` and the ``orders`` (and optionally
+``orderhistory``) of each coin once per interval, parses each response
+once, and publishes the result to every subscriber.  The API calls made
+depend on the number of coins, never on the number of consumers.
+
+Each ``Subscription`` is a bounded queue that drops its oldest update when a
+slow consumer lets it fill, so one stalled strategy cannot hold up the hub or
+the others.  ``FeedServer`` serves the updates to other processes over a
+local socket and ``FeedClient`` reads them back as the same ``Update``
+objects.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+
+from .models import PARSERS, decode
+
+
+SPOT = "spot"
+ORDERS = "orders"
+ORDERHISTORY = "orderhistory"
+
+PATHS = {SPOT: "/api/spot", ORDERS: "/api/orders", ORDERHISTORY: "/api/orders/history"}
+
+
+class Update:
+    """
+    One parsed poll result
+
+    ``data`` is a dict of ``SpotPrice`` for spot updates (``coin`` is None),
+    an ``OrderBook`` for orders and a list of ``Order`` for order history.
+    ``raw`` is the response body it was parsed from.
+    """
+
+    __slots__ = ("kind", "coin", "data", "time", "raw")
+
+    def __init__(self, kind, coin, data, time, raw=None):
+        self.kind = kind
+        self.coin = coin
+        self.data = data
+        self.time = time
+        self.raw = raw
+
+    def __repr__(self):
+        return "Update(kind=%r, coin=%r, time=%r)" % (self.kind, self.coin, self.time)
+
+
+class Subscription:
+    """
+    A bounded queue of updates, oldest dropped first when full
+
+    :param maxsize:
+        the most updates held
+    :param kinds:
+        the update kinds wanted, all by default
+    :param coins:
+        the coins wanted, all by default; spot updates are always delivered
+    """
+
+    def __init__(self, maxsize=64, kinds=None, coins=None):
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.coins = frozenset(coins) if coins is not None else None
+        self.dropped = 0
+        self.closed = False
+        self._queue = deque(maxlen=maxsize)
+        self._ready = threading.Condition()
+
+    def wants(self, update):
+        if self.kinds is not None and update.kind not in self.kinds:
+            return False
+        return self.coins is None or update.coin is None or update.coin in self.coins
+
+    def put(self, update):
+        with self._ready:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(update)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """
+        Take the oldest update, waiting up to ``timeout`` seconds for one
+
+        :return:
+            the update, or None on timeout or once the subscription is closed
+        """
+        with self._ready:
+            if not self._queue and not self.closed:
+                self._ready.wait(timeout)
+            if self._queue:
+                return self._queue.popleft()
+            return None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __iter__(self):
+        """
+        Yield updates until the subscription is closed
+        """
+        while True:
+            update = self.get()
+            if update is None:
+                if self.closed:
+                    return
+                continue
+            yield update
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+
+class MarketDataHub:
+    """
+    Polls market data once and publishes it to every subscriber
+
+    :param client:
+        a ``CoinSpot`` returning raw responses, the hub does the parsing
+    :param cointypes:
+        the coins whose order books, and order history if enabled, are polled
+    :param spot_interval:
+        seconds between ``spot`` polls, None to not poll spot
+    :param orders_interval:
+        seconds between ``orders`` polls of every coin, None to not poll them
+    :param history_interval:
+        seconds between ``orderhistory`` polls of every coin, off by default
+    :param max_workers:
+        requests in flight at once while polling the coins
+    """
+
+    def __init__(
+        self,
+        client,
+        cointypes=(),
+        spot_interval=5.0,
+        orders_interval=5.0,
+        history_interval=None,
+        max_workers=None,
+    ):
+        if client._models:
+            raise ValueError("MarketDataHub parses responses itself, use models=False")
+        self.client = client
+        self.cointypes = list(cointypes)
+        self.intervals = {
+            SPOT: spot_interval,
+            ORDERS: orders_interval if self.cointypes else None,
+            ORDERHISTORY: history_interval if self.cointypes else None,
+        }
+        self.max_workers = max_workers
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._polls = {kind: 0 for kind in PATHS}
+        self._errors = {kind: 0 for kind in PATHS}
+        self._due = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, maxsize=64, kinds=None, coins=None):
+        """
+        :return:
+            a new ``Subscription`` receiving every update from now on
+        """
+        subscription = Subscription(maxsize, kinds, coins)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.remove(subscription)
+        subscription.close()
+
+    def publish(self, update):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.wants(update):
+                subscription.put(update)
+
+    def _parsed(self, kind, coin, raw):
+        """
+        Publish ``raw`` as an update, counting it as an error if the request
+        failed, the API answered with an error status or the body could not
+        be parsed
+        """
+        if not isinstance(raw, Exception):
+            try:
+                data = decode(raw)
+                parsed = PARSERS[PATHS[kind]](data) if data.get("status") == "ok" else None
+            except Exception:
+                # a malformed body must not end the polling thread
+                parsed = None
+            if parsed is not None:
+                update = Update(kind, coin, parsed, time.time(), raw)
+                self.publish(update)
+                return update
+        with self._lock:
+            self._errors[kind] += 1
+        return None
+
+    def poll(self, kind):
+        """
+        Poll one kind of market data now and publish the results
+
+        :return:
+            the list of updates published
+        """
+        with self._lock:
+            self._polls[kind] += 1
+        if kind == SPOT:
+            try:
+                raw = self.client.spot()
+            except Exception as error:
+                raw = error
+            update = self._parsed(SPOT, None, raw)
+            return [update] if update is not None else []
+        fan_out = self.client.iter_orders if kind == ORDERS else self.client.iter_orderhistory
+        updates = []
+        for coin, raw in fan_out(self.cointypes, self.max_workers):
+            update = self._parsed(kind, coin, raw)
+            if update is not None:
+                updates.append(update)
+        return updates
+
+    def poll_due(self, now=None):
+        """
+        Poll every kind whose interval has elapsed
+
+        :return:
+            seconds until the next poll is due
+        """
+        now = time.monotonic() if now is None else now
+        for kind, interval in self.intervals.items():
+            if interval is None:
+                continue
+            if self._due.get(kind, now) <= now:
+                self.poll(kind)
+                self._due[kind] = now + interval
+        pending = [due for kind, due in self._due.items() if self.intervals[kind] is not None]
+        return max(0.0, min(pending) - time.monotonic()) if pending else None
+
+    def run(self):
+        """
+        Poll on schedule until ``stop`` is called
+        """
+        while not self._stop.is_set():
+            delay = self.poll_due()
+            if delay is None:
+                return
+            self._stop.wait(delay)
+
+    def start(self):
+        """
+        Start polling on a background thread
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="MarketDataHub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop polling and close every subscription
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for subscription in subscribers:
+            subscription.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        """
+        :return:
+            a dict of ``polls`` and ``errors`` by kind, the number of
+            ``subscribers`` and the updates ``dropped`` across them
+        """
+        with self._lock:
+            return {
+                "polls": dict(self._polls),
+                "errors": dict(self._errors),
+                "subscribers": len(self._subscribers),
+                "dropped": sum(s.dropped for s in self._subscribers),
+            }
+
+
+def _encode(update):
+    """
+    One line of the socket feed, with the raw response embedded as it is
+    """
+    raw = update.raw
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    # a newline in JSON can only be whitespace outside a string
+    raw = raw.replace(b"\n", b" ").replace(b"\r", b" ")
+    head = json.dumps({"kind": update.kind, "coin": update.coin, "time": update.time})
+    return head[:-1].encode("utf-8") + b',"data":' + raw + b"}\n"
+
+
+def _decode(line):
+    message = json.loads(line, parse_float=Decimal)
+    data = message["data"]
+    return Update(
+        message["kind"],
+        message["coin"],
+        PARSERS[PATHS[message["kind"]]](data),
+        float(message["time"]),
+    )
+
+
+def _listener(address):
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.unlink(address)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(address)
+    sock.listen()
+    return sock
+
+
+class FeedServer:
+    """
+    Serves a hub's updates to other processes, one JSON line per update
+
+    Each update is encoded once however many processes are connected.  Every
+    connection has its own bounded, drop-oldest queue and writer thread, so
+    a slow reader only loses its own oldest updates.
+
+    :param hub:
+        the ``MarketDataHub`` to serve
+    :param address:
+        a Unix socket path, or a ``(host, port)`` tuple for TCP
+    :param maxsize:
+        updates queued per connection
+    """
+
+    def __init__(self, hub, address, maxsize=256):
+        self.hub = hub
+        self.maxsize = maxsize
+        self._sock = _listener(address)
+        self.address = self._sock.getsockname()
+        self._subscription = hub.subscribe(maxsize)
+        self._connections = []
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._accept, name="FeedServer-accept", daemon=True),
+            threading.Thread(target=self._broadcast, name="FeedServer-send", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            queue = Subscription(self.maxsize)
+            with self._lock:
+                self._connections.append(queue)
+            threading.Thread(
+                target=self._write, args=(conn, queue), name="FeedServer-write", daemon=True
+            ).start()
+
+    def _broadcast(self):
+        for update in self._subscription:
+            line = _encode(update)
+            with self._lock:
+                connections = list(self._connections)
+            for queue in connections:
+                queue.put(line)
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for queue in connections:
+            queue.close()
+
+    def _write(self, conn, queue):
+        with conn:
+            try:
+                for line in queue:
+                    conn.sendall(line)
+            except OSError:
+                pass
+        with self._lock:
+            if queue in self._connections:
+                self._connections.remove(queue)
+
+    @property
+    def connections(self):
+        with self._lock:
+            return len(self._connections)
+
+    def close(self):
+        self.hub.unsubscribe(self._subscription)
+        try:
+            # closing alone does not wake a thread blocked in accept
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        for thread in self._threads:
+            thread.join()
+
+
+class FeedClient:
+    """
+    Reads the updates served by a ``FeedServer``
+
+    Iterating yields ``Update`` objects parsed into the same models as the
+    hub publishes, until the server goes away.
+
+    :param address:
+        the server's Unix socket path or ``(host, port)`` tuple
+    """
+
+    def __init__(self, address):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.connect(address)
+        self._file = self._sock.makefile("rb")
+
+    def __iter__(self):
+        for line in self._file:
+            yield _decode(line)
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
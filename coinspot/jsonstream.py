@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+jsonstream.py - Incremental decoding of large CoinSpot responses.
+
+``ArrayStreamDecoder`` is fed a response body a chunk at a time and hands
+back the elements of selected top-level arrays (such as ``buyorders`` or
+``orders``) as soon as each one has arrived, so a caller can work through a
+large book without holding the whole body or the whole decoded list.  The
+buffer only ever holds the unparsed tail of the data fed so far, which is at
+most one partial element plus one chunk.
+"""
+
+import codecs
+import json
+from json.decoder import scanstring
+
+
+_WHITESPACE = " \t\n\r"
+
+# parser states
+_START = 0
+_FIRST_KEY = 1
+_KEY = 2
+_COLON = 3
+_VALUE = 4
+_FIRST_ITEM = 5
+_ITEM = 6
+_ITEM_END = 7
+_VALUE_END = 8
+_DONE = 9
+
+
+class ArrayStreamDecoder:
+    """
+    A push parser for a JSON object whose large arrays are decoded element
+    by element
+
+    Values of keys other than those being streamed are decoded whole and kept
+    in ``values``, which is how a response's ``status`` and ``message`` are
+    read.
+
+    :param keys:
+        the top-level keys whose array elements are to be streamed
+    :param parse_float:
+        passed on to ``json.JSONDecoder``, e.g. ``decimal.Decimal``
+    """
+
+    def __init__(self, keys, parse_float=None):
+        self.keys = frozenset(keys)
+        self.values = {}
+        self._json = json.JSONDecoder(parse_float=parse_float)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = _START
+        self._key = None
+
+    def __len__(self):
+        """
+        The number of characters currently buffered
+        """
+        return len(self._buffer)
+
+    def feed(self, data):
+        """
+        Add the next chunk of the body
+
+        :return:
+            a list of ``(key, element)`` tuples completed by this chunk
+        """
+        self._buffer += self._text.decode(data)
+        return self._parse(final=False)
+
+    def close(self):
+        """
+        Signal the end of the body
+
+        :return:
+            any remaining ``(key, element)`` tuples
+        :raises ValueError:
+            if the body was not a complete JSON object
+        """
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._parse(final=True)
+        if self._state != _DONE:
+            raise ValueError("Incomplete JSON response")
+        return items
+
+    def _decode(self, pos, final):
+        """
+        Decode the value starting at ``pos``
+
+        :return:
+            ``(value, end)``, or None when more data is needed
+        """
+        buffer = self._buffer
+        try:
+            value, end = self._json.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        # a number cut off by the end of a chunk still decodes, so wait
+        # until something follows it
+        if end == len(buffer) and not final:
+            return None
+        return value, end
+
+    def _parse(self, final):
+        buffer = self._buffer
+        size = len(buffer)
+        pos = 0
+        items = []
+        while True:
+            while pos < size and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= size:
+                break
+            state = self._state
+            char = buffer[pos]
+
+            if state == _START:
+                if char != "{":
+                    raise ValueError("Expected a JSON object at %r" % buffer[pos : pos + 20])
+                self._state = _FIRST_KEY
+                pos += 1
+            elif state in (_FIRST_KEY, _KEY):
+                if char == "}" and state == _FIRST_KEY:
+                    self._state = _DONE
+                    pos += 1
+                    continue
+                if char != '"':
+                    raise ValueError("Expected a key at %r" % buffer[pos : pos + 20])
+                try:
+                    self._key, pos = scanstring(buffer, pos + 1)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+                self._state = _COLON
+            elif state == _COLON:
+                if char != ":":
+                    raise ValueError("Expected ':' at %r" % buffer[pos : pos + 20])
+                self._state = _VALUE
+                pos += 1
+            elif state == _VALUE:
+                if char == "[" and self._key in self.keys:
+                    self._state = _FIRST_ITEM
+                    pos += 1
+                    continue
+                decoded = self._decode(pos, final)
+                if decoded is None:
+                    break
+                self.values[self._key], pos = decoded
+                self._state = _VALUE_END
+            elif state in (_FIRST_ITEM, _ITEM):
+                if char == "]" and state == _FIRST_ITEM:
+                    self._state = _VALUE_END
+                    pos += 1
+                    continue
+                decoded = self._decode(pos, final)
+                if decoded is None:
+                    break
+                item, pos = decoded
+                items.append((self._key, item))
+                self._state = _ITEM_END
+            elif state == _ITEM_END:
+                if char == ",":
+                    self._state = _ITEM
+                elif char == "]":
+                    self._state = _VALUE_END
+                else:
+                    raise ValueError("Expected ',' or ']' at %r" % buffer[pos : pos + 20])
+                pos += 1
+            elif state == _VALUE_END:
+                if char == ",":
+                    self._state = _KEY
+                elif char == "}":
+                    self._state = _DONE
+                else:
+                    raise ValueError("Expected ',' or '}' at %r" % buffer[pos : pos + 20])
+                pos += 1
+            else:
+                raise ValueError("Unexpected data after the JSON object")
+
+        self._buffer = buffer[pos:]
+        return items
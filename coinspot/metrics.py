@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+metrics.py - Request timing, counters and exporter hooks.
+
+A client given a ``MetricsHook`` opens a ``RequestTrace`` for each request.
+The connection pool fills in the connect, TLS, send, time to first byte and
+read phases, and the client adds the parse time, the bytes sent and received,
+and the outcome.  The hook is called when the request starts and when it
+finishes.  Without a hook none of this happens, and the only cost is an
+``is None`` check per request.
+
+``Metrics`` is the built-in hook.  It keeps an HDR-style latency histogram
+per endpoint and phase, along with byte, error and in-flight counts.  An
+OpenTelemetry or Prometheus exporter subclasses ``MetricsHook`` and forwards
+each finished trace, and ``HookChain`` runs several hooks side by side.
+"""
+
+import threading
+import time
+from array import array
+
+
+PHASES = ("connect", "tls", "send", "ttfb", "read", "parse", "total")
+
+# values below 2 ** _SUB_BITS microseconds get a bucket each, above that
+# every power of two is split into 2 ** (_SUB_BITS - 1) buckets, so a
+# recorded value is never more than 1/64 above the bucket it lands in
+_SUB_BITS = 7
+_HALF = 1 << (_SUB_BITS - 1)
+
+
+def _bucket(micros):
+    if micros < (1 << _SUB_BITS):
+        return micros
+    shift = micros.bit_length() - _SUB_BITS
+    return (shift << (_SUB_BITS - 1)) + (micros >> shift)
+
+
+def _lowest(bucket):
+    if bucket < (1 << _SUB_BITS):
+        return bucket
+    shift, mantissa = divmod(bucket, _HALF)
+    shift -= 1
+    return (mantissa + _HALF) << shift
+
+
+class LatencyHistogram:
+    """
+    A log-linear histogram of durations at microsecond resolution
+
+    Recording is an index calculation and an increment, and memory grows with
+    the log of the largest value recorded, not with the number of values.
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = array("Q")
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        micros = int(seconds * 1000000)
+        if micros < 0:
+            micros = 0
+        bucket = _bucket(micros)
+        counts = self.counts
+        if bucket >= len(counts):
+            counts.extend([0] * (bucket + 1 - len(counts)))
+        counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """
+        :return:
+            the duration in seconds that ``percent`` of the recorded values
+            are at or below, to within the bucket width, None when empty
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(_lowest(bucket) / 1000000.0, self.min), self.max)
+        return self.max
+
+    def merge(self, other):
+        """
+        Add the values recorded by another histogram
+        """
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for bucket, count in enumerate(other.counts):
+            self.counts[bucket] += count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def summary(self):
+        """
+        :return:
+            a dict of ``count``, ``min``, ``mean``, ``p50``, ``p90``, ``p99``
+            and ``max``, in seconds
+        """
+        return {
+            "count": self.count,
+            "min": self.min,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class RequestTrace:
+    """
+    The timings and sizes of one request
+
+    Phases that did not happen, such as connect and TLS on a reused
+    connection, stay None.  All durations are in seconds.
+    """
+
+    __slots__ = (
+        "path",
+        "started",
+        "connect",
+        "tls",
+        "send",
+        "ttfb",
+        "read",
+        "parse",
+        "total",
+        "bytes_out",
+        "bytes_in",
+        "status",
+        "error",
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self.started = time.perf_counter()
+        self.connect = None
+        self.tls = None
+        self.send = None
+        self.ttfb = None
+        self.read = None
+        self.parse = None
+        self.total = None
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.status = None
+        self.error = None
+
+    def finish(self, error=None):
+        self.total = time.perf_counter() - self.started
+        self.error = error
+
+    def __repr__(self):
+        return "RequestTrace(%s)" % ", ".join(
+            "%s=%r" % (name, getattr(self, name)) for name in self.__slots__
+        )
+
+
+class MetricsHook:
+    """
+    The interface the client reports requests to
+
+    Both methods are called in the thread or task making the request, so an
+    implementation should hand off anything slow.
+    """
+
+    def request_started(self, trace):
+        pass
+
+    def request_finished(self, trace):
+        """
+        Called once per request, successful or not; ``trace.error`` is the
+        exception a failed request raised
+        """
+
+
+class HookChain(MetricsHook):
+    """
+    Reports every request to each of several hooks, in order
+    """
+
+    def __init__(self, hooks):
+        self.hooks = tuple(hooks)
+
+    def request_started(self, trace):
+        for hook in self.hooks:
+            hook.request_started(trace)
+
+    def request_finished(self, trace):
+        for hook in self.hooks:
+            hook.request_finished(trace)
+
+
+class _EndpointMetrics:
+    __slots__ = ("histograms", "requests", "errors", "in_flight", "bytes_in", "bytes_out")
+
+    def __init__(self):
+        self.histograms = {phase: LatencyHistogram() for phase in PHASES}
+        self.requests = 0
+        self.errors = {}
+        self.in_flight = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+class Metrics(MetricsHook):
+    """
+    Per endpoint latency histograms and counters
+
+    One instance may be shared by several clients, threads and event loops.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, path):
+        endpoint = self._endpoints.get(path)
+        if endpoint is None:
+            endpoint = self._endpoints[path] = _EndpointMetrics()
+        return endpoint
+
+    def request_started(self, trace):
+        with self._lock:
+            self._endpoint(trace.path).in_flight += 1
+
+    def request_finished(self, trace):
+        with self._lock:
+            endpoint = self._endpoint(trace.path)
+            endpoint.in_flight -= 1
+            endpoint.requests += 1
+            endpoint.bytes_out += trace.bytes_out
+            endpoint.bytes_in += trace.bytes_in
+            if trace.error is not None:
+                name = type(trace.error).__name__
+                endpoint.errors[name] = endpoint.errors.get(name, 0) + 1
+            histograms = endpoint.histograms
+            for phase in PHASES:
+                value = getattr(trace, phase)
+                if value is not None:
+                    histograms[phase].record(value)
+
+    def histogram(self, path, phase):
+        """
+        :return:
+            the ``LatencyHistogram`` of ``phase`` for ``path``
+        """
+        with self._lock:
+            return self._endpoint(path).histograms[phase]
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return sum(endpoint.in_flight for endpoint in self._endpoints.values())
+
+    def stats(self):
+        """
+        :return:
+            a dict keyed by path of ``requests``, ``errors`` by exception
+            name, ``in_flight``, ``bytes_in``, ``bytes_out`` and ``latency``,
+            a dict of histogram summaries keyed by phase
+        """
+        with self._lock:
+            return {
+                path: {
+                    "requests": endpoint.requests,
+                    "errors": dict(endpoint.errors),
+                    "in_flight": endpoint.in_flight,
+                    "bytes_in": endpoint.bytes_in,
+                    "bytes_out": endpoint.bytes_out,
+                    "latency": {
+                        phase: histogram.summary()
+                        for phase, histogram in endpoint.histograms.items()
+                        if histogram.count
+                    },
+                }
+                for path, endpoint in self._endpoints.items()
+            }
+
+    def reset(self):
+        """
+        Clear the histograms and counters, keeping the in-flight counts of
+        requests still under way
+        """
+        with self._lock:
+            endpoints = {}
+            for path, endpoint in self._endpoints.items():
+                if endpoint.in_flight:
+                    endpoints[path] = _EndpointMetrics()
+                    endpoints[path].in_flight = endpoint.in_flight
+            self._endpoints = endpoints
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+models.py - Parsed, typed representations of CoinSpot API responses.
+
+Responses are decoded once with JSON fractions read straight into a
+``Decimal``, and string prices such as ``{"btcspot": "474.92"}`` converted at
+the same time, so callers never re-parse prices.  The models use
+``__slots__`` to keep per-object memory down on large order books.
+
+Use ``CoinSpot(models=True)`` to have the client return these, or call
+``parse`` on a raw response.
+"""
+
+import json
+import sys
+from decimal import Decimal
+
+
+class _Model:
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            type(self).__name__,
+            ", ".join("%s=%r" % (name, getattr(self, name)) for name in self.__slots__),
+        )
+
+
+class SpotPrice(_Model):
+    """
+    The latest spot price of a coin, in AUD
+    """
+
+    __slots__ = ("coin", "price")
+
+    def __init__(self, coin, price):
+        self.coin = coin
+        self.price = price
+
+
+class Balance(_Model):
+    """
+    The balance held of a coin
+    """
+
+    __slots__ = ("coin", "amount")
+
+    def __init__(self, coin, amount):
+        self.coin = coin
+        self.amount = amount
+
+
+class Order(_Model):
+    """
+    An open order, or with ``solddate`` set (milliseconds since the epoch)
+    a completed one
+    """
+
+    __slots__ = ("coin", "amount", "rate", "total", "solddate")
+
+    def __init__(self, coin, amount, rate, total, solddate=None):
+        self.coin = coin
+        self.amount = amount
+        self.rate = rate
+        self.total = total
+        self.solddate = solddate
+
+
+class OrderBook(_Model):
+    """
+    The open buy and sell orders for a coin
+    """
+
+    __slots__ = ("coin", "buyorders", "sellorders")
+
+    def __init__(self, coin, buyorders, sellorders):
+        self.coin = coin
+        self.buyorders = buyorders
+        self.sellorders = sellorders
+
+
+def decode(raw):
+    """
+    Decode a raw response with every JSON fraction read as a ``Decimal``
+    """
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    return json.loads(raw, parse_float=Decimal)
+
+
+def _decimal(value):
+    # floats were decoded as Decimal already, only ints and strings remain
+    return value if type(value) is Decimal else Decimal(value)
+
+
+def parse_order(row):
+    """
+    :return:
+        an ``Order`` built from one decoded order dict
+    """
+    coin = row.get("coin")
+    return Order(
+        sys.intern(coin) if coin is not None else None,
+        _decimal(row["amount"]),
+        _decimal(row["rate"]),
+        _decimal(row["total"]),
+        row.get("solddate"),
+    )
+
+
+def parse_spot(data):
+    """
+    :return:
+        a dict of ``SpotPrice`` keyed by uppercase coin shortname
+    """
+    prices = {}
+    for item in data["spot"]:
+        for key, price in item.items():
+            coin = key[:-4].upper() if key.endswith("spot") else key.upper()
+            prices[coin] = SpotPrice(coin, _decimal(price))
+    return prices
+
+
+def parse_balances(data):
+    """
+    :return:
+        a dict of ``Balance`` keyed by uppercase coin shortname
+    """
+    balances = {}
+    for item in data.get("balances", data.get("balance", ())):
+        for key, amount in item.items():
+            coin = key.upper()
+            balances[coin] = Balance(coin, _decimal(amount))
+    return balances
+
+
+def parse_orderbook(data):
+    """
+    :return:
+        an ``OrderBook`` of the buy and sell orders
+    """
+    buyorders = [parse_order(row) for row in data["buyorders"]]
+    sellorders = [parse_order(row) for row in data["sellorders"]]
+    coin = (buyorders or sellorders)[0].coin if buyorders or sellorders else None
+    return OrderBook(coin, buyorders, sellorders)
+
+
+def parse_orderhistory(data):
+    """
+    :return:
+        a list of completed ``Order``
+    """
+    return [parse_order(row) for row in data["orders"]]
+
+
+PARSERS = {
+    "/api/spot": parse_spot,
+    "/api/my/balances": parse_balances,
+    "/api/orders": parse_orderbook,
+    "/api/my/orders": parse_orderbook,
+    "/api/orders/history": parse_orderhistory,
+}
+
+
+def parse(path, raw):
+    """
+    Parse a raw response from ``path`` into models
+
+    Paths without a model, and responses whose status is not ok, are returned
+    as the decoded dict.
+    """
+    data = decode(raw)
+    parser = PARSERS.get(path)
+    if parser is None or data.get("status") != "ok":
+        return data
+    return parser(data)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nonce.py - Strictly increasing request nonces.
+
+CoinSpot rejects a request whose nonce is not greater than the last one it saw
+for the API key.  A bare ``int(time() * 1000000)`` repeats or goes backwards
+when two threads read the clock in the same microsecond, or when two processes
+share a key.
+
+``MonotonicNonce`` serves one process.  ``SharedNonce`` keeps the last nonce in
+a small memory-mapped file guarded by an ``fcntl`` lock, so any number of
+processes using one key draw from a single sequence.  Both count in
+microseconds since the epoch, like the nonces the client used before.
+"""
+
+import itertools
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+_COUNTER = struct.Struct("<q")
+
+
+def clock():
+    """
+    The current time in microseconds since the epoch
+    """
+    return int(time.time() * 1000000)
+
+
+class MonotonicNonce:
+    """
+    Nonces for one process, seeded from the clock and counting up by one
+
+    ``next()`` on an ``itertools.count`` runs in C under the GIL, so threads
+    get distinct, increasing values without taking a lock.  The counter falls
+    behind the clock whenever fewer than a million nonces are drawn per
+    second, which is fine because only the order matters to the server.
+    Processes sharing a key need ``SharedNonce`` instead.
+
+    :param start:
+        the first nonce, the current clock by default
+    """
+
+    def __init__(self, start=None):
+        self._count = itertools.count(clock() if start is None else start)
+
+    def __call__(self):
+        return next(self._count)
+
+
+class SharedNonce:
+    """
+    Nonces shared by every process that opens the same counter file
+
+    Each call takes an exclusive ``flock`` on the file, stores the larger of
+    the last nonce plus one and the clock, and returns it.  The lock is only
+    held for that read and write.  A process that forks reopens the file in
+    the child so parent and child keep locking each other out, and a pickled
+    counter reopens its file when it is unpickled.
+
+    :param path:
+        the counter file, created if it does not exist
+    :raises ImportError:
+        on platforms without ``fcntl``
+    """
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise ImportError("fcntl is required for SharedNonce")
+        self.path = path
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._open()
+
+    @classmethod
+    def for_key(cls, api_key, directory=None):
+        """
+        The counter for ``api_key`` in ``directory``, the temp directory by
+        default, so every process using the key finds the same file
+        """
+        # only needed here, and slow enough to import to be worth deferring
+        import hashlib
+        import tempfile
+
+        digest = hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(directory or tempfile.gettempdir(), "coinspot-nonce-" + digest))
+
+    def _open(self):
+        self.close()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < _COUNTER.size:
+                    os.ftruncate(fd, _COUNTER.size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, _COUNTER.size)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __call__(self):
+        if self._pid != os.getpid():
+            self._open()
+        # flock does not exclude threads sharing the descriptor
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                (last,) = _COUNTER.unpack_from(self._map, 0)
+                nonce = max(last + 1, clock())
+                _COUNTER.pack_into(self._map, 0, nonce)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return nonce
+
+
+# the default for every client in this process, so clients sharing a key
+# never issue the same nonce
+default_nonce = MonotonicNonce()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+orderbook.py - Incremental order book tracking over repeated ``orders`` polls.
+
+Every ``orders`` poll returns a coin's whole book.  ``OrderBookTracker`` keeps
+the previous poll of each coin as sorted price levels, works out which levels
+were added, removed or changed, and hands only those deltas to subscribers so
+they can keep their own state current without rebuilding it.
+"""
+
+import json
+import threading
+from bisect import bisect_left, insort
+from operator import itemgetter
+
+from .errors import APIError
+
+
+BUY = "buy"
+SELL = "sell"
+
+
+class BookDelta:
+    """
+    The changes to one side of a coin's book between two polls
+
+    ``added`` and ``changed`` are lists of ``(rate, amount)`` tuples, ``removed``
+    a list of rates; each is in ascending rate order.
+    """
+
+    __slots__ = ("coin", "side", "added", "removed", "changed")
+
+    def __init__(self, coin, side, added, removed, changed):
+        self.coin = coin
+        self.side = side
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def __repr__(self):
+        return "BookDelta(coin=%r, side=%r, added=%r, removed=%r, changed=%r)" % (
+            self.coin,
+            self.side,
+            self.added,
+            self.removed,
+            self.changed,
+        )
+
+
+class PriceLevels:
+    """
+    The total amount on offer at each rate, kept in ascending rate order
+    """
+
+    __slots__ = ("prices", "amounts")
+
+    def __init__(self):
+        self.prices = []
+        self.amounts = {}
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __iter__(self):
+        amounts = self.amounts
+        return ((price, amounts[price]) for price in self.prices)
+
+    def lowest(self):
+        return (self.prices[0], self.amounts[self.prices[0]]) if self.prices else None
+
+    def highest(self):
+        return (self.prices[-1], self.amounts[self.prices[-1]]) if self.prices else None
+
+    def diff(self, levels):
+        """
+        Compare with a ``{rate: amount}`` dict of the new levels and update to it
+
+        :return:
+            ``(added, removed, changed)`` as described by ``BookDelta``
+        """
+        old = self.amounts
+        get = old.get
+        added = []
+        changed = []
+        for price, amount in levels.items():
+            previous = get(price)
+            if previous is None:
+                added.append((price, amount))
+            elif previous != amount:
+                changed.append((price, amount))
+        # every old level not carried over was removed, skip the scan if none
+        if len(old) > len(levels) - len(added):
+            removed = [price for price in old if price not in levels]
+        else:
+            removed = []
+
+        if len(added) + len(removed) > 32:
+            self.prices = sorted(levels)
+        else:
+            prices = self.prices
+            for price in removed:
+                del prices[bisect_left(prices, price)]
+            for price, _ in added:
+                insort(prices, price)
+        self.amounts = levels
+
+        added.sort()
+        removed.sort()
+        changed.sort()
+        return added, removed, changed
+
+
+def _levels(rows):
+    if rows and not isinstance(rows[0], dict):
+        pairs = ((order.rate, order.amount) for order in rows)
+    else:
+        pairs = map(itemgetter("rate", "amount"), rows)
+    levels = {}
+    get = levels.get
+    for rate, amount in pairs:
+        levels[rate] = get(rate, 0) + amount
+    return levels
+
+
+class OrderBookTracker:
+    """
+    Tracks the order books of any number of coins and publishes their deltas
+
+    Subscribers are called with each non-empty ``BookDelta`` in the thread
+    that calls ``update``.
+    """
+
+    def __init__(self):
+        self._books = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """
+        Call ``callback(delta)`` for every change from now on
+
+        :return:
+            the callback, so this can be used as a decorator
+        """
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def book(self, coin):
+        """
+        :return:
+            a ``{"buy": PriceLevels, "sell": PriceLevels}`` dict of the last
+            poll of ``coin``, or None if it has not been seen
+        """
+        return self._books.get(coin)
+
+    def update(self, coin, response):
+        """
+        Apply a new poll of ``coin`` and publish what changed
+
+        :param response:
+            an ``orders`` response, raw or decoded, or a
+            ``coinspot.models.OrderBook``
+        :return:
+            the list of non-empty ``BookDelta``, buy side first
+        :raises APIError:
+            when the response has an error status; the book is left as it was
+        """
+        if isinstance(response, (bytes, str)):
+            response = json.loads(response)
+        if isinstance(response, dict):
+            if response.get("status", "ok") != "ok":
+                raise APIError(
+                    "/api/orders failed for %s: %s" % (coin, response.get("message", response)),
+                    "/api/orders",
+                    response=response,
+                )
+            sides = ((BUY, response["buyorders"]), (SELL, response["sellorders"]))
+        else:
+            sides = ((BUY, response.buyorders), (SELL, response.sellorders))
+
+        deltas = []
+        with self._lock:
+            book = self._books.get(coin)
+            if book is None:
+                book = self._books[coin] = {BUY: PriceLevels(), SELL: PriceLevels()}
+            for side, rows in sides:
+                added, removed, changed = book[side].diff(_levels(rows))
+                if added or removed or changed:
+                    deltas.append(BookDelta(coin, side, added, removed, changed))
+        for delta in deltas:
+            for callback in list(self._subscribers):
+                callback(delta)
+        return deltas
+
+    def poll(self, client, cointypes, max_workers=None):
+        """
+        Fetch and apply the books of several coins with ``client.iter_orders``
+
+        Coins whose request failed, or whose response has an error status,
+        are skipped until the next poll.
+
+        :return:
+            a dict of the deltas keyed by coin
+        """
+        results = {}
+        for coin, response in client.iter_orders(cointypes, max_workers):
+            if isinstance(response, Exception):
+                continue
+            try:
+                results[coin] = self.update(coin, response)
+            except APIError:
+                continue
+        return results
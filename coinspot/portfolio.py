@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+portfolio.py - Valuing balances at spot prices in AUD.
+
+``balances`` and ``spot`` answer with lists of one-key dicts that have to be
+joined by coin before anything can be valued.  ``Portfolio`` keeps the join:
+a balance, a price and their product for each coin, held in ``array('d')``
+columns indexed by a fixed slot per coin, with the total kept up to date.
+Setting new prices or balances only touches the coins whose numbers
+changed, so a tick that moves a handful of prices costs a handful of
+multiplications however many coins are held::
+
+    portfolio = Portfolio()
+    portfolio.refresh(client)
+    for update in hub.subscribe(kinds=["spot"]):
+        portfolio.record(update)
+        print(portfolio.total, portfolio.exposure("BTC"))
+
+``value_accounts`` values many accounts against one set of prices in a
+single pass, with NumPy when it is installed.  Values are floats, like
+``coinspot.board``; use the ``Decimal`` models where exact sums matter.
+"""
+
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .errors import APIError
+from .models import PARSERS, Balance, SpotPrice, decode
+
+SPOT = "/api/spot"
+BALANCES = "/api/my/balances"
+
+# incremental changes to the total before it is summed again from scratch,
+# so rounding errors in the running total cannot build up
+_RESUM = 4096
+
+
+def _parsed(path, response):
+    """
+    :return:
+        ``response`` as the dict of models its path parses into
+    :raises APIError:
+        when the API answered with an error
+    """
+    if isinstance(response, dict) and "status" not in response:
+        # parsed already, by a client made with models=True
+        return response
+    data = response if isinstance(response, dict) else decode(response)
+    if data.get("status") != "ok":
+        raise APIError("%s failed: %s" % (path, data.get("message", data)), path, response=data)
+    return PARSERS[path](data)
+
+
+def _number(value):
+    if type(value) is float:
+        return value
+    if isinstance(value, SpotPrice):
+        return float(value.price)
+    if isinstance(value, Balance):
+        return float(value.amount)
+    return float(value)
+
+
+class Portfolio:
+    """
+    Balances, spot prices and the AUD value of each coin, kept up to date
+    as either changes
+
+    A portfolio is not locked; update it from one thread, or guard it.
+
+    :param balances:
+        the starting balances, a dict keyed by coin of ``Balance`` or numbers
+    :param prices:
+        the starting prices, a dict keyed by coin of ``SpotPrice`` or numbers
+    """
+
+    def __init__(self, balances=None, prices=None):
+        self._slots = {}
+        self._coins = []
+        self._balance = array("d")
+        self._price = array("d")
+        self._value = array("d")
+        self._total = 0.0
+        self._changes = 0
+        if balances:
+            self.set_balances(balances)
+        if prices:
+            self.set_prices(prices)
+
+    def _slot(self, coin):
+        slot = self._slots.get(coin)
+        if slot is None:
+            slot = self._slots[coin] = len(self._coins)
+            self._coins.append(coin)
+            self._balance.append(0.0)
+            self._price.append(0.0)
+            self._value.append(0.0)
+        return slot
+
+    def _set(self, column, numbers):
+        """
+        Store the changed entries of ``numbers`` in ``column`` and adjust the
+        values and total of just those coins
+
+        :return:
+            the coins whose number changed
+        """
+        changed = []
+        balance, price, value = self._balance, self._price, self._value
+        delta = 0.0
+        for coin, number in numbers.items():
+            number = _number(number)
+            slot = self._slot(coin.upper())
+            if column[slot] == number:
+                continue
+            column[slot] = number
+            new = balance[slot] * price[slot]
+            delta += new - value[slot]
+            value[slot] = new
+            changed.append(coin.upper())
+        self._changes += len(changed)
+        if self._changes >= _RESUM:
+            self._total = math.fsum(value)
+            self._changes = 0
+        else:
+            self._total += delta
+        return changed
+
+    def set_prices(self, prices):
+        """
+        :param prices:
+            a dict keyed by coin of ``SpotPrice`` or numbers; coins left out
+            keep their price
+        :return:
+            the coins whose price changed
+        """
+        return self._set(self._price, prices)
+
+    def set_balances(self, balances):
+        """
+        :param balances:
+            a dict keyed by coin of ``Balance`` or numbers; coins left out
+            keep their balance
+        :return:
+            the coins whose balance changed
+        """
+        return self._set(self._balance, balances)
+
+    def apply_spot(self, response):
+        """
+        Take the prices from a ``spot`` response, raw or parsed
+
+        :return:
+            the coins whose price changed
+        :raises APIError:
+            when the response is an error
+        """
+        return self.set_prices(_parsed(SPOT, response))
+
+    def apply_balances(self, response):
+        """
+        Take the balances from a ``balances`` response, raw or parsed
+
+        :return:
+            the coins whose balance changed
+        :raises APIError:
+            when the response is an error
+        """
+        return self.set_balances(_parsed(BALANCES, response))
+
+    def record(self, update):
+        """
+        Take the prices from a ``MarketDataHub`` spot update; other updates
+        are ignored
+
+        :return:
+            the coins whose price changed
+        """
+        if update.kind != "spot":
+            return []
+        return self.set_prices(update.data)
+
+    def refresh(self, client):
+        """
+        Fetch ``balances`` and ``spot`` with ``client`` and take both
+
+        :return:
+            the coins whose balance or price changed
+        :raises APIError:
+            when either response is an error
+        """
+        changed = self.apply_balances(client.balances())
+        seen = set(changed)
+        changed.extend(coin for coin in self.apply_spot(client.spot()) if coin not in seen)
+        return changed
+
+    @property
+    def coins(self):
+        """
+        The coins seen so far, in slot order
+        """
+        return list(self._coins)
+
+    @property
+    def total(self):
+        """
+        The AUD value of every balance at its latest price
+        """
+        return self._total
+
+    def balance(self, coin):
+        slot = self._slots.get(coin.upper())
+        return self._balance[slot] if slot is not None else 0.0
+
+    def price(self, coin):
+        """
+        :return:
+            the latest price of ``coin``, None if it has none
+        """
+        slot = self._slots.get(coin.upper())
+        return self._price[slot] if slot is not None and self._price[slot] else None
+
+    def value(self, coin):
+        """
+        :return:
+            the AUD value of the balance of ``coin``
+        """
+        slot = self._slots.get(coin.upper())
+        return self._value[slot] if slot is not None else 0.0
+
+    def values(self):
+        """
+        :return:
+            a dict of the AUD value held of each coin, leaving out coins
+            worth nothing
+        """
+        return {coin: value for coin, value in zip(self._coins, self._value) if value}
+
+    def exposure(self, coin):
+        """
+        :return:
+            the fraction of the total held in ``coin``, 0.0 when the total
+            is nothing
+        """
+        return self.value(coin) / self._total if self._total else 0.0
+
+    def exposures(self):
+        """
+        :return:
+            a dict of the fraction of the total held in each coin, leaving
+            out coins worth nothing
+        """
+        total = self._total
+        if not total:
+            return {}
+        return {coin: value / total for coin, value in self.values().items()}
+
+    def as_numpy(self):
+        """
+        :return:
+            a dict of the ``balance``, ``price`` and ``value`` columns as
+            NumPy arrays sharing their memory, in the order of ``coins``;
+            they are only valid until a new coin is added
+        """
+        if numpy is None:
+            raise ImportError("numpy is required for as_numpy()")
+        return {
+            "balance": numpy.frombuffer(self._balance, dtype=numpy.float64),
+            "price": numpy.frombuffer(self._price, dtype=numpy.float64),
+            "value": numpy.frombuffer(self._value, dtype=numpy.float64),
+        }
+
+
+class Valuation:
+    """
+    Many accounts valued against one set of prices
+
+    ``values[i][j]`` is the AUD value account ``accounts[i]`` holds of coin
+    ``coins[j]``; a NumPy matrix when NumPy is installed, otherwise a list
+    of ``array('d')`` rows.
+    """
+
+    __slots__ = ("accounts", "coins", "values", "totals", "by_coin", "total")
+
+    def __init__(self, accounts, coins, values, totals, by_coin):
+        self.accounts = accounts
+        self.coins = coins
+        self.values = values
+        self.totals = totals
+        self.by_coin = by_coin
+        self.total = math.fsum(totals.values())
+
+    def exposures(self):
+        """
+        :return:
+            a dict of the fraction of the combined total held in each coin
+        """
+        if not self.total:
+            return {}
+        return {coin: value / self.total for coin, value in self.by_coin.items() if value}
+
+    def __repr__(self):
+        return "Valuation(accounts=%d, coins=%d, total=%r)" % (
+            len(self.accounts),
+            len(self.coins),
+            self.total,
+        )
+
+
+def value_accounts(balances, prices):
+    """
+    Value every account's balances at the same prices in one pass
+
+    :param balances:
+        a dict keyed by account of ``balances`` responses, raw or parsed,
+        or dicts of numbers by coin, such as ``CoinSpotPool.balances_all()``
+    :param prices:
+        a ``spot`` response, raw or parsed, or a dict of numbers by coin
+    :return:
+        a ``Valuation`` holding ``totals`` keyed by account and ``by_coin``,
+        the value of each coin across the accounts
+    :raises CoinSpotError:
+        when a response is an error or an exception in its place
+    """
+    if not isinstance(prices, dict) or "status" in prices:
+        prices = _parsed(SPOT, prices)
+    rows = {}
+    for account, response in balances.items():
+        if isinstance(response, Exception):
+            raise response
+        if not isinstance(response, dict) or "status" in response:
+            response = _parsed(BALANCES, response)
+        rows[account] = {coin.upper(): _number(amount) for coin, amount in response.items()}
+    accounts = list(rows)
+    coins = sorted({coin for row in rows.values() for coin in row})
+    column = {coin: j for j, coin in enumerate(coins)}
+    price = array("d", (_number(prices[coin]) if coin in prices else 0.0 for coin in coins))
+    if numpy is not None:
+        # scatter each account's holdings into a zeroed matrix, touching only
+        # the coins it holds, then price every cell at once
+        matrix = numpy.zeros((len(accounts), len(coins)))
+        slot = column.__getitem__
+        for i, account in enumerate(accounts):
+            row = rows[account]
+            held = len(row)
+            matrix[i, numpy.fromiter(map(slot, row), numpy.intp, held)] = numpy.fromiter(
+                row.values(), numpy.float64, held
+            )
+        values = matrix * numpy.frombuffer(price, dtype=numpy.float64)
+        totals = dict(zip(accounts, values.sum(axis=1).tolist()))
+        by_coin = dict(zip(coins, values.sum(axis=0).tolist()))
+    else:
+        values = []
+        for account in accounts:
+            row = array("d", bytes(8 * len(coins)))
+            for coin, amount in rows[account].items():
+                j = column[coin]
+                row[j] = amount * price[j]
+            values.append(row)
+        totals = {account: math.fsum(row) for account, row in zip(accounts, values)}
+        by_coin = {coin: math.fsum(row[j] for row in values) for j, coin in enumerate(coins)}
+    return Valuation(accounts, coins, values, totals, by_coin)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ratelimit.py - Client side pacing of requests to the CoinSpot API.
+
+A ``RequestScheduler`` sits in front of ``CoinSpot._request``.  Every request
+takes a token from a bucket shared by the whole API key and, optionally, from
+a bucket of its own endpoint.  Requests that have to wait queue in priority
+lanes so that order placement and withdrawals go ahead of market data polls.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+PRIORITY_TRADE = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_POLL = 2
+
+LANES = {PRIORITY_TRADE: "trade", PRIORITY_ACCOUNT: "account", PRIORITY_POLL: "poll"}
+
+DEFAULT_PRIORITIES = {
+    "/api/my/buy": PRIORITY_TRADE,
+    "/api/my/sell": PRIORITY_TRADE,
+    "/api/my/buy/cancel": PRIORITY_TRADE,
+    "/api/my/sell/cancel": PRIORITY_TRADE,
+    "/api/my/coin/send": PRIORITY_TRADE,
+    "/api/spot": PRIORITY_POLL,
+    "/api/orders": PRIORITY_POLL,
+    "/api/orders/history": PRIORITY_POLL,
+}
+
+# CoinSpot allows 1000 requests a minute per API key
+DEFAULT_RATE = 1000 / 60.0
+DEFAULT_BURST = 10
+
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at ``rate`` tokens per second
+
+    :param rate:
+        tokens added per second
+    :param capacity:
+        the most tokens the bucket holds, which is the largest burst allowed
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now):
+        """
+        Seconds until a token is available, 0 when one is available now
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RequestScheduler:
+    """
+    Paces requests with token buckets and serves waiting requests by priority
+
+    One scheduler may be shared by several clients and by threads and event
+    loops at the same time; the blocking client calls ``acquire`` and the
+    asyncio client awaits ``acquire_async``.
+
+    :param rate:
+        requests per second allowed across all endpoints, default 1000 a minute
+    :param burst:
+        the most requests that may be sent back to back, default 10
+    :param budgets:
+        an optional ``{path: (rate, burst)}`` dict of extra per endpoint limits
+    :param priorities:
+        an optional ``{path: priority}`` dict overriding ``DEFAULT_PRIORITIES``;
+        lower numbers are served first and unlisted paths get PRIORITY_ACCOUNT
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, budgets=None, priorities=None):
+        self._bucket = TokenBucket(rate, burst)
+        self._buckets = {
+            path: TokenBucket(*budget) for path, budget in (budgets or {}).items()
+        }
+        self._priorities = dict(DEFAULT_PRIORITIES)
+        self._priorities.update(priorities or {})
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._waits = {}
+
+    def priority(self, path):
+        return self._priorities.get(path, PRIORITY_ACCOUNT)
+
+    def _enqueue(self, path):
+        ticket = (self.priority(path), next(self._tickets), path)
+        heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _dequeue(self, ticket):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            self._ready.notify_all()
+
+    def _endpoint_delay(self, path, now):
+        bucket = self._buckets.get(path)
+        return bucket.delay(now) if bucket is not None else 0
+
+    def _poll(self, ticket, start):
+        """
+        Try to send ``ticket`` now; must be called holding the lock
+
+        The ticket goes when it is the highest priority waiting request whose
+        own endpoint budget has a token and the shared bucket has one too.
+
+        :return:
+            0 once the ticket has been let through, otherwise the seconds to
+            wait before trying again, or None to wait for another ticket to go
+        """
+        now = time.monotonic()
+        path = ticket[2]
+        delay = self._endpoint_delay(path, now)
+        if delay:
+            return delay
+        for waiting in sorted(self._waiting):
+            if waiting == ticket:
+                break
+            if not self._endpoint_delay(waiting[2], now):
+                return None
+        delay = self._bucket.delay(now)
+        if delay:
+            return delay
+        self._waiting.remove(ticket)
+        heapq.heapify(self._waiting)
+        self._bucket.take()
+        if path in self._buckets:
+            self._buckets[path].take()
+        self._record(path, ticket[0], now - start)
+        self._ready.notify_all()
+        return 0
+
+    def _record(self, path, priority, waited):
+        for key in (LANES.get(priority, priority), path):
+            stats = self._waits.get(key)
+            if stats is None:
+                stats = self._waits[key] = {"count": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += waited
+            stats["max"] = max(stats["max"], waited)
+
+    def acquire(self, path):
+        """
+        Block until a request to ``path`` may be sent
+
+        :return:
+            the seconds spent waiting
+        """
+        start = time.monotonic()
+        with self._ready:
+            ticket = self._enqueue(path)
+            try:
+                while True:
+                    delay = self._poll(ticket, start)
+                    if delay == 0:
+                        return time.monotonic() - start
+                    self._ready.wait(delay)
+            finally:
+                self._dequeue(ticket)
+
+    async def acquire_async(self, path):
+        """
+        Wait on the event loop until a request to ``path`` may be sent
+
+        :return:
+            the seconds spent waiting
+        """
+        import asyncio
+
+        start = time.monotonic()
+        with self._lock:
+            ticket = self._enqueue(path)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._poll(ticket, start)
+                if delay == 0:
+                    return time.monotonic() - start
+                # nothing wakes a coroutine when the ticket ahead goes, so
+                # look again after roughly one token's worth of time
+                await asyncio.sleep(delay or 1 / self._bucket.rate)
+        finally:
+            with self._lock:
+                self._dequeue(ticket)
+
+    @property
+    def queue_depth(self):
+        """
+        The number of requests currently waiting to be sent
+        """
+        return len(self._waiting)
+
+    def stats(self):
+        """
+        Queue depth and wait time metrics
+
+        :return:
+            - **queue_depth** - waiting requests, keyed by lane name
+            - **waits** - the count, total and max seconds waited, keyed by
+              lane name and by path
+        """
+        with self._lock:
+            depth = dict.fromkeys(LANES.values(), 0)
+            for priority, _, _ in self._waiting:
+                lane = LANES.get(priority, priority)
+                depth[lane] = depth.get(lane, 0) + 1
+            waits = {key: dict(stats) for key, stats in self._waits.items()}
+        return {"queue_depth": depth, "waits": waits}
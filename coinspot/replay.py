@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+replay.py - Recording and replaying API traffic without the exchange.
+
+A client's transport is the object it sends requests through, the connection
+pool by default; any object with the same ``request``, ``stream`` and
+``clear`` methods can be passed as ``CoinSpot(transport=...)``.
+
+``RecordingTransport`` wraps a real transport and keeps every request and
+response that passes through it.  ``ReplayTransport`` and
+``AsyncReplayTransport`` serve recorded responses back, matched on the path
+and the payload minus its nonce, with configurable latency and injected
+failures.  Together they let the clients be tested and load-tested offline.
+"""
+
+import asyncio
+import base64
+import contextlib
+import http.client
+import io
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+
+
+def request_key(body):
+    """
+    The payload of a request body with the nonce left out, as a canonical
+    string, so requests that differ only in their nonce match
+    """
+    if not body:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body
+    if isinstance(payload, dict):
+        payload.pop("nonce", None)
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+
+class Exchange:
+    """
+    One recorded request and its response
+
+    :param path:
+        the API path
+    :param request:
+        the request payload as returned by ``request_key``
+    :param status:
+        the HTTP status of the response
+    :param body:
+        the response body, bytes
+    :param elapsed:
+        seconds the exchange took when it was recorded
+    """
+
+    __slots__ = ("path", "request", "status", "reason", "body", "elapsed")
+
+    def __init__(self, path, request, status, body, reason="OK", elapsed=0.0):
+        self.path = path
+        self.request = request
+        self.status = status
+        self.reason = reason
+        self.body = body
+        self.elapsed = elapsed
+
+    def to_dict(self):
+        data = {
+            "path": self.path,
+            "request": self.request,
+            "status": self.status,
+            "reason": self.reason,
+            "elapsed": self.elapsed,
+        }
+        try:
+            data["body"] = self.body.decode("utf-8")
+        except UnicodeDecodeError:
+            data["body_base64"] = base64.b64encode(self.body).decode("ascii")
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        if "body_base64" in data:
+            body = base64.b64decode(data["body_base64"])
+        else:
+            body = data["body"].encode("utf-8")
+        return cls(
+            data["path"],
+            data.get("request", ""),
+            data.get("status", 200),
+            body,
+            data.get("reason", "OK"),
+            data.get("elapsed", 0.0),
+        )
+
+    def __repr__(self):
+        return "Exchange(path=%r, request=%r, status=%r, %d bytes)" % (
+            self.path,
+            self.request,
+            self.status,
+            len(self.body),
+        )
+
+
+def save(exchanges, filename):
+    """
+    Write exchanges to ``filename``, one JSON object per line
+    """
+    with open(filename, "w") as output:
+        for exchange in exchanges:
+            output.write(json.dumps(exchange.to_dict()) + "\n")
+
+
+def load(filename):
+    """
+    :return:
+        the list of ``Exchange`` saved in ``filename``
+    """
+    with open(filename) as source:
+        return [Exchange.from_dict(json.loads(line)) for line in source if line.strip()]
+
+
+def from_fixtures(calls):
+    """
+    Build exchanges from a ``{path: data}`` dict of decoded responses, such
+    as ``tests/fixtures.calls()``
+    """
+    return [
+        Exchange(path, "", 200, json.dumps(data).encode("utf-8"))
+        for path, data in calls.items()
+    ]
+
+
+class _RecordedStream:
+    """
+    Passes reads through to a streamed response and keeps what was read
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.chunks = []
+
+    def read(self, n=-1):
+        chunk = self._response.read(n)
+        self.chunks.append(chunk)
+        return chunk
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class RecordingTransport:
+    """
+    Passes requests through to a blocking ``transport`` and records each
+    exchange
+
+    Streamed responses are recorded once they have been read to the end.
+
+    :param transport:
+        the transport to record, such as a ``ConnectionPool``
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.exchanges = []
+        self._lock = threading.Lock()
+
+    def _record(self, path, body, response, data, started):
+        exchange = Exchange(
+            path,
+            request_key(body),
+            response.status,
+            data,
+            response.reason,
+            time.perf_counter() - started,
+        )
+        with self._lock:
+            self.exchanges.append(exchange)
+
+    def request(self, method, path, body=None, headers=None, trace=None):
+        started = time.perf_counter()
+        response, data = self.transport.request(method, path, body, headers, trace=trace)
+        self._record(path, body, response, data, started)
+        return response, data
+
+    @contextlib.contextmanager
+    def stream(self, method, path, body=None, headers=None, trace=None):
+        started = time.perf_counter()
+        with self.transport.stream(method, path, body, headers, trace=trace) as response:
+            recorded = _RecordedStream(response)
+            yield recorded
+        if recorded.chunks and not recorded.chunks[-1]:
+            self._record(path, body, response, b"".join(recorded.chunks), started)
+
+    def save(self, filename):
+        with self._lock:
+            save(self.exchanges, filename)
+
+    def clear(self):
+        self.transport.clear()
+
+    def __len__(self):
+        return len(self.transport)
+
+
+class ReplayResponse:
+    """
+    A recorded response, with the attributes the client reads from an
+    ``http.client.HTTPResponse``
+    """
+
+    version = 11
+    will_close = False
+
+    def __init__(self, status, reason, data):
+        self.status = status
+        self.reason = reason
+        self.msg = http.client.HTTPMessage()
+        self._body = io.BytesIO(data)
+
+    def read(self, n=-1):
+        return self._body.read(n)
+
+    def isclosed(self):
+        return self._body.tell() == len(self._body.getbuffer())
+
+
+class _AsyncReplayBody:
+    def __init__(self, data):
+        self._body = io.BytesIO(data)
+        self.complete = False
+
+    async def read(self, n=-1):
+        chunk = self._body.read(n)
+        if not chunk or n < 0:
+            self.complete = True
+        return chunk
+
+
+class _ReplayPipeline:
+    """
+    Answers pipelined requests in order, each ``latency`` after it was sent,
+    so a batch in flight waits about one round trip rather than one each
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+        self._sent = deque()
+        self.closed = False
+
+    @property
+    def outstanding(self):
+        return len(self._sent)
+
+    def send(self, method, path, body=None, headers=None):
+        self._sent.append((time.monotonic() + self._transport._delay(), path, body))
+
+    def _next(self):
+        due, path, body = self._sent.popleft()
+        return due - time.monotonic(), path, body
+
+    def receive(self):
+        wait, path, body = self._next()
+        if wait > 0:
+            time.sleep(wait)
+        return self._transport._answer(path, body)
+
+
+class _AsyncReplayPipeline(_ReplayPipeline):
+    async def send(self, method, path, body=None, headers=None):
+        _ReplayPipeline.send(self, method, path, body, headers)
+
+    async def receive(self):
+        wait, path, body = self._next()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self._transport._answer(path, body)
+
+
+class ReplayTransport:
+    """
+    Serves recorded exchanges back in place of the exchange
+
+    A request is answered with an exchange recorded for the same path and
+    payload, or failing that for the same path, cycling through them in
+    order when there are several.  A path with no recording gets an API
+    error response.
+
+    :param exchanges:
+        a list of ``Exchange``, see ``load`` and ``from_fixtures``
+    :param latency:
+        seconds to wait before answering, or a callable returning them, for
+        example ``lambda: random.expovariate(1 / 0.05)``
+    :param error_rate:
+        the fraction of requests that fail with one of ``errors``
+    :param errors:
+        the exception classes to raise for injected failures
+    :param status_error_rate:
+        the fraction of requests answered with ``503 Service Unavailable``
+    :param seed:
+        seeds the random choices so a run can be repeated
+    """
+
+    def __init__(
+        self,
+        exchanges,
+        latency=0.0,
+        error_rate=0.0,
+        errors=(ConnectionResetError,),
+        status_error_rate=0.0,
+        seed=None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.errors = tuple(errors)
+        self.status_error_rate = status_error_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        by_request = {}
+        by_path = {}
+        for exchange in exchanges:
+            by_request.setdefault((exchange.path, exchange.request), []).append(exchange)
+            by_path.setdefault(exchange.path, []).append(exchange)
+        self._by_request = {key: itertools.cycle(found) for key, found in by_request.items()}
+        self._by_path = {key: itertools.cycle(found) for key, found in by_path.items()}
+
+    def _delay(self):
+        latency = self.latency
+        return latency() if callable(latency) else latency
+
+    def _answer(self, path, body):
+        """
+        Pick the response to ``path``, or raise an injected error
+
+        :return:
+            a ``(response, data)`` tuple
+        """
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            if roll < self.error_rate:
+                error = self._random.choice(self.errors)
+                raise error("injected failure for %s" % path)
+            if roll < self.error_rate + self.status_error_rate:
+                return ReplayResponse(503, "Service Unavailable", b""), b""
+            found = self._by_request.get((path, request_key(body)))
+            if found is None:
+                found = self._by_path.get(path)
+            exchange = next(found) if found is not None else None
+        if exchange is None:
+            data = b'{"status":"error","message":"no recording for this path"}'
+            return ReplayResponse(200, "OK", data), data
+        return ReplayResponse(exchange.status, exchange.reason, exchange.body), exchange.body
+
+    def request(self, method, path, body=None, headers=None, trace=None):
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._answer(path, body)
+
+    @contextlib.contextmanager
+    def stream(self, method, path, body=None, headers=None, trace=None):
+        response, _ = self.request(method, path, body, headers, trace)
+        yield response
+
+    @contextlib.contextmanager
+    def pipeline(self):
+        yield _ReplayPipeline(self)
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class AsyncReplayTransport(ReplayTransport):
+    """
+    ``ReplayTransport`` for ``AsyncCoinSpot``, waiting with ``asyncio.sleep``
+    """
+
+    async def request(self, method, path, body=None, headers=None, trace=None):
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._answer(path, body)
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, path, body=None, headers=None, trace=None):
+        response, data = await self.request(method, path, body, headers, trace)
+        response.body = _AsyncReplayBody(data)
+        yield response
+
+    @contextlib.asynccontextmanager
+    async def pipeline(self):
+        yield _AsyncReplayPipeline(self)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+resilience.py - Retries, circuit breaking and hedging for CoinSpot requests.
+
+``RetryPolicy`` sends failed requests again after a jittered exponential
+backoff, but only to read-only endpoints, where a duplicate request cannot
+place a second order or send coins twice.  ``CircuitBreaker`` stops calling an
+endpoint that keeps failing and lets a single trial request through once it
+has had time to recover.  The client hedges ``spot`` itself, with the
+``hedge_after`` argument.
+"""
+
+import random
+import threading
+import time
+
+from .errors import CircuitOpenError
+
+
+# endpoints that only read data, so sending a request twice is harmless
+SAFE_PATHS = frozenset(
+    (
+        "/api/spot",
+        "/api/orders",
+        "/api/orders/history",
+        "/api/quote/buy",
+        "/api/quote/sell",
+        "/api/my/balances",
+        "/api/my/orders",
+    )
+)
+
+# endpoints that may be hedged, cheap enough to ask for twice
+HEDGED_PATHS = frozenset(("/api/spot",))
+
+
+class RetryPolicy:
+    """
+    How often and how soon a failed request is sent again
+
+    The delay before retry ``n`` is drawn uniformly between 0 and
+    ``min(cap, base * 2 ** n)``, so clients that failed together do not
+    retry together.
+
+    :param attempts:
+        the most times a request is sent, including the first
+    :param base:
+        seconds of the backoff before the first retry
+    :param cap:
+        the longest backoff in seconds
+    :param paths:
+        the endpoints that may be retried, ``SAFE_PATHS`` by default
+    """
+
+    def __init__(self, attempts=3, base=0.1, cap=2.0, paths=SAFE_PATHS):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.paths = frozenset(paths)
+
+    def delays(self, path):
+        """
+        :return:
+            an iterator of the backoff before each retry of ``path``, empty
+            if it may not be retried
+        """
+        if path not in self.paths:
+            return iter(())
+        return (
+            random.uniform(0, min(self.cap, self.base * 2 ** retry))
+            for retry in range(self.attempts - 1)
+        )
+
+
+class _Circuit:
+    __slots__ = ("failures", "opened", "probing")
+
+    def __init__(self):
+        self.failures = 0
+        self.opened = None
+        self.probing = False
+
+
+class CircuitBreaker:
+    """
+    Per endpoint circuit breakers
+
+    An endpoint's circuit opens after ``threshold`` consecutive failures and
+    requests to it raise ``CircuitOpenError`` without being sent.  After
+    ``reset_timeout`` seconds one trial request is let through: if it succeeds
+    the circuit closes, if it fails the circuit opens again.
+
+    :param threshold:
+        consecutive failures that open a circuit
+    :param reset_timeout:
+        seconds a circuit stays open before a trial request
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, path):
+        circuit = self._circuits.get(path)
+        if circuit is None:
+            circuit = self._circuits[path] = _Circuit()
+        return circuit
+
+    def before(self, path):
+        """
+        Call before sending a request to ``path``
+
+        :raises CircuitOpenError:
+            if the circuit is open, or half open with a trial under way
+        """
+        with self._lock:
+            circuit = self._circuit(path)
+            if circuit.opened is None:
+                return
+            waited = time.monotonic() - circuit.opened
+            if waited >= self.reset_timeout and not circuit.probing:
+                circuit.probing = True
+                return
+        raise CircuitOpenError(
+            "Circuit open for %s" % path,
+            path,
+            retry_after=max(0.0, self.reset_timeout - waited),
+        )
+
+    def success(self, path):
+        with self._lock:
+            circuit = self._circuit(path)
+            circuit.failures = 0
+            circuit.opened = None
+            circuit.probing = False
+
+    def failure(self, path):
+        with self._lock:
+            circuit = self._circuit(path)
+            circuit.failures += 1
+            if circuit.probing or circuit.failures >= self.threshold:
+                circuit.opened = time.monotonic()
+            circuit.probing = False
+
+    def abandon(self, path):
+        """
+        Call when a request to ``path`` was given up before it had an
+        outcome, such as when it was cancelled
+
+        Nothing is counted, but a half-open trial's place is given back so
+        the next request can be the trial.
+        """
+        with self._lock:
+            self._circuit(path).probing = False
+
+    def state(self, path):
+        """
+        :return:
+            ``"closed"``, ``"open"`` or ``"half-open"``
+        """
+        with self._lock:
+            circuit = self._circuits.get(path)
+            if circuit is None or circuit.opened is None:
+                return "closed"
+            if circuit.probing or time.monotonic() - circuit.opened >= self.reset_timeout:
+                return "half-open"
+            return "open"
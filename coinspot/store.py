@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+store.py - An append-only on-disk history of spot prices and trades.
+
+``orderhistory`` only reaches back 1000 trades and ``spot`` only gives the
+price now, so a backtest needs history kept locally.  ``TickStore`` keeps it
+in a directory per coin, with one file per column of fixed-width binary
+values::
+
+    <root>/BTC/spot.time       int64 milliseconds since the epoch
+    <root>/BTC/spot.price      float64
+    <root>/BTC/trades.time     int64 solddate in milliseconds
+    <root>/BTC/trades.rate     float64
+    <root>/BTC/trades.amount   float64
+    <root>/BTC/trades.total    float64
+    <root>/BTC/*.index         the time of every ``BLOCK``-th row
+
+Rows are only ever appended, in time order.  Reads memory-map the columns:
+``range`` finds the rows between two times with a binary search of the
+sparse index and then of one block of the time column, and copies the
+columns out as ``array`` objects without making a Python object per row.
+``ohlcv`` downsamples the rows to bars, with NumPy when it is installed.
+
+One process writes a store; any number may read it while it is written.
+"""
+
+import itertools
+import math
+import mmap
+import os
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from .columnar import OrderColumns
+from .models import PARSERS, SpotPrice, decode
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# rows per sparse index entry: a block of times is 32 KiB, eight pages
+BLOCK = 4096
+
+SPOT = (("price", "d"),)
+TRADES = (("rate", "d"), ("amount", "d"), ("total", "d"))
+
+
+def _milliseconds(value):
+    """
+    :return:
+        a number of milliseconds, or a ``timedelta``, as whole milliseconds
+    """
+    if isinstance(value, timedelta):
+        return value // timedelta(milliseconds=1)
+    return int(round(value))
+
+
+class _Column:
+    """
+    One column file, appended to through a file and read through a mapping
+    that is widened as the file grows
+    """
+
+    def __init__(self, path, typecode):
+        self.path = path
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        self._file = None
+        self._map = None
+
+    def append(self, values):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(values.tobytes())
+        self._file.flush()
+
+    def truncate(self, rows):
+        """
+        Cut the file back to ``rows`` rows, dropping what a failed append
+        left behind
+        """
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                # the buffered tail is being thrown away anyway
+                pass
+            self._file = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        os.truncate(self.path, rows * self.itemsize)
+
+    def __len__(self):
+        try:
+            return os.stat(self.path).st_size // self.itemsize
+        except FileNotFoundError:
+            return 0
+
+    def _mapped(self, rows):
+        """
+        :return:
+            a mapping covering at least ``rows`` rows
+        """
+        needed = rows * self.itemsize
+        if self._map is None or len(self._map) < needed:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            with open(self.path, "rb") as source:
+                self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read(self, start, stop):
+        """
+        :return:
+            rows ``start`` to ``stop`` as an ``array``
+        """
+        values = array(self.typecode)
+        if stop > start:
+            with memoryview(self._mapped(stop)) as view:
+                with view[start * self.itemsize : stop * self.itemsize] as rows:
+                    values.frombytes(rows)
+        return values
+
+    def bisect(self, value, lo, hi):
+        """
+        The first row in ``lo`` to ``hi`` whose value is not below ``value``
+        """
+        if lo >= hi:
+            return lo
+        with memoryview(self._mapped(hi)) as view, view.cast(self.typecode) as values:
+            return bisect_left(values, value, lo, hi)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class _Series:
+    """
+    A time column and its value columns, with the sparse index of the times
+    """
+
+    def __init__(self, directory, name, columns):
+        self.time = _Column(os.path.join(directory, name + ".time"), "q")
+        self.columns = [
+            _Column(os.path.join(directory, "%s.%s" % (name, column)), typecode)
+            for column, typecode in columns
+        ]
+        self._index_path = os.path.join(directory, name + ".index")
+        self._index = None
+        self._index_file = None
+
+    def __len__(self):
+        # the time column is written last, and a row is complete once every
+        # column holds it
+        return min(len(column) for column in [self.time] + self.columns)
+
+    def _load_index(self, rows):
+        """
+        Bring the in-memory index up to date with ``rows`` rows, reading it
+        from disk the first time and filling in entries another process or a
+        crash left out
+        """
+        if self._index is None:
+            self._index = array("q")
+            if os.path.exists(self._index_path):
+                with open(self._index_path, "rb") as source:
+                    self._index.frombytes(source.read())
+        wanted = -(-rows // BLOCK)
+        del self._index[wanted:]
+        for row in range(len(self._index) * BLOCK, rows, BLOCK):
+            self._index.append(self.time.read(row, row + 1)[0])
+        return self._index
+
+    def last_time(self):
+        rows = len(self)
+        return self.time.read(rows - 1, rows)[0] if rows else None
+
+    def append(self, times, values):
+        """
+        :param times:
+            an ``array('q')`` of times, not before the last time stored
+        :param values:
+            an ``array`` per value column
+        """
+        if not times:
+            return
+        last = self.last_time()
+        if last is not None and times[0] < last:
+            raise ValueError("rows must be appended in time order")
+        rows = len(self)
+        for column in [self.time] + self.columns:
+            if len(column) != rows:
+                # an append that failed part way, or a crash, left this
+                # column ahead of the others; line them up again first
+                column.truncate(rows)
+        index = self._load_index(rows)
+        for column, column_values in zip(self.columns, values):
+            column.append(column_values)
+        self.time.append(times)
+        first = len(index) * BLOCK
+        added = array("q", (times[row - rows] for row in range(first, rows + len(times), BLOCK)))
+        if added:
+            if self._index_file is None:
+                with open(self._index_path, "wb") as output:
+                    output.write(index.tobytes())
+                self._index_file = open(self._index_path, "ab")
+            index.extend(added)
+            self._index_file.write(added.tobytes())
+            self._index_file.flush()
+
+    def rows_between(self, t0, t1):
+        """
+        :return:
+            the ``(start, stop)`` rows of times from ``t0`` up to ``t1``
+        """
+        rows = len(self)
+        index = self._load_index(rows)
+
+        def find(value):
+            if value is None:
+                return rows
+            block = bisect_left(index, value)
+            lo = max(0, block - 1) * BLOCK
+            hi = min(rows, block * BLOCK)
+            return self.time.bisect(value, lo, hi) if lo < hi else hi
+
+        start = 0 if t0 is None else find(t0)
+        return start, max(start, find(t1))
+
+    def read(self, start, stop):
+        return self.time.read(start, stop), [column.read(start, stop) for column in self.columns]
+
+    def close(self):
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+        for column in [self.time] + self.columns:
+            column.close()
+
+
+class SpotColumns:
+    """
+    Spot prices stored column-wise
+
+    ``time`` is an ``array('q')`` of milliseconds since the epoch and
+    ``price`` an ``array('d')``.
+    """
+
+    __slots__ = ("coin", "time", "price")
+
+    def __init__(self, coin, time, price):
+        self.coin = coin
+        self.time = time
+        self.price = price
+
+    def __len__(self):
+        return len(self.time)
+
+    def as_numpy(self):
+        """
+        :return:
+            a dict of NumPy arrays sharing memory with the columns
+        """
+        if numpy is None:
+            raise ImportError("numpy is required for as_numpy()")
+        return {
+            "time": numpy.frombuffer(self.time, dtype=numpy.int64),
+            "price": numpy.frombuffer(self.price, dtype=numpy.float64),
+        }
+
+
+class Bars:
+    """
+    OHLCV bars stored column-wise
+
+    ``time`` is an ``array('q')`` of the millisecond each bar starts at, and
+    ``open``, ``high``, ``low``, ``close`` and ``volume`` are ``array('d')``.
+    Intervals without a tick have no bar.
+    """
+
+    __slots__ = ("coin", "interval", "time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, coin, interval, time=(), open=(), high=(), low=(), close=(), volume=()):
+        self.coin = coin
+        self.interval = interval
+        self.time = array("q", time)
+        self.open = array("d", open)
+        self.high = array("d", high)
+        self.low = array("d", low)
+        self.close = array("d", close)
+        self.volume = array("d", volume)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __iter__(self):
+        """
+        Yield each bar as a ``(time, open, high, low, close, volume)`` tuple
+        """
+        return zip(self.time, self.open, self.high, self.low, self.close, self.volume)
+
+
+def _bars(coin, interval, times, prices, volumes):
+    if numpy is not None and len(times):
+        times = numpy.frombuffer(times, dtype=numpy.int64)
+        prices = numpy.frombuffer(prices, dtype=numpy.float64)
+        buckets = times // interval
+        starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(buckets)) + 1))
+        ends = numpy.append(starts[1:], len(times)) - 1
+        volume = (
+            numpy.add.reduceat(numpy.frombuffer(volumes, dtype=numpy.float64), starts)
+            if volumes is not None
+            else numpy.zeros(len(starts))
+        )
+        return Bars(
+            coin,
+            interval,
+            (buckets[starts] * interval).tolist(),
+            prices[starts].tolist(),
+            numpy.maximum.reduceat(prices, starts).tolist(),
+            numpy.minimum.reduceat(prices, starts).tolist(),
+            prices[ends].tolist(),
+            volume.tolist(),
+        )
+    bars = Bars(coin, interval)
+    if volumes is None:
+        volumes = itertools.repeat(0.0)
+    rows = zip(times, prices, volumes)
+    for bucket, group in itertools.groupby(rows, key=lambda row: row[0] // interval):
+        group = list(group)
+        bar_prices = [row[1] for row in group]
+        bars.time.append(bucket * interval)
+        bars.open.append(bar_prices[0])
+        bars.high.append(max(bar_prices))
+        bars.low.append(min(bar_prices))
+        bars.close.append(bar_prices[-1])
+        bars.volume.append(math.fsum(row[2] for row in group))
+    return bars
+
+
+class TickStore:
+    """
+    A local history of spot prices and trades, one directory per coin
+
+    Every time is in milliseconds since the epoch, the unit of ``solddate``,
+    whether it is given as an int or a float.
+
+    :param root:
+        the directory to keep the history in, created if missing
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._series = {}
+
+    def _get(self, coin, kind):
+        series = self._series.get((coin, kind))
+        if series is None:
+            if not coin.isalnum():
+                raise ValueError("not a coin shortname: %r" % coin)
+            directory = os.path.join(self.root, coin)
+            os.makedirs(directory, exist_ok=True)
+            series = _Series(directory, kind, SPOT if kind == "spot" else TRADES)
+            self._series[(coin, kind)] = series
+        return series
+
+    def coins(self):
+        """
+        :return:
+            the coins with history in the store, sorted
+        """
+        return sorted(name for name in os.listdir(self.root) if name.isalnum())
+
+    def __len__(self):
+        return len(self._series)
+
+    def append_spot(self, prices, time_ms):
+        """
+        Store the spot prices taken at ``time``, skipping coins that already
+        have a later price
+
+        :param prices:
+            a dict of ``SpotPrice`` or prices keyed by coin
+        :param time_ms:
+            when the prices were taken, in milliseconds since the epoch
+        """
+        time_ms = _milliseconds(time_ms)
+        for coin, price in prices.items():
+            series = self._get(coin, "spot")
+            last = series.last_time()
+            if last is not None and time_ms < last:
+                # the clock was set back, keep the history in order
+                continue
+            if isinstance(price, SpotPrice):
+                price = price.price
+            series.append(array("q", [time_ms]), [array("d", [float(price)])])
+
+    def append_trades(self, coin, trades):
+        """
+        Store the trades of an ``orderhistory`` response that are newer than
+        the last trade stored, so overlapping polls are stored once
+
+        Trades sharing the last stored millisecond are taken to be stored
+        already.
+
+        :param trades:
+            a list of trade dicts or ``coinspot.models.Order``
+        :return:
+            the number of trades stored
+        """
+        columns = OrderColumns.from_rows(list(trades), coin)
+        series = self._get(coin, "trades")
+        last = series.last_time()
+        order = sorted(
+            (row for row in range(len(columns)) if last is None or columns.solddate[row] > last),
+            key=columns.solddate.__getitem__,
+        )
+        if not order:
+            return 0
+        series.append(
+            array("q", (columns.solddate[row] for row in order)),
+            [array("d", (getattr(columns, name)[row] for row in order)) for name, _ in TRADES],
+        )
+        return len(order)
+
+    def record(self, update):
+        """
+        Store a ``coinspot.feed.Update`` of spot prices or order history,
+        so a ``MarketDataHub`` subscription can feed the store
+        """
+        if update.kind == "spot":
+            # updates are stamped with time.time(), in seconds
+            self.append_spot(update.data, update.time * 1000)
+        elif update.kind == "orderhistory":
+            self.append_trades(update.coin, update.data)
+
+    def poll(self, client, cointypes=(), max_workers=None):
+        """
+        Fetch and store the spot prices, and the order history of
+        ``cointypes``, with ``client``
+
+        Failed requests are skipped and show up as gaps in the history.
+        """
+        taken = time.time() * 1000
+        prices = self._parsed("/api/spot", client.spot())
+        if prices is not None:
+            self.append_spot(prices, taken)
+        for coin, raw in client.iter_orderhistory(cointypes, max_workers):
+            if not isinstance(raw, Exception):
+                trades = self._parsed("/api/orders/history", raw)
+                if trades is not None:
+                    self.append_trades(coin, trades)
+
+    @staticmethod
+    def _parsed(path, response):
+        if isinstance(response, (bytes, str)):
+            data = decode(response)
+            return PARSERS[path](data) if data.get("status") == "ok" else None
+        # a client with models=True returns the decoded dict on an error
+        return None if isinstance(response, dict) and "status" in response else response
+
+    def range(self, coin, t0=None, t1=None, kind="trades"):
+        """
+        The history of ``coin`` from ``t0`` up to but not including ``t1``
+
+        :param kind:
+            ``"trades"`` or ``"spot"``
+        :return:
+            an ``OrderColumns`` of trades, or a ``SpotColumns``
+        """
+        series = self._get(coin, kind)
+        t0 = None if t0 is None else _milliseconds(t0)
+        t1 = None if t1 is None else _milliseconds(t1)
+        times, values = series.read(*series.rows_between(t0, t1))
+        if kind == "spot":
+            return SpotColumns(coin, times, values[0])
+        columns = OrderColumns(coin)
+        columns.solddate = times
+        columns.rate, columns.amount, columns.total = values
+        return columns
+
+    def ohlcv(self, coin, interval_ms, t0=None, t1=None, kind="trades"):
+        """
+        Downsample the history of ``coin`` to bars of ``interval_ms``
+
+        Trades give bars of their rate with the amount traded as volume;
+        spot prices give bars with no volume.
+
+        :param interval_ms:
+            the bar length in milliseconds, or a ``timedelta``
+        :return:
+            a ``Bars``
+        """
+        interval = _milliseconds(interval_ms)
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        history = self.range(coin, t0, t1, kind)
+        if kind == "spot":
+            return _bars(coin, interval, history.time, history.price, None)
+        return _bars(coin, interval, history.solddate, history.rate, history.amount)
+
+    def close(self):
+        for series in self._series.values():
+            series.close()
+        self._series.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+trades.py - Turning repeated ``orderhistory`` polls into a stream of new trades.
+
+``orderhistory`` always returns a coin's last 1000 completed orders, so
+consecutive polls overlap almost entirely.  ``TradeDeduplicator`` remembers a
+bounded window of the trades it has already passed on, keyed by solddate,
+amount and rate, and only lets new ones through.  Its memory use is fixed by
+the window size no matter how long it runs.
+"""
+
+import json
+from collections import OrderedDict
+
+
+def _key(trade):
+    if isinstance(trade, dict):
+        return trade["solddate"], trade["amount"], trade["rate"]
+    return trade.solddate, trade.amount, trade.rate
+
+
+class TradeDeduplicator:
+    """
+    Filters already seen trades out of overlapping order history polls
+
+    The most recent ``maxlen`` trade keys are remembered per coin.  When one is
+    evicted its solddate becomes the high-water floor, and any trade at or
+    below the floor is treated as seen, so nothing is passed on twice even
+    after it has left the window.
+
+    :param maxlen:
+        trade keys remembered per coin, which should be larger than the 1000
+        orders a poll returns
+    """
+
+    def __init__(self, maxlen=2048):
+        self.maxlen = maxlen
+        self._seen = {}
+        self._floor = {}
+
+    def new_trades(self, coin, trades):
+        """
+        :param trades:
+            an ``orderhistory`` list of trade dicts or ``coinspot.models.Order``
+        :return:
+            the trades not seen before, oldest first
+        """
+        seen = self._seen.get(coin)
+        if seen is None:
+            seen = self._seen[coin] = OrderedDict()
+        floor = self._floor.get(coin)
+
+        fresh = []
+        for trade in sorted(trades, key=_key):
+            key = _key(trade)
+            if key in seen or (floor is not None and key[0] <= floor):
+                continue
+            seen[key] = None
+            fresh.append(trade)
+
+        while len(seen) > self.maxlen:
+            evicted, _ = seen.popitem(last=False)
+            floor = evicted[0] if floor is None else max(floor, evicted[0])
+        self._floor[coin] = floor
+        return fresh
+
+
+def history_rows(response):
+    """
+    The trades in an ``orderhistory`` response, raw, decoded or parsed
+
+    :return:
+        a list of trades, empty when the response is an error
+    """
+    if isinstance(response, (bytes, str)):
+        response = json.loads(response)
+    if isinstance(response, dict):
+        if response.get("status") != "ok":
+            return []
+        return response.get("orders", [])
+    return response
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+transport.py - Keep-alive HTTPS connection pooling for the CoinSpot client.
+
+Opening a fresh ``HTTPSConnection`` per call pays a TCP and TLS handshake on
+every request.  The pools here keep idle connections open and hand them back
+out, dropping any that have sat idle for longer than the configured timeout
+and reconnecting when a reused connection turns out to be stale.  A request
+is only sent again on the new connection if the old one failed before the
+whole request was written, or if it is to a read-only endpoint, so a
+dropped connection never places an order twice.
+
+``ConnectionPool`` serves the blocking client.  ``AsyncConnectionPool``, in
+``coinspot.aiotransport``, serves the asyncio client; it is still importable
+from here, but only loads ``asyncio`` when it is first used.
+
+``pipeline`` sends several requests over one connection without waiting
+for each response, so they reach the server in the order they were sent.
+
+Both pools take an optional ``trace``, a ``coinspot.metrics.RequestTrace``,
+and fill in how long each phase of the exchange took.  Without one they do
+no timing at all.
+"""
+
+import contextlib
+import http.client
+import io
+import threading
+import time
+from collections import deque
+
+from .resilience import SAFE_PATHS
+
+
+# errors that mean a reused keep-alive socket was closed by the far end; if
+# the whole request had been written the server may have acted on it first
+STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class _PipelineReader(io.BufferedReader):
+    """
+    One buffered reader of a socket shared by the responses of a pipeline
+
+    ``HTTPResponse`` makes its own buffered file of the socket it is given,
+    which would swallow the start of the next response, and closes it once
+    the body has been read.  This reader is handed to each response as the
+    socket, returns itself from ``makefile`` and ignores ``close``.
+    """
+
+    def makefile(self, *args, **kwargs):
+        return self
+
+    def close(self):
+        pass
+
+    def release(self):
+        io.BufferedReader.close(self)
+
+
+class Pipeline:
+    """
+    Requests written back to back over one connection, their responses
+    read back in the order the requests were sent
+
+    The requests reach the server in the order they were sent, without
+    waiting a round trip for each response.  ``http.client`` allows one
+    request at a time per connection, so the requests are written to the
+    socket directly.  Use ``ConnectionPool.pipeline`` rather than making
+    one.
+
+    A pipeline always starts on a new connection: a stale pooled connection
+    could fail after requests have been written, and orders must not be
+    sent twice.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = pool._new_connection()
+        self._reader = None
+        self.outstanding = 0
+        self.closed = False
+        self.failed = False
+
+    def send(self, method, path, body=None, headers=None):
+        """
+        Write a request without waiting for the responses before it
+        """
+        try:
+            conn = self._conn
+            if conn.sock is None:
+                conn.connect()
+                self._reader = _PipelineReader(conn.sock.makefile("rb", buffering=0))
+            conn.sock.sendall(self._pool._encode_request(method, path, body, headers or {}))
+        except BaseException:
+            self.failed = True
+            raise
+        self.outstanding += 1
+
+    def receive(self):
+        """
+        Read the response to the oldest request not yet answered
+
+        Once a response says the connection will close, ``closed`` is set
+        and the server will not have processed any later request.
+
+        :return:
+            a ``(response, data)`` tuple, the response having been fully read
+        """
+        if self._reader is None:
+            raise ConnectionError("the pipeline never connected")
+        try:
+            response = http.client.HTTPResponse(
+                self._reader, self._conn.debuglevel, method="POST"
+            )
+            response.begin()
+            data = response.read()
+        except BaseException:
+            self.failed = True
+            raise
+        self.outstanding -= 1
+        if response.will_close:
+            self.closed = True
+        return response, data
+
+    def close(self):
+        """
+        Return the connection to the pool if every response was read,
+        otherwise close it
+        """
+        if self._reader is not None:
+            self._reader.release()
+        if self.failed or self.closed or self.outstanding:
+            self._conn.close()
+        else:
+            self._pool._put(self._conn)
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of persistent HTTPS connections to a single host.
+
+    :param host:
+        the host (optionally ``host:port``) to connect to
+    :param maxsize:
+        the maximum number of idle connections kept open
+    :param idle_timeout:
+        seconds an idle connection may sit in the pool before it is discarded
+    :param timeout:
+        socket timeout passed to each ``HTTPSConnection``
+    :param context:
+        an optional ``ssl.SSLContext`` used for every connection
+    """
+
+    def __init__(self, host, maxsize=4, idle_timeout=30.0, timeout=None, context=None):
+        self.host = host
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.context = context
+        self.debuglevel = 0
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        kwargs = {}
+        if self.timeout is not None:
+            kwargs["timeout"] = self.timeout
+        if self.context is not None:
+            kwargs["context"] = self.context
+        conn = http.client.HTTPSConnection(self.host, **kwargs)
+        conn.set_debuglevel(self.debuglevel)
+        return conn
+
+    def _get(self):
+        """
+        Take an idle connection out of the pool, or make a new one
+
+        :return:
+            a ``(connection, reused)`` tuple
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, released = self._idle.pop()
+                if now - released <= self.idle_timeout and conn.sock is not None:
+                    return conn, True
+                conn.close()
+        return self._new_connection(), False
+
+    def _put(self, conn):
+        with self._lock:
+            if conn.sock is not None and len(self._idle) < self.maxsize:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def _connect(self, conn, trace):
+        """
+        Open ``conn`` ahead of the request, timing the TCP connect apart from
+        the TLS handshake that follows it
+        """
+        create = conn._create_connection
+        tcp = []
+
+        def timed_create(*args, **kwargs):
+            started = time.perf_counter()
+            sock = create(*args, **kwargs)
+            tcp.append(time.perf_counter() - started)
+            return sock
+
+        conn._create_connection = timed_create
+        started = time.perf_counter()
+        try:
+            conn.connect()
+        finally:
+            conn._create_connection = create
+        elapsed = time.perf_counter() - started
+        trace.connect = tcp[0] if tcp else elapsed
+        trace.tls = elapsed - trace.connect
+
+    def _write(self, conn, method, path, body, headers, trace):
+        """
+        Write the whole request to ``conn``
+
+        :return:
+            when it was written, for the trace
+        """
+        if trace is None:
+            conn.request(method, path, body, headers or {})
+            return None
+        if conn.sock is None:
+            self._connect(conn, trace)
+        started = time.perf_counter()
+        conn.request(method, path, body, headers or {})
+        sent = time.perf_counter()
+        trace.send = sent - started
+        return sent
+
+    def _read_head(self, conn, trace, sent):
+        response = conn.getresponse()
+        if trace is not None:
+            trace.ttfb = time.perf_counter() - sent
+        return response
+
+    def _exchange(self, conn, method, path, body, headers, trace):
+        sent = self._write(conn, method, path, body, headers, trace)
+        return self._read_head(conn, trace, sent)
+
+    def _send(self, method, path, body, headers, trace=None):
+        """
+        Send a request and read the response head, reconnecting once if a
+        reused connection turns out to be stale
+
+        The request is sent again only if it was not yet written in full, or
+        if ``path`` is a read-only endpoint; otherwise the server may have
+        acted on it before the connection dropped.
+
+        :return:
+            a ``(connection, response)`` tuple
+        """
+        conn, reused = self._get()
+        try:
+            written = False
+            try:
+                sent = self._write(conn, method, path, body, headers, trace)
+                written = True
+                return conn, self._read_head(conn, trace, sent)
+            except STALE_ERRORS:
+                if not reused or (written and path not in SAFE_PATHS):
+                    raise
+                conn.close()
+                conn = self._new_connection()
+                return conn, self._exchange(conn, method, path, body, headers, trace)
+        except BaseException:
+            conn.close()
+            raise
+
+    def _encode_request(self, method, path, body, headers):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        body = body or b""
+        lines = ["%s %s HTTP/1.1" % (method, path), "Host: %s" % self.host]
+        for name, value in headers.items():
+            lines.append("%s: %s" % (name, value))
+        lines.append("Content-Length: %d" % len(body))
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    def _release(self, conn, response):
+        if response.will_close or not response.isclosed():
+            conn.close()
+        else:
+            self._put(conn)
+
+    def request(self, method, path, body=None, headers=None, trace=None):
+        """
+        Send a request over a pooled connection and read the whole response
+
+        A connection that fails with a stale keep-alive error is thrown away and
+        the request is sent once more over a freshly opened connection, if it
+        had not been written in full or is to a read-only endpoint.
+
+        :return:
+            a ``(response, data)`` tuple, the response having been fully read
+        """
+        conn, response = self._send(method, path, body, headers, trace)
+        try:
+            if trace is None:
+                data = response.read()
+            else:
+                started = time.perf_counter()
+                data = response.read()
+                trace.read = time.perf_counter() - started
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn, response)
+        return response, data
+
+    @contextlib.contextmanager
+    def stream(self, method, path, body=None, headers=None, trace=None):
+        """
+        Send a request and yield the unread response to be read incrementally
+
+        The connection goes back to the pool if the body was read to the end,
+        otherwise it is closed.
+        """
+        conn, response = self._send(method, path, body, headers, trace)
+        try:
+            yield response
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn, response)
+
+    @contextlib.contextmanager
+    def pipeline(self):
+        """
+        Yield a ``Pipeline`` for sending several requests over one
+        connection without waiting for each response
+        """
+        pipeline = Pipeline(self)
+        try:
+            yield pipeline
+        finally:
+            pipeline.close()
+
+    def clear(self):
+        """
+        Close every idle connection held by the pool
+        """
+        with self._lock:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+
+    def __len__(self):
+        return len(self._idle)
+
+
+# the asyncio pool lives in its own module so that the blocking client never
+# pays for importing asyncio
+_ASYNC_NAMES = (
+    "ASYNC_STALE_ERRORS",
+    "AsyncConnectionPool",
+    "AsyncResponse",
+    "_AsyncBody",
+    "_AsyncConnection",
+)
+
+
+def __getattr__(name):
+    if name in _ASYNC_NAMES:
+        from . import aiotransport
+
+        return getattr(aiotransport, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -52,4 +52,9 @@ setup(
     ],
     keywords='coinspot api development bitcoin dogecoin litecoin cryptocurrency',
     packages=find_packages(exclude=['contrib', 'docs', 'tests*']),
+
+    # Optional dependencies, installed with e.g. pip install py-coinspot-api[numpy]
+    extras_require={
+        'numpy': ['numpy'],
+    },
 )
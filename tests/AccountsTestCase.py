@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""AccountsTestCase.py: Unittests for running several accounts from one pool."""
+
+import json
+import shutil
+import tempfile
+import time
+import unittest
+from decimal import Decimal
+
+from coinspot import APIError, CoinSpot, CoinSpotConfig, CoinSpotPool, Profile, ResponseCache
+from coinspot.nonce import SharedNonce
+from coinspot.replay import Exchange, ReplayTransport
+
+
+BALANCES = {
+    "main": [{"btc": 1.5}, {"doge": 1000}],
+    "trading": [{"btc": 0.25}, {"ltc": 3}],
+    "reporting": [{"doge": 500}],
+}
+
+
+def account_transport(name, latency=0.0):
+    if name in BALANCES:
+        body = {"status": "ok", "balance": BALANCES[name]}
+    else:
+        body = {"status": "error", "message": "invalid key"}
+    return ReplayTransport(
+        [Exchange("/api/my/balances", "", 200, json.dumps(body).encode("utf-8"))],
+        latency=latency,
+    )
+
+
+def client_class(latency=0.0):
+    """A client factory answering each account with its own balances."""
+
+    def make(config, **options):
+        options["transport"] = account_transport(config.name, latency)
+        return CoinSpot(config=config, **options)
+
+    return make
+
+
+class CoinSpotPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.config = CoinSpotConfig(
+            [Profile(name, name + "key", name + "secret") for name in BALANCES]
+        )
+
+    def test_accounts_have_their_own_client_state(self):
+        with CoinSpotPool(self.config, client_class=client_class()) as accounts:
+            self.assertEqual(accounts.names, ["main", "trading", "reporting"])
+            self.assertEqual(len(accounts), 3)
+            clients = [accounts[name] for name in accounts]
+            self.assertEqual([c._api_key for c in clients], [n + "key" for n in BALANCES])
+            for attribute in ("_nonce_source", "_scheduler", "_pool", "logger"):
+                self.assertEqual(len({id(getattr(c, attribute)) for c in clients}), 3)
+            self.assertEqual(accounts["trading"].logger.name, "coinspot.accounts.trading")
+
+        only = CoinSpotPool(self.config, accounts=["trading"], client_class=client_class())
+        self.assertEqual(only.names, ["trading"])
+
+    def test_balances_all_runs_concurrently(self):
+        accounts = CoinSpotPool(self.config, client_class=client_class(latency=0.2))
+        started = time.monotonic()
+        responses = accounts.balances_all()
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(list(responses), ["main", "trading", "reporting"])
+        self.assertEqual(json.loads(responses["trading"])["balance"], BALANCES["trading"])
+
+    def test_balances_total_merges_accounts(self):
+        totals = CoinSpotPool(self.config, client_class=client_class()).balances_total()
+        self.assertEqual(
+            {coin: balance.amount for coin, balance in totals.items()},
+            {"BTC": Decimal("1.75"), "DOGE": Decimal(1500), "LTC": Decimal(3)},
+        )
+        parsed = CoinSpotPool(self.config, client_class=client_class(), models=True)
+        self.assertEqual(parsed.balances_total()["BTC"].amount, Decimal("1.75"))
+
+    def test_shared_cache_keeps_account_balances_apart(self):
+        cache = ResponseCache()
+        accounts = CoinSpotPool(
+            self.config, accounts=["main", "trading"], client_class=client_class(), cache=cache
+        )
+        self.assertIs(accounts["main"]._cache, accounts["trading"]._cache)
+        for _ in range(2):
+            responses = accounts.map("balances")
+            self.assertEqual(
+                {name: json.loads(body)["balance"] for name, body in responses.items()},
+                {name: BALANCES[name] for name in ("main", "trading")},
+            )
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_failed_account_is_reported(self):
+        config = CoinSpotConfig(list(self.config) + [Profile("broken", "k", "s")])
+        accounts = CoinSpotPool(config, client_class=client_class())
+        self.assertEqual(len(accounts.balances_all()), 4)
+        with self.assertRaises(APIError) as raised:
+            accounts.balances_total()
+        self.assertIn("broken", str(raised.exception))
+        self.assertEqual(len(accounts.balances_total(accounts=["main", "trading"])), 3)
+        with self.assertRaises(AttributeError):
+            accounts.map("close")
+
+    def test_shared_nonce_files_per_account(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with CoinSpotPool(
+            self.config, nonce_directory=directory, client_class=client_class()
+        ) as accounts:
+            nonces = [accounts[name]._nonce_source for name in accounts]
+            self.assertTrue(all(isinstance(nonce, SharedNonce) for nonce in nonces))
+            self.assertEqual(len({nonce.path for nonce in nonces}), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""AsyncCoinSpotTestCase.py: Unittests for the asyncio client."""
+
+import asyncio
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from coinspot import AsyncCoinSpot
+from coinspot.transport import AsyncConnectionPool, _AsyncConnection
+
+import fixtures
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    requests = []
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        type(self).connections += 1
+
+    def do_POST(self):
+        payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        type(self).requests.append((self.path, json.loads(payload), self.headers["sign"]))
+        body = json.dumps(fixtures.calls().get(self.path)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PlainAsyncPool(AsyncConnectionPool):
+    async def _new_connection(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return _AsyncConnection(reader, writer)
+
+
+class AsyncCoinSpotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.handler = type("RecordingHandler", (Handler,), {"requests": []})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self._coinspot = AsyncCoinSpot()
+        self._coinspot._pool = PlainAsyncPool(
+            "127.0.0.1:%d" % self.httpd.server_address[1], maxsize=8
+        )
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def run_and_close(self, coro):
+        async def run():
+            async with self._coinspot:
+                return await coro
+
+        return asyncio.run(run())
+
+    def test_get_spot(self):
+        resp = self.run_and_close(self._coinspot.spot())
+        data = json.loads(resp)
+        self.assertEqual(data.get("status"), "ok")
+        self.assertTrue("spot" in data)
+
+    def test_requests_are_signed_like_the_sync_client(self):
+        self.run_and_close(self._coinspot.orderhistory("DOGE"))
+        path, payload, sign = self.handler.requests[0]
+        self.assertEqual(path, "/api/orders/history")
+        self.assertEqual(payload["cointype"], "DOGE")
+        self.assertTrue("nonce" in payload)
+        params = json.dumps(payload, separators=(",", ":"))
+        self.assertEqual(sign, self._coinspot._get_signed_request(params))
+
+    def test_concurrent_requests_share_the_pool(self):
+        async def run():
+            async with self._coinspot as client:
+                first = await asyncio.gather(*[client.spot() for _ in range(8)])
+                second = await asyncio.gather(*[client.balances() for _ in range(8)])
+                return first + second
+
+        responses = asyncio.run(run())
+        self.assertEqual(len(responses), 16)
+        self.assertTrue(all(json.loads(r)["status"] == "ok" for r in responses))
+        self.assertTrue(self.handler.connections <= 8)
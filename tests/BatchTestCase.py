@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""BatchTestCase.py: Unittests for the multi-coin fan-out calls."""
+
+import asyncio
+import json
+import time
+import unittest
+
+from mock import patch
+
+from coinspot import AsyncCoinSpot, CoinSpot
+from coinspot.replay import AsyncReplayTransport, from_fixtures
+
+import fixtures
+from helpers import fixture_transport
+
+
+def slow_request(path, postdata):
+    time.sleep(0.1)
+    if postdata["cointype"] == "BAD":
+        raise IOError("no such coin")
+    return json.dumps(dict(fixtures.calls()["/api/orders/history"], coin=postdata["cointype"]))
+
+
+async def slow_async_request(path, postdata):
+    await asyncio.sleep(0.1)
+    if postdata["cointype"] == "BAD":
+        raise IOError("no such coin")
+    return json.dumps({"status": "ok", "coin": postdata["cointype"]})
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self._coinspot = CoinSpot()
+
+    @patch("coinspot.CoinSpot._request")
+    def test_orderhistory_many(self, get):
+        get.side_effect = slow_request
+        start = time.monotonic()
+        resp = self._coinspot.orderhistory_many(["BTC", "LTC", "DOGE", "BAD"])
+        self.assertTrue(time.monotonic() - start < 0.3)
+        self.assertEqual(sorted(resp), ["BAD", "BTC", "DOGE", "LTC"])
+        self.assertEqual(json.loads(resp["LTC"])["coin"], "LTC")
+        self.assertTrue(isinstance(resp["BAD"], IOError))
+
+    @patch("coinspot.CoinSpot._request")
+    def test_max_workers_bounds_concurrency(self, get):
+        get.side_effect = slow_request
+        start = time.monotonic()
+        resp = self._coinspot.orders_many(["BTC", "LTC", "DOGE", "ETH"], max_workers=2)
+        self.assertTrue(time.monotonic() - start >= 0.2)
+        self.assertEqual(len(resp), 4)
+
+    @patch("coinspot.AsyncCoinSpot._request")
+    def test_async_orders_many(self, get):
+        get.side_effect = slow_async_request
+        client = AsyncCoinSpot()
+        resp = asyncio.run(client.orders_many(["BTC", "LTC", "BAD"]))
+        self.assertEqual(json.loads(resp["BTC"])["coin"], "BTC")
+        self.assertTrue(isinstance(resp["BAD"], IOError))
+
+    def test_map_requests(self):
+        client = CoinSpot(transport=fixture_transport(latency=0.1))
+        start = time.monotonic()
+        spot, orders, bad, quote = client.map_requests(
+            ["spot", ("orders", "DOGE"), ("orders",), ("quotebuy", "DOGE", 1)]
+        )
+        self.assertTrue(time.monotonic() - start < 0.3)
+        self.assertEqual(json.loads(spot), fixtures.calls()["/api/spot"])
+        self.assertEqual(json.loads(orders), fixtures.calls()["/api/orders"])
+        self.assertIsInstance(bad, TypeError)
+        self.assertEqual(json.loads(quote), fixtures.calls()["/api/quote/buy"])
+        self.assertRaises(AttributeError, client.map_requests, ["_fetch"])
+        self.assertRaises(AttributeError, client.map_requests, ["orders_stream"])
+
+    def test_async_map_requests(self):
+        client = AsyncCoinSpot(transport=AsyncReplayTransport(from_fixtures(fixtures.calls())))
+        spot, orders = asyncio.run(client.map_requests(["spot", ("orders", "DOGE")]))
+        self.assertEqual(json.loads(spot), fixtures.calls()["/api/spot"])
+        self.assertEqual(json.loads(orders), fixtures.calls()["/api/orders"])
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""BoardTestCase.py: Unittests for the shared-memory spot price board."""
+
+import multiprocessing
+import unittest
+from decimal import Decimal
+
+from mock import patch
+
+from coinspot import APIError, CoinSpot
+from coinspot.board import SpotBoardReader, SpotBoardWriter
+from coinspot.models import SpotPrice
+from coinspot.replay import Exchange, ReplayTransport
+
+from helpers import fixture_transport
+
+COINS = ["C%d" % n for n in range(32)]
+
+
+def count_torn(name, last, queue):
+    # every update sets all coins to the same price, so a torn read shows up
+    # as a snapshot with more than one price in it
+    with SpotBoardReader(name) as board:
+        queue.put("ready")
+        torn = snapshots = 0
+        while board.sequence < last:
+            torn += len(set(board.prices().values())) != 1
+            snapshots += 1
+        queue.put((torn, snapshots))
+
+
+def read_price(name, coin):
+    with SpotBoardReader(name) as board:
+        return board.price(coin)
+
+
+class BoardTestCase(unittest.TestCase):
+    def writer(self, **kwargs):
+        writer = SpotBoardWriter(**kwargs)
+        self.addCleanup(writer.unlink)
+        self.addCleanup(writer.close)
+        return writer
+
+    def reader(self, name):
+        reader = SpotBoardReader(name)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_update_and_read(self):
+        writer = self.writer(capacity=4)
+        reader = self.reader(writer.name)
+        self.assertEqual(reader.prices(), {})
+        self.assertIsNone(reader.price("BTC"))
+        self.assertEqual(reader.updated, 0.0)
+
+        writer.update({"BTC": SpotPrice("BTC", Decimal("474.92")), "DOGE": 0.00021}, 100.0)
+        self.assertEqual(reader.price("BTC"), 474.92)
+        self.assertEqual(reader["DOGE"], 0.00021)
+        self.assertEqual(reader.updated, 100.0)
+        sequence = reader.sequence
+
+        writer.update({"LTC": 4.5})
+        self.assertEqual(reader.prices(), {"BTC": 474.92, "DOGE": 0.00021, "LTC": 4.5})
+        self.assertEqual(reader.sequence, sequence + 2)
+        self.assertRaises(KeyError, reader.__getitem__, "XRP")
+        self.assertRaises(ValueError, writer.update, {"A": 1, "B": 2})
+
+    def test_poll(self):
+        writer = self.writer()
+        reader = self.reader(writer.name)
+        prices = writer.poll(CoinSpot(transport=fixture_transport()))
+        self.assertEqual(reader.price("DOGE"), float(prices["DOGE"].price))
+        writer.poll(CoinSpot(transport=fixture_transport(), models=True))
+
+        error = Exchange("/api/spot", "", 200, b'{"status":"error","message":"down"}')
+        client = CoinSpot(transport=ReplayTransport([error]))
+        self.assertRaises(APIError, writer.poll, client)
+
+    def test_torn_reads_are_retried(self):
+        writer = self.writer(capacity=4)
+        reader = self.reader(writer.name)
+        writer.update({"BTC": 474.92})
+        read_symbols = reader._read_symbols
+        reads = []
+
+        def torn(buf):
+            # the first read is overlapped by an update and sees a symbol the
+            # writer had not finished
+            reads.append(buf)
+            if len(reads) > 1:
+                return read_symbols(buf)
+            writer.update({"BTC": 475.0})
+            return {"B\x00C": 0}
+
+        with patch.object(reader, "_read_symbols", side_effect=torn):
+            self.assertEqual(reader.prices(), {"BTC": 475.0})
+        self.assertEqual(reader._slots, {"BTC": 0})
+
+        def undecodable(buf):
+            reads.append(buf)
+            if len(reads) == 3:
+                b"\xff".decode("ascii")
+            return len(reads)
+
+        self.assertEqual(reader._read(undecodable), 4)
+
+    def test_readers_in_other_processes(self):
+        writer = self.writer(capacity=len(COINS))
+        writer.update({coin: -1 for coin in COINS})
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(2) as pool:
+            self.assertEqual(pool.starmap(read_price, [(writer.name, "C1")] * 2), [-1, -1])
+        # the readers exiting must not have removed the board
+        self.assertEqual(self.reader(writer.name).price("C1"), -1)
+
+    def test_reads_are_never_torn(self):
+        rounds = 20000
+        writer = self.writer(capacity=len(COINS))
+        writer.update({coin: -1 for coin in COINS})
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        last = self.reader(writer.name).sequence + 2 * rounds
+        readers = [
+            context.Process(target=count_torn, args=(writer.name, last, queue))
+            for _ in range(2)
+        ]
+        for process in readers:
+            process.start()
+        self.assertEqual([queue.get(timeout=30) for _ in readers], ["ready"] * 2)
+        for n in range(rounds):
+            writer.update({coin: n for coin in COINS})
+        results = [queue.get(timeout=30) for _ in readers]
+        for process in readers:
+            process.join()
+        self.assertEqual([torn for torn, _ in results], [0, 0])
+        self.assertTrue(all(snapshots for _, snapshots in results))
+
+    def test_rejects_other_blocks(self):
+        writer = self.writer()
+        writer._memory.buf[:4] = b"JUNK"
+        self.assertRaises(ValueError, SpotBoardReader, writer.name)
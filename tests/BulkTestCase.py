@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""BulkTestCase.py: Unittests for pipelined bulk order placement."""
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer
+
+from coinspot import (
+    AsyncCoinSpot,
+    BulkResult,
+    CircuitBreaker,
+    CoinSpot,
+    HTTPStatusError,
+    TransportError,
+)
+from coinspot.metrics import Metrics
+from coinspot.replay import AsyncReplayTransport, Exchange, ReplayTransport
+
+from TransportTestCase import Handler, PlainPool
+
+
+ORDER_PATHS = ("/api/my/buy", "/api/my/sell", "/api/my/buy/cancel", "/api/my/sell/cancel")
+
+LADDER = [("BTC", 0.01, 50000 - 100 * i) for i in range(20)]
+
+
+def order_exchanges():
+    return [Exchange(path, "", 200, b'{"status":"ok"}') for path in ORDER_PATHS]
+
+
+class OrderedReplay(ReplayTransport):
+    """Records each request in the order the server would see it."""
+
+    def __init__(self, *args, **kwargs):
+        ReplayTransport.__init__(self, order_exchanges(), *args, **kwargs)
+        self.seen = []
+
+    def _answer(self, path, body):
+        self.seen.append((path, json.loads(body)))
+        return ReplayTransport._answer(self, path, body)
+
+
+class Unpipelined:
+    """A transport with no pipeline, like RecordingTransport."""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def request(self, method, path, body=None, headers=None, trace=None):
+        return self.transport.request(method, path, body, headers, trace=trace)
+
+    def clear(self):
+        pass
+
+
+class BulkOrdersTestCase(unittest.TestCase):
+    def test_ladder_is_pipelined_in_nonce_order(self):
+        transport = OrderedReplay(latency=0.1)
+        client = CoinSpot(transport=transport)
+        result = client.buy_many(LADDER, depth=10)
+        self.assertIsInstance(result, BulkResult)
+        # twenty round trips one after another would take two seconds
+        self.assertLess(result.elapsed, 0.6)
+        self.assertEqual(list(result), [b'{"status":"ok"}'] * 20)
+        self.assertEqual(
+            [(body["cointype"], body["amount"], body["rate"]) for _, body in transport.seen],
+            LADDER,
+        )
+        nonces = [body["nonce"] for _, body in transport.seen]
+        self.assertEqual(nonces, sorted(set(nonces)))
+        summary = result.summary()
+        self.assertEqual(
+            (summary["legs"], summary["ok"], summary["failed"], summary["pipelined"]),
+            (20, 20, 0, True),
+        )
+        self.assertLess(summary["latency_max"], 0.3)
+
+    def test_sell_and_cancel_paths(self):
+        transport = OrderedReplay()
+        client = CoinSpot(transport=transport)
+        client.sell_many([("LTC", 1, 120)])
+        client.cancelbuy_many(["a1", "a2"])
+        client.cancelsell_many(["b1"])
+        client.cancelbuy("a3")
+        self.assertEqual(
+            [(path, body.get("id")) for path, body in transport.seen],
+            [
+                ("/api/my/sell", None),
+                ("/api/my/buy/cancel", "a1"),
+                ("/api/my/buy/cancel", "a2"),
+                ("/api/my/sell/cancel", "b1"),
+                ("/api/my/buy/cancel", "a3"),
+            ],
+        )
+        self.assertEqual(client.map_requests([("cancelsell", "b2")]), [b'{"status":"ok"}'])
+
+    def test_failed_legs_are_reported_in_place(self):
+        client = CoinSpot(transport=OrderedReplay(status_error_rate=1.0))
+        result = client.buy_many(LADDER[:3])
+        self.assertTrue(all(isinstance(leg, HTTPStatusError) for leg in result))
+        self.assertEqual([index for index, _ in result.failed], [0, 1, 2])
+        self.assertEqual(result.summary()["ok"], 0)
+
+        error = b'{"status":"error","message":"insufficient funds"}'
+        client = CoinSpot(transport=ReplayTransport([Exchange("/api/my/buy", "", 200, error)]))
+        self.assertEqual(client.buy_many(LADDER[:2]).summary()["failed"], 2)
+
+    def test_leg_whose_body_does_not_parse_fails_alone(self):
+        exchanges = [
+            Exchange("/api/my/buy", "", 200, b'{"status":"ok"}'),
+            Exchange("/api/my/buy", "", 200, b"<html>"),
+        ]
+        metrics = Metrics()
+        breaker = CircuitBreaker()
+        client = CoinSpot(
+            transport=ReplayTransport(exchanges), models=True, metrics=metrics, breaker=breaker
+        )
+        result = client.buy_many(LADDER[:4])
+        self.assertEqual(result[0], {"status": "ok"})
+        self.assertIsInstance(result[1], ValueError)
+        self.assertEqual([index for index, _ in result.failed], [1, 3])
+        stats = metrics.stats()["/api/my/buy"]
+        self.assertEqual(stats["requests"], 4)
+        self.assertEqual(sum(stats["errors"].values()), 2)
+        self.assertEqual(breaker.state("/api/my/buy"), "closed")
+
+    def test_transport_without_pipeline_sends_one_by_one(self):
+        transport = OrderedReplay()
+        metrics = Metrics()
+        client = CoinSpot(transport=Unpipelined(transport), metrics=metrics)
+        result = client.buy_many(LADDER[:4])
+        self.assertFalse(result.pipelined)
+        self.assertEqual(result.summary()["ok"], 4)
+        self.assertEqual(len(transport.seen), 4)
+
+    def test_metrics_see_every_leg(self):
+        metrics = Metrics()
+        client = CoinSpot(transport=OrderedReplay(), metrics=metrics)
+        client.buy_many(LADDER[:5])
+        self.assertEqual(metrics.stats()["/api/my/buy"]["requests"], 5)
+
+    def test_async_ladder(self):
+        transport = AsyncReplayTransport(order_exchanges(), latency=0.1)
+        client = AsyncCoinSpot(transport=transport)
+        result = asyncio.run(client.buy_many(LADDER, depth=10))
+        self.assertLess(result.elapsed, 0.6)
+        self.assertEqual(result.summary()["ok"], 20)
+
+
+class PipelinedServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.handler = type("EchoHandler", (Handler,), {"echo": True})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.host = "127.0.0.1:%d" % self.httpd.server_address[1]
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def client(self):
+        pool = PlainPool(self.host)
+        self.addCleanup(pool.clear)
+        return CoinSpot(transport=pool)
+
+    def rates(self, result):
+        return [json.loads(leg)["request"]["rate"] for leg in result]
+
+    def test_ladder_over_one_connection(self):
+        result = self.client().buy_many(LADDER, depth=8)
+        self.assertEqual(self.rates(result), [rate for _, _, rate in LADDER])
+        self.assertEqual(self.handler.connections, 1)
+
+    def test_legs_the_server_dropped_are_sent_again(self):
+        self.handler.close_after = 3
+        result = self.client().buy_many(LADDER, depth=8)
+        self.assertEqual(self.rates(result), [rate for _, _, rate in LADDER])
+        self.assertGreater(result.resent, 0)
+        self.assertEqual(self.handler.connections, 7)
+        nonces = [json.loads(leg)["request"]["nonce"] for leg in result]
+        self.assertEqual(nonces, sorted(set(nonces)))
+
+    def test_broken_connection_fails_legs_in_flight(self):
+        client = self.client()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        started = time.monotonic()
+        result = client.buy_many(LADDER[:3])
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(all(isinstance(leg, TransportError) for leg in result))
+        self.assertEqual(result.resent, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""CacheTestCase.py: Unittests for the read-only response cache."""
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from mock import patch
+
+from coinspot import AsyncCoinSpot, CoinSpot, CoinSpotConfig, Profile, ResponseCache
+from coinspot.replay import Exchange, ReplayTransport
+
+import fixtures
+
+
+def slow_send(path, postdata):
+    time.sleep(0.05)
+    return json.dumps(fixtures.calls().get(path)).encode("utf-8")
+
+
+async def slow_async_send(path, postdata):
+    await asyncio.sleep(0.05)
+    return json.dumps(fixtures.calls().get(path)).encode("utf-8")
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self._cache = ResponseCache(ttls={"/api/spot": 60, "/api/orders": 60}, maxsize=2)
+        self._coinspot = CoinSpot(cache=self._cache)
+
+    @patch("coinspot.CoinSpot._send")
+    def test_read_only_responses_are_cached(self, send):
+        send.side_effect = slow_send
+        first = self._coinspot.spot()
+        self.assertEqual(self._coinspot.spot(), first)
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(self._cache.stats()["hits"], 1)
+
+    @patch("coinspot.CoinSpot._send")
+    def test_trading_endpoints_are_never_cached(self, send):
+        send.side_effect = slow_send
+        self._coinspot.buy("BTC", 1, 100)
+        self._coinspot.buy("BTC", 1, 100)
+        self._coinspot.quotebuy("BTC", 1)
+        self._coinspot.quotebuy("BTC", 1)
+        self.assertEqual(send.call_count, 4)
+        self.assertRaises(ValueError, ResponseCache, {"/api/my/buy": 10})
+
+    @patch("coinspot.CoinSpot._send")
+    def test_least_recently_used_is_evicted(self, send):
+        send.side_effect = slow_send
+        self._coinspot.orders("BTC")
+        self._coinspot.orders("LTC")
+        self._coinspot.orders("BTC")
+        self._coinspot.orders("DOGE")
+        self.assertEqual(len(self._cache), 2)
+        self._coinspot.orders("BTC")
+        self.assertEqual(send.call_count, 3)
+        self._coinspot.orders("LTC")
+        self.assertEqual(send.call_count, 4)
+
+    @patch("coinspot.CoinSpot._send")
+    def test_entries_expire(self, send):
+        send.side_effect = slow_send
+        self._cache.ttls["/api/orders/history"] = 0.01
+        self._coinspot.orderhistory("DOGE")
+        time.sleep(0.02)
+        self._coinspot.orderhistory("DOGE")
+        self.assertEqual(send.call_count, 2)
+
+    @patch("coinspot.CoinSpot._send")
+    def test_concurrent_callers_share_one_request(self, send):
+        send.side_effect = slow_send
+        threads = [threading.Thread(target=self._coinspot.balances) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(self._cache.stats()["coalesced"], 4)
+
+    def test_accounts_sharing_a_cache_get_their_own_balances(self):
+        def client(name, balance):
+            body = json.dumps({"status": "ok", "balance": balance}).encode("utf-8")
+            return CoinSpot(
+                config=CoinSpotConfig([Profile(name, name + "key", name + "secret")]),
+                transport=ReplayTransport([Exchange("/api/my/balances", "", 200, body)]),
+                cache=self._cache,
+            )
+
+        main = client("main", [{"btc": 1.5}])
+        trading = client("trading", [{"ltc": 3}])
+        self.assertEqual(json.loads(main.balances())["balance"], [{"btc": 1.5}])
+        self.assertEqual(json.loads(trading.balances())["balance"], [{"ltc": 3}])
+        self.assertEqual(json.loads(main.balances())["balance"], [{"btc": 1.5}])
+        self.assertEqual(self._cache.stats()["misses"], 2)
+
+    @patch("coinspot.AsyncCoinSpot._send")
+    def test_async_callers_share_one_request(self, send):
+        send.side_effect = slow_async_send
+        client = AsyncCoinSpot(cache=ResponseCache())
+
+        async def run():
+            return await asyncio.gather(*[client.spot() for _ in range(5)])
+
+        responses = asyncio.run(run())
+        self.assertEqual(len(set(responses)), 1)
+        self.assertEqual(send.call_count, 1)
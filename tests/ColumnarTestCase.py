@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ColumnarTestCase.py: Unittests for the column oriented order views."""
+
+import json
+import unittest
+
+from mock import patch
+
+from coinspot import columnar
+from coinspot.columnar import OrderColumns, orderbook_columns, orderhistory_columns, vwap_by_coin
+from coinspot.models import parse
+
+import fixtures
+
+
+def raw(path):
+    return json.dumps(fixtures.calls()[path]).encode("utf-8")
+
+
+class ColumnarTestCase(unittest.TestCase):
+    def setUp(self):
+        self.history = fixtures.calls()["/api/orders/history"]["orders"]
+        self.book = orderbook_columns(raw("/api/orders"))
+
+    def test_columns_from_dicts_and_models(self):
+        columns = orderhistory_columns(raw("/api/orders/history"))
+        models = OrderColumns.from_rows(parse("/api/orders/history", raw("/api/orders/history")))
+        self.assertEqual(len(columns), len(self.history))
+        self.assertEqual(columns.coin, "DOGE")
+        self.assertEqual(list(columns.rate), list(models.rate))
+        self.assertEqual(columns.solddate[0], 1414029447346)
+        self.assertEqual(list(self.book.buyorders.solddate), [0] * 6)
+
+    def check_analytics(self):
+        columns = orderhistory_columns(raw("/api/orders/history"))
+        amount = sum(row["amount"] for row in self.history)
+        total = sum(row["total"] for row in self.history)
+        self.assertAlmostEqual(columns.vwap(), total / amount)
+        self.assertAlmostEqual(list(columns.cumulative_volume())[-1], amount)
+        self.assertEqual(self.book.best_bid(), 0.000291)
+        self.assertEqual(self.book.best_ask(), 0.000297)
+        bid, ask = self.book.depth_at(0.0003)
+        self.assertAlmostEqual(bid, 0)
+        self.assertAlmostEqual(ask, 25000 + 132441.2 + 50000)
+        bid, ask = self.book.depth_at(0.00029)
+        self.assertAlmostEqual(bid, 250000 + 100000 + 58620.68965517)
+        vwaps = vwap_by_coin({"DOGE": columns, "EMPTY": OrderColumns(), "BOOK": self.book.buyorders})
+        self.assertAlmostEqual(vwaps["DOGE"], columns.vwap())
+        self.assertAlmostEqual(vwaps["BOOK"], self.book.buyorders.vwap())
+        self.assertEqual(vwaps["EMPTY"], None)
+        self.assertEqual(list(vwaps), ["DOGE", "EMPTY", "BOOK"])
+
+    def test_analytics(self):
+        self.check_analytics()
+
+    def test_analytics_without_numpy(self):
+        with patch.object(columnar, "numpy", None):
+            self.check_analytics()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""FeedTestCase.py: Unittests for the market data hub and its socket feed."""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from coinspot import CoinSpot
+from coinspot.feed import FeedClient, FeedServer, MarketDataHub, Subscription, Update
+from coinspot.models import OrderBook, SpotPrice
+from coinspot.replay import Exchange, ReplayTransport
+
+from helpers import fixture_transport
+
+
+class SubscriptionTestCase(unittest.TestCase):
+    def test_drops_oldest_when_full(self):
+        subscription = Subscription(maxsize=2)
+        for n in range(5):
+            subscription.put(n)
+        self.assertEqual(subscription.dropped, 3)
+        self.assertEqual([subscription.get(0), subscription.get(0)], [3, 4])
+        self.assertIsNone(subscription.get(0.01))
+
+    def test_filters_and_close(self):
+        subscription = Subscription(kinds=["orders"], coins=["DOGE"])
+        self.assertTrue(subscription.wants(Update("orders", "DOGE", None, 0)))
+        self.assertFalse(subscription.wants(Update("orders", "BTC", None, 0)))
+        self.assertFalse(subscription.wants(Update("spot", None, None, 0)))
+        threading.Timer(0.05, subscription.close).start()
+        self.assertEqual(list(subscription), [])
+
+
+class MarketDataHubTestCase(unittest.TestCase):
+    def hub(self, **kwargs):
+        transport = fixture_transport()
+        return MarketDataHub(CoinSpot(transport=transport), **kwargs), transport
+
+    def test_requests_scale_with_coins_not_consumers(self):
+        hub, transport = self.hub(cointypes=["DOGE", "BTC", "LTC"])
+        subscriptions = [hub.subscribe() for _ in range(20)]
+        hub.poll_due()
+        self.assertEqual(transport.requests, 4)
+        received = [[s.get(0) for _ in range(4)] for s in subscriptions]
+        for updates in received:
+            self.assertIsInstance(updates[0].data["DOGE"], SpotPrice)
+            self.assertEqual(sorted(u.coin for u in updates[1:]), ["BTC", "DOGE", "LTC"])
+            self.assertTrue(all(isinstance(u.data, OrderBook) for u in updates[1:]))
+            # each response is parsed once and shared by every subscriber
+            self.assertIs(updates[0], received[0][0])
+        self.assertIsNone(subscriptions[0].get(0))
+        self.assertEqual(hub.stats()["polls"], {"spot": 1, "orders": 1, "orderhistory": 0})
+
+    def test_slow_subscriber_does_not_block(self):
+        hub, _ = self.hub(cointypes=["DOGE"])
+        slow = hub.subscribe(maxsize=1, kinds=["orders"])
+        for _ in range(3):
+            hub.poll("orders")
+        self.assertEqual(slow.dropped, 2)
+        self.assertEqual(hub.stats()["dropped"], 2)
+
+    def test_errors_are_counted_not_published(self):
+        client = CoinSpot(transport=fixture_transport(error_rate=1.0))
+        hub = MarketDataHub(client, ["DOGE"])
+        subscription = hub.subscribe()
+        hub.poll_due()
+        self.assertEqual(len(subscription), 0)
+        self.assertEqual(hub.stats()["errors"], {"spot": 1, "orders": 1, "orderhistory": 0})
+
+    def test_malformed_bodies_are_counted_and_polling_goes_on(self):
+        transport = ReplayTransport(
+            [
+                Exchange("/api/spot", "", 200, b"<html>"),
+                Exchange("/api/orders", "", 200, b'{"status":"ok"}'),
+                Exchange("/api/orders/history", "", 200, b"[]"),
+            ]
+        )
+        hub = MarketDataHub(
+            CoinSpot(transport=transport),
+            ["DOGE"],
+            spot_interval=0.01,
+            orders_interval=0.01,
+            history_interval=0.01,
+        )
+        subscription = hub.subscribe()
+        with hub:
+            for _ in range(100):
+                if min(hub.stats()["errors"].values()) >= 2:
+                    break
+                time.sleep(0.01)
+            self.assertTrue(hub._thread.is_alive())
+        self.assertGreaterEqual(min(hub.stats()["errors"].values()), 2)
+        self.assertEqual(len(subscription), 0)
+
+    def test_refuses_model_clients(self):
+        self.assertRaises(ValueError, MarketDataHub, CoinSpot(models=True))
+
+    def test_background_polling(self):
+        hub, _ = self.hub(spot_interval=0.01, orders_interval=None)
+        subscription = hub.subscribe()
+        with hub:
+            self.assertIsNotNone(subscription.get(1))
+            self.assertIsNotNone(subscription.get(1))
+        self.assertTrue(subscription.closed)
+
+
+class FeedServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_updates_reach_other_processes(self):
+        hub = MarketDataHub(CoinSpot(transport=fixture_transport()), ["DOGE"])
+        server = FeedServer(hub, os.path.join(self.directory, "feed.sock"))
+        try:
+            readers = [FeedClient(server.address) for _ in range(2)]
+            while server.connections < 2:
+                time.sleep(0.01)
+            hub.poll_due()
+            for reader in readers:
+                with reader:
+                    updates = iter(reader)
+                    spot = next(updates)
+                    self.assertEqual(spot.kind, "spot")
+                    self.assertIsInstance(spot.data["DOGE"], SpotPrice)
+                    orders = next(updates)
+                    self.assertEqual(orders.coin, "DOGE")
+                    self.assertIsInstance(orders.data, OrderBook)
+        finally:
+            server.close()
+        self.assertFalse(os.path.exists(server.address))
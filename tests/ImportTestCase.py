@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ImportTestCase.py: Regression tests for import time and config loading."""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import yaml
+from mock import patch
+
+from coinspot import CoinSpot, CoinSpotConfig, ConfigError, Profile, config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the slow imports the package must not make until they are needed
+HEAVY = ("requests", "yaml", "asyncio", "http.client", "concurrent.futures", "logging")
+
+# what http.client and asyncio bring in, which dominated the import time
+NETWORK = ("socket", "ssl", "selectors", "email.parser")
+
+
+def import_times(statement):
+    """
+    Run ``statement`` in a fresh interpreter under ``-X importtime``
+
+    :return:
+        a dict of the seconds each module took to import, itself only
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(own) / 1000000.0
+    return times
+
+
+class ImportTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.startup = set(import_times("pass"))
+
+    def imported(self, statement):
+        times = import_times(statement)
+        return {name: own for name, own in times.items() if name not in self.startup}
+
+    def test_import_coinspot_loads_only_the_package(self):
+        imported = self.imported("import coinspot")
+        self.assertEqual([name for name in imported if name.startswith("coinspot")], ["coinspot"])
+        self.assertFalse(set(HEAVY) & set(imported))
+
+    def test_client_import_leaves_out_the_network_stack(self):
+        imported = self.imported("from coinspot import CoinSpot")
+        self.assertIn("coinspot.coinspot", imported)
+        self.assertFalse(set(HEAVY) & set(imported))
+        self.assertFalse(set(NETWORK) & set(imported))
+
+    def test_heavy_imports_wait_for_use(self):
+        imported = self.imported("from coinspot import CoinSpot; CoinSpot(pool_size=0)")
+        self.assertIn("http.client", imported)
+        self.assertFalse({"requests", "asyncio", "concurrent.futures"} & set(imported))
+        imported = self.imported("import coinspot; coinspot.AsyncCoinSpot")
+        self.assertIn("asyncio", imported)
+
+    def test_scheduler_and_cache_do_not_load_asyncio(self):
+        imported = self.imported("from coinspot import CoinSpot, RequestScheduler, ResponseCache")
+        self.assertIn("coinspot.ratelimit", imported)
+        self.assertIn("coinspot.cache", imported)
+        self.assertNotIn("asyncio", imported)
+
+
+class ConfigTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        config.clear()
+        self.addCleanup(config.clear)
+        environ = {k: v for k, v in os.environ.items() if not k.startswith("COINSPOT_")}
+        for patcher in (
+            patch.dict("os.environ", environ, clear=True),
+            patch("sys.argv", [os.path.join(self.directory, "script.py")]),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, text):
+        with open(os.path.join(self.directory, "config.yml"), "w") as output:
+            output.write(text)
+
+    def test_config_file_is_read_once_per_process(self):
+        self.write(
+            "api:\n  key: filekey\n  secret: filesecret\n  endpoint: example.com\n"
+            "logfile: coinspot.log\ndebug: false\n"
+        )
+        with patch("yaml.load", wraps=yaml.load) as load:
+            clients = [CoinSpot(pool_size=0) for _ in range(3)]
+        self.assertEqual(load.call_count, 1)
+        for client in clients:
+            self.assertEqual((client._api_key, client._endpoint), ("filekey", "example.com"))
+
+        config.clear()
+        self.write("api:\n  key: newkey\n  secret: s\n")
+        self.assertEqual(CoinSpot(pool_size=0)._api_key, "newkey")
+
+    def test_environment_wins_and_bad_files_are_reported(self):
+        # no file at all is fine, there may be no credentials when testing
+        self.assertEqual(CoinSpot(pool_size=0)._api_key, "")
+        self.write("api: [not, a, mapping")
+        self.assertRaises(ConfigError, CoinSpot, pool_size=0)
+        with patch.dict("os.environ", {"COINSPOT_API_KEY": "k", "COINSPOT_SECRET_KEY": "s"}):
+            self.assertEqual(CoinSpot(pool_size=0)._api_key, "k")
+
+    def test_named_profiles_inherit_top_level_options(self):
+        self.write(
+            "api:\n  key: mainkey\n  secret: mainsecret\n  endpoint: example.com\n"
+            "debug: false\n"
+            "profiles:\n"
+            "  trading:\n    key: tradekey\n    secret: tradesecret\n"
+            "  reporting:\n    key: reportkey\n    secret: reportsecret\n"
+            "    endpoint: other.example.com\n    logfile: reporting.log\n"
+            "default: trading\n"
+        )
+        settings = CoinSpotConfig.load()
+        self.assertEqual(settings.names, ["default", "trading", "reporting"])
+        self.assertEqual(settings.default, "trading")
+        self.assertEqual(settings.profile().key, "tradekey")
+        self.assertEqual(settings.profile("trading").endpoint, "example.com")
+        self.assertEqual(settings.profile("reporting").endpoint, "other.example.com")
+        self.assertEqual(settings.profile("reporting").logfile, "reporting.log")
+        self.assertNotIn("secret", repr(settings.profile("trading")))
+
+        client = CoinSpot(pool_size=0, config=settings, profile="reporting")
+        self.assertEqual((client._api_key, client._endpoint), ("reportkey", "other.example.com"))
+        self.assertEqual(CoinSpot(pool_size=0, profile="default")._api_key, "mainkey")
+        # the environment does not override an explicit profile
+        with patch.dict("os.environ", {"COINSPOT_API_KEY": "k", "COINSPOT_SECRET_KEY": "s"}):
+            self.assertEqual(CoinSpot(pool_size=0, config=settings)._api_key, "tradekey")
+        self.assertEqual(
+            CoinSpot(pool_size=0, config=Profile("solo", "solokey", "s")).profile.name, "solo"
+        )
+
+    def test_loaded_config_is_cached_until_the_file_changes(self):
+        self.write("api:\n  key: firstkey\n  secret: s\n")
+        with patch("yaml.load", wraps=yaml.load) as load:
+            first = CoinSpotConfig.load()
+            self.assertIs(CoinSpotConfig.load(), first)
+            self.assertEqual(load.call_count, 1)
+
+            self.write("api:\n  key: secondkey\n  secret: s\n")
+            path = os.path.join(self.directory, "config.yml")
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            second = CoinSpotConfig.load()
+            self.assertEqual(load.call_count, 2)
+        self.assertEqual(second.profile().key, "secondkey")
+        self.assertEqual(CoinSpot(pool_size=0)._api_key, "secondkey")
+
+    def test_explicit_loading_reports_errors(self):
+        with self.assertRaises(ConfigError):
+            CoinSpotConfig.load()
+        with self.assertRaises(ConfigError):
+            CoinSpot(pool_size=0, profile="trading")
+        for text in (
+            "api: [not, a, mapping",
+            "api:\n  key: onlykey\n",
+            "profiles:\n  trading:\n    key: k\n    secret: s\n    colour: red\n",
+            "profiles:\n  trading:\n    key: k\n    secret: s\ndefault: missing\n",
+        ):
+            self.write(text)
+            config.clear()
+            with self.assertRaises(ConfigError) as raised:
+                CoinSpotConfig.load()
+            self.assertEqual(raised.exception.path, os.path.join(self.directory, "config.yml"))
+            # the implicit lookup does not carry on without the credentials
+            self.assertRaises(ConfigError, CoinSpot, pool_size=0)
+        settings = CoinSpotConfig([Profile("a", "k", "s")])
+        self.assertEqual(settings.default, "a")
+        with self.assertRaises(ConfigError):
+            settings.profile("b")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""JsonStreamTestCase.py: Unittests for incremental response decoding."""
+
+import asyncio
+import http.client
+import json
+import threading
+import unittest
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from coinspot import AsyncCoinSpot, CoinSpot
+from coinspot.jsonstream import ArrayStreamDecoder
+from coinspot.models import Order
+from coinspot.transport import AsyncConnectionPool, ConnectionPool, _AsyncConnection
+
+import fixtures
+
+
+def chunks(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def decode(data, keys, size):
+    decoder = ArrayStreamDecoder(keys)
+    rows = []
+    for chunk in chunks(data, size):
+        rows.extend(decoder.feed(chunk))
+    rows.extend(decoder.close())
+    return decoder, rows
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(fixtures.calls().get(self.path)).encode("utf-8")
+        # send the body chunked, a few bytes at a time
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks(body, 37):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PlainPool(ConnectionPool):
+    def _new_connection(self):
+        return http.client.HTTPConnection(self.host)
+
+
+class PlainAsyncPool(AsyncConnectionPool):
+    async def _new_connection(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return _AsyncConnection(reader, writer)
+
+
+class JsonStreamTestCase(unittest.TestCase):
+    def test_rows_match_json_loads(self):
+        book = fixtures.calls()["/api/orders"]
+        data = json.dumps(book, indent=2).encode("utf-8")
+        for size in (1, 7, 4096):
+            decoder, rows = decode(data, ("buyorders", "sellorders"), size)
+            self.assertEqual(
+                rows,
+                [("buyorders", row) for row in book["buyorders"]]
+                + [("sellorders", row) for row in book["sellorders"]],
+            )
+            self.assertEqual(decoder.values, {"status": "ok"})
+
+    def test_buffer_stays_bounded(self):
+        row = {"amount": 123.456, "rate": 0.000291, "total": 0.0359, "coin": "DOGE", "solddate": 1414029447346}
+        data = json.dumps({"status": "ok", "orders": [row] * 20000}).encode("utf-8")
+        decoder = ArrayStreamDecoder(("orders",))
+        count = 0
+        for chunk in chunks(data, 1024):
+            count += len(decoder.feed(chunk))
+            self.assertTrue(len(decoder) < 1024 + 200)
+        count += len(decoder.close())
+        self.assertEqual(count, 20000)
+
+    def test_errors(self):
+        decoder, rows = decode(b'{"status":"error","message":"bad coin"}', ("orders",), 3)
+        self.assertEqual(rows, [])
+        self.assertEqual(decoder.values["message"], "bad coin")
+        self.assertRaises(ValueError, decode, b'{"status":"ok","orders":[{"a":1}', ("orders",), 3)
+        self.assertRaises(ValueError, decode, b'["not", "an", "object"]', ("orders",), 3)
+
+
+class ClientStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.host = "127.0.0.1:%d" % self.httpd.server_address[1]
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_orders_stream(self):
+        client = CoinSpot()
+        client._pool = PlainPool(self.host)
+        rows = list(client.orders_stream("DOGE", chunk_size=16))
+        self.assertEqual([side for side, _ in rows], ["buyorders"] * 6 + ["sellorders"] * 5)
+        self.assertEqual(rows[0][1]["amount"], 250000)
+        # fully read, so the connection went back to the pool
+        self.assertEqual(len(client._pool), 1)
+        client._pool.clear()
+
+    def test_orderhistory_stream_with_models(self):
+        client = CoinSpot(models=True)
+        client._pool = PlainPool(self.host)
+        orders = list(client.orderhistory_stream("DOGE"))
+        self.assertEqual(len(orders), 14)
+        self.assertTrue(isinstance(orders[0], Order))
+        self.assertEqual(orders[0].rate, Decimal("0.00036"))
+        client._pool.clear()
+
+    def test_async_orderhistory_stream(self):
+        client = AsyncCoinSpot()
+        client._pool = PlainAsyncPool(self.host)
+
+        async def run():
+            async with client:
+                orders = [order async for order in client.orderhistory_stream("DOGE", 10)]
+                spot = json.loads(await client.spot())
+                return orders, spot
+
+        orders, spot = asyncio.run(run())
+        self.assertEqual(orders, fixtures.calls()["/api/orders/history"]["orders"])
+        self.assertEqual(spot["status"], "ok")
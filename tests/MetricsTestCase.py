@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""MetricsTestCase.py: Unittests for request metrics and hooks."""
+
+import asyncio
+import json
+import random
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+
+from mock import Mock, patch
+
+from coinspot import AsyncCoinSpot, CoinSpot, TransportError
+from coinspot.metrics import (
+    HookChain,
+    LatencyHistogram,
+    Metrics,
+    MetricsHook,
+    _bucket,
+    _lowest,
+)
+from coinspot.signing import redacted
+
+import fixtures
+from JsonStreamTestCase import Handler, PlainAsyncPool, PlainPool
+
+
+class Recorder(MetricsHook):
+    def __init__(self):
+        self.started = []
+        self.finished = []
+
+    def request_started(self, trace):
+        self.started.append(trace)
+
+    def request_finished(self, trace):
+        self.finished.append(trace)
+
+
+class LatencyHistogramTestCase(unittest.TestCase):
+    def test_buckets_are_contiguous_and_tight(self):
+        previous = -1
+        for micros in list(range(5000)) + [random.randrange(1, 10 ** 10) for _ in range(2000)]:
+            bucket = _bucket(micros)
+            low = _lowest(bucket)
+            self.assertTrue(low <= micros < low + max(1, low / 64.0) + 1)
+            if micros < 5000:
+                self.assertTrue(bucket in (previous, previous + 1))
+                previous = bucket
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for millis in range(1, 1001):
+            histogram.record(millis / 1000.0)
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 1000)
+        self.assertAlmostEqual(summary["mean"], 0.5005)
+        self.assertAlmostEqual(summary["p50"], 0.5, delta=0.5 / 64)
+        self.assertAlmostEqual(summary["p99"], 0.99, delta=0.99 / 64)
+        self.assertEqual(summary["max"], 1.0)
+        self.assertIsNone(LatencyHistogram().percentile(50))
+
+    def test_merge(self):
+        first, second, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for value in (0.001, 0.002, 0.5):
+            first.record(value)
+            both.record(value)
+        for value in (0.0001, 3.0):
+            second.record(value)
+            both.record(value)
+        first.merge(second)
+        self.assertEqual(first.summary(), both.summary())
+
+
+class ClientMetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.host = "127.0.0.1:%d" % self.httpd.server_address[1]
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def client(self, **kwargs):
+        client = CoinSpot(**kwargs)
+        client._pool = PlainPool(self.host)
+        self.addCleanup(client._pool.clear)
+        return client
+
+    def test_phases_bytes_and_in_flight(self):
+        metrics = Metrics()
+        client = self.client(metrics=metrics)
+        for _ in range(3):
+            client.orders("DOGE")
+        stats = metrics.stats()["/api/orders"]
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["errors"], {})
+        body = json.dumps(fixtures.calls()["/api/orders"]).encode("utf-8")
+        self.assertEqual(stats["bytes_in"], 3 * len(body))
+        self.assertGreater(stats["bytes_out"], 3 * len('{"cointype":"DOGE"}'))
+        latency = stats["latency"]
+        # one connection, reused for the later requests
+        self.assertEqual(latency["connect"]["count"], 1)
+        self.assertEqual(latency["tls"]["count"], 1)
+        for phase in ("send", "ttfb", "read", "parse", "total"):
+            self.assertEqual(latency[phase]["count"], 3)
+        self.assertLessEqual(latency["ttfb"]["max"], latency["total"]["max"])
+        self.assertEqual(metrics.in_flight, 0)
+
+    def test_failures_are_counted(self):
+        metrics = Metrics()
+        client = self.client(metrics=metrics)
+        client._pool.request = Mock(side_effect=ConnectionRefusedError(111, "refused"))
+        self.assertRaises(TransportError, client.spot)
+        stats = metrics.stats()["/api/spot"]
+        self.assertEqual(stats["errors"], {"TransportError": 1})
+        self.assertEqual(stats["in_flight"], 0)
+        # a payload that cannot be serialised is never sent or traced
+        self.assertRaises(TypeError, client.buy, "BTC", object(), 100)
+        self.assertEqual(metrics.in_flight, 0)
+        self.assertNotIn("/api/my/buy", metrics.stats())
+
+    def test_hooks_see_every_trace(self):
+        first, second = Recorder(), Recorder()
+        client = self.client(metrics=[first, second])
+        self.assertIsInstance(client._metrics, HookChain)
+        list(client.orderhistory_stream("DOGE"))
+        client.spot()
+        for recorder in (first, second):
+            self.assertEqual([t.path for t in recorder.finished], ["/api/orders/history", "/api/spot"])
+        stream, spot = first.finished
+        self.assertEqual(stream.status, 200)
+        self.assertGreater(stream.bytes_in, 0)
+        self.assertIsNone(stream.read)
+        self.assertIsNone(spot.connect)
+        self.assertIsNotNone(spot.parse)
+
+    def test_disabled_metrics_do_not_trace(self):
+        client = self.client()
+        with patch("coinspot.coinspot.RequestTrace") as trace:
+            client.spot()
+        trace.assert_not_called()
+
+    def test_async_client_traces(self):
+        metrics = Metrics()
+        client = AsyncCoinSpot(metrics=metrics)
+        client._pool = PlainAsyncPool(self.host)
+
+        async def run():
+            async with client:
+                await asyncio.gather(*[client.spot() for _ in range(4)])
+                return [order async for order in client.orderhistory_stream("DOGE")]
+
+        self.assertEqual(len(asyncio.run(run())), 14)
+        stats = metrics.stats()
+        self.assertEqual(stats["/api/spot"]["requests"], 4)
+        self.assertEqual(stats["/api/spot"]["latency"]["ttfb"]["count"], 4)
+        self.assertEqual(stats["/api/orders/history"]["requests"], 1)
+        self.assertEqual(metrics.in_flight, 0)
+
+
+class RedactionTestCase(unittest.TestCase):
+    def test_debug_log_leaves_out_secrets(self):
+        headers = {"key": "abcdef123456", "sign": "deadbeef", "Accept": "text/plain"}
+        safe = redacted(headers)
+        self.assertEqual(safe, {"key": "...3456", "sign": "<redacted>", "Accept": "text/plain"})
+        self.assertEqual(headers["key"], "abcdef123456")
+
+    @patch.dict("os.environ", {"COINSPOT_API_KEY": "abcdef123456", "COINSPOT_SECRET_KEY": "secret"})
+    def test_prepare_request_logs_redacted_headers(self):
+        logger = Mock()
+        client = CoinSpot(pool_size=0, logger=logger)
+        client._debug = True
+        _, headers = client._prepare_request({})
+        logged = logger.debug.call_args[0][0] % logger.debug.call_args[0][1:]
+        self.assertNotIn(headers["sign"], logged)
+        self.assertNotIn("abcdef123456", logged)
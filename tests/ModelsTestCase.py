@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ModelsTestCase.py: Unittests for the parsed response models."""
+
+import json
+import unittest
+from decimal import Decimal
+
+from mock import Mock
+
+from coinspot import CoinSpot
+from coinspot.models import Balance, Order, OrderBook, SpotPrice, parse
+
+import fixtures
+
+
+def raw(path):
+    return json.dumps(fixtures.calls()[path]).encode("utf-8")
+
+
+class ModelsTestCase(unittest.TestCase):
+    def test_parse_spot(self):
+        prices = parse("/api/spot", raw("/api/spot"))
+        self.assertEqual(prices["BTC"], SpotPrice("BTC", Decimal("474.920000")))
+        self.assertEqual(len(prices), 11)
+
+    def test_parse_balances(self):
+        balances = parse("/api/my/balances", raw("/api/my/balances"))
+        self.assertEqual(balances["DOGE"], Balance("DOGE", Decimal(0)))
+
+    def test_parse_orderbook(self):
+        book = parse("/api/orders", raw("/api/orders"))
+        self.assertTrue(isinstance(book, OrderBook))
+        self.assertEqual(book.coin, "DOGE")
+        self.assertEqual(len(book.buyorders), 6)
+        self.assertEqual(book.sellorders[0].rate, Decimal("0.000297"))
+
+    def test_parse_orderhistory(self):
+        orders = parse("/api/orders/history", raw("/api/orders/history"))
+        self.assertEqual(
+            orders[0],
+            Order("DOGE", Decimal(108070), Decimal("0.00036"), Decimal("38.9052"), 1414029447346),
+        )
+        self.assertTrue(all(type(order.total) is Decimal for order in orders))
+        self.assertRaises(AttributeError, setattr, orders[0], "extra", 1)
+
+    def test_errors_and_other_paths_stay_dicts(self):
+        error = parse("/api/orders", b'{"status":"error","message":"bad coin"}')
+        self.assertEqual(error["message"], "bad coin")
+        quote = parse("/api/quote/buy", raw("/api/quote/buy"))
+        self.assertEqual(quote["quote"], Decimal("0.0004"))
+
+    def test_client_returns_models(self):
+        client = CoinSpot(models=True)
+        client._pool = Mock()
+        client._pool.request.return_value = (Mock(status=200), raw("/api/spot"))
+        self.assertEqual(client.spot()["LTC"].price, Decimal("4.891671"))
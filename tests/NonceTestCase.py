@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""NonceTestCase.py: Unittests for the nonce providers."""
+
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mock import patch
+
+from coinspot import CoinSpot, MonotonicNonce, SharedNonce
+from coinspot.nonce import clock
+
+
+def draw(nonce, count):
+    return [nonce() for _ in range(count)]
+
+
+def draw_in_threads(nonce, threads=8, count=500):
+    results = [None] * threads
+
+    def worker(index):
+        results[index] = draw(nonce, count)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+# inherited by forked workers rather than pickled to them
+INHERITED = None
+
+
+def child_draw(count):
+    return draw(INHERITED, count)
+
+
+class NonceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def shared(self, name="counter"):
+        nonce = SharedNonce(os.path.join(self.directory, name))
+        self.addCleanup(nonce.close)
+        return nonce
+
+    def assertUniqueAndOrdered(self, sequences):
+        for sequence in sequences:
+            self.assertEqual(sequence, sorted(set(sequence)))
+        total = sum(len(sequence) for sequence in sequences)
+        self.assertEqual(len(set().union(*sequences)), total)
+
+    def test_monotonic_nonce_starts_at_the_clock(self):
+        before = clock()
+        nonce = MonotonicNonce()
+        self.assertGreaterEqual(nonce(), before)
+        self.assertEqual(MonotonicNonce(start=5)(), 5)
+
+    def test_monotonic_nonce_is_unique_across_threads(self):
+        self.assertUniqueAndOrdered(draw_in_threads(MonotonicNonce()))
+
+    def test_shared_nonce_is_unique_across_threads(self):
+        self.assertUniqueAndOrdered(draw_in_threads(self.shared(), count=200))
+
+    def test_shared_nonce_orders_every_opener(self):
+        first, second = self.shared(), self.shared()
+        values = [first(), second(), first(), second()]
+        self.assertEqual(values, sorted(set(values)))
+
+    def test_shared_nonce_never_goes_back_with_the_clock(self):
+        nonce = self.shared()
+        ahead = clock() + 10 ** 9
+        with patch("coinspot.nonce.clock", return_value=ahead):
+            nonce()
+        self.assertEqual(nonce(), ahead + 1)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_shared_nonce_is_unique_across_processes(self):
+        global INHERITED
+        nonce = INHERITED = self.shared()
+        self.addCleanup(globals().__setitem__, "INHERITED", None)
+        with multiprocessing.get_context("fork").Pool(4) as pool:
+            pending = pool.map_async(child_draw, [200] * 4)
+            sequences = [draw(nonce, 200)] + pending.get()
+        self.assertUniqueAndOrdered(sequences)
+
+    def test_shared_nonce_pickles_as_its_path(self):
+        nonce = self.shared()
+        copy = pickle.loads(pickle.dumps(nonce))
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.path, nonce.path)
+        self.assertLess(nonce(), copy())
+
+    def test_for_key_finds_the_same_file(self):
+        first = SharedNonce.for_key("key", self.directory)
+        second = SharedNonce.for_key("key", self.directory)
+        other = SharedNonce.for_key("other", self.directory)
+        for nonce in (first, second, other):
+            self.addCleanup(nonce.close)
+        self.assertEqual(first.path, second.path)
+        self.assertNotEqual(first.path, other.path)
+
+    @patch.dict("os.environ", {"COINSPOT_API_KEY": "key", "COINSPOT_SECRET_KEY": "secret"})
+    def test_clients_stamp_requests_from_their_provider(self):
+        shared = self.shared()
+        client = CoinSpot(pool_size=0, nonce=shared)
+        body, _ = client._prepare_request({})
+        self.assertLess(json.loads(body.decode("utf-8"))["nonce"], shared())
+        first, second = CoinSpot(pool_size=0), CoinSpot(pool_size=0)
+        self.assertLess(first._nonce(), second._nonce())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""OrderBookTestCase.py: Unittests for the incremental order book tracker."""
+
+import copy
+import json
+import unittest
+
+from mock import Mock
+
+from coinspot import APIError
+from coinspot.models import parse
+from coinspot.orderbook import OrderBookTracker
+
+import fixtures
+
+
+class OrderBookTestCase(unittest.TestCase):
+    def setUp(self):
+        self.book = fixtures.calls()["/api/orders"]
+        self.tracker = OrderBookTracker()
+        self.deltas = []
+        self.tracker.subscribe(self.deltas.append)
+
+    def test_first_poll_adds_every_level(self):
+        deltas = self.tracker.update("DOGE", json.dumps(self.book))
+        self.assertEqual([delta.side for delta in deltas], ["buy", "sell"])
+        # two buy orders share each of the 0.00029 and 0.000285 rates
+        self.assertEqual(len(deltas[0].added), 4)
+        self.assertEqual(deltas[0].added[0], (0.00028, 1000000))
+        self.assertEqual(self.deltas, deltas)
+        levels = self.tracker.book("DOGE")["buy"]
+        self.assertEqual(levels.highest(), (0.000291, 250000))
+        self.assertEqual(list(levels)[1], (0.000285, 400000 + 35087.71929824))
+
+    def test_only_changes_are_published(self):
+        self.tracker.update("DOGE", self.book)
+        book = copy.deepcopy(self.book)
+        book["sellorders"][0]["amount"] = 1
+        del book["sellorders"][3]
+        book["sellorders"].append({"amount": 5, "rate": 0.0004, "total": 0.002, "coin": "DOGE"})
+
+        del self.deltas[:]
+        deltas = self.tracker.update("DOGE", book)
+        self.assertEqual(len(deltas), 1)
+        delta = deltas[0]
+        self.assertEqual(delta.side, "sell")
+        self.assertEqual(delta.changed, [(0.000297, 1)])
+        self.assertEqual(delta.removed, [0.00031])
+        self.assertEqual(delta.added, [(0.0004, 5)])
+        self.assertEqual(self.tracker.book("DOGE")["sell"].highest(), (0.0004, 5))
+
+        self.assertEqual(self.tracker.update("DOGE", book), [])
+        self.assertEqual(len(self.deltas), 1)
+
+    def test_models_and_poll(self):
+        book = parse("/api/orders", json.dumps(self.book))
+        self.assertEqual(len(self.tracker.update("DOGE", book)), 2)
+        client = Mock()
+        client.iter_orders.return_value = [("DOGE", book), ("BAD", IOError())]
+        results = self.tracker.poll(client, ["DOGE", "BAD"])
+        self.assertEqual(results, {"DOGE": []})
+        self.assertEqual(self.tracker.book("BAD"), None)
+
+    def test_error_responses_are_skipped(self):
+        error = b'{"status":"error","message":"invalid coin"}'
+        self.tracker.update("DOGE", self.book)
+        self.assertRaises(APIError, self.tracker.update, "DOGE", error)
+        self.assertEqual(len(self.tracker.book("DOGE")["buy"]), 4)
+        client = Mock()
+        client.iter_orders.return_value = [
+            ("BAD", error),
+            ("DOGE", json.dumps(self.book)),
+            ("WORSE", {"status": "error"}),
+        ]
+        self.assertEqual(self.tracker.poll(client, ["BAD", "DOGE", "WORSE"]), {"DOGE": []})
+        self.assertIsNone(self.tracker.book("BAD"))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""PortfolioTestCase.py: Unittests for valuing balances at spot prices."""
+
+import json
+import unittest
+from decimal import Decimal
+
+from mock import patch
+
+from coinspot import APIError, CoinSpot, Portfolio
+from coinspot import portfolio as portfolio_module
+from coinspot.feed import Update
+from coinspot.models import SpotPrice
+from coinspot.portfolio import value_accounts
+
+from helpers import fixture_transport
+
+
+SPOT = json.dumps({"status": "ok", "spot": [{"btcspot": "50000"}, {"ltcspot": "100.5"}]})
+BALANCES = json.dumps({"status": "ok", "balances": [{"btc": 0.5}, {"ltc": 10}, {"doge": 0}]})
+
+
+class PortfolioTestCase(unittest.TestCase):
+    def setUp(self):
+        self.portfolio = Portfolio()
+        self.portfolio.apply_balances(BALANCES)
+        self.portfolio.apply_spot(SPOT)
+
+    def test_joins_balances_and_prices(self):
+        portfolio = self.portfolio
+        self.assertEqual(portfolio.coins, ["BTC", "LTC", "DOGE"])
+        self.assertEqual(portfolio.total, 26005.0)
+        self.assertEqual(portfolio.values(), {"BTC": 25000.0, "LTC": 1005.0})
+        self.assertEqual(portfolio.value("btc"), 25000.0)
+        self.assertEqual(portfolio.price("LTC"), 100.5)
+        self.assertIsNone(portfolio.price("DOGE"))
+        self.assertAlmostEqual(portfolio.exposure("BTC"), 25000 / 26005.0)
+        self.assertAlmostEqual(sum(portfolio.exposures().values()), 1.0)
+        self.assertEqual(portfolio.as_numpy()["value"].tolist(), [25000.0, 1005.0, 0.0])
+
+    def test_only_changed_coins_are_recomputed(self):
+        portfolio = self.portfolio
+        changed = portfolio.set_prices({"BTC": SpotPrice("BTC", Decimal("60000")), "LTC": 100.5})
+        self.assertEqual(changed, ["BTC"])
+        self.assertEqual(portfolio.total, 31005.0)
+        self.assertEqual(portfolio.set_balances({"DOGE": 1000}), ["DOGE"])
+        self.assertEqual(portfolio.total, 31005.0)
+        self.assertEqual(portfolio.set_prices({"DOGE": 0.25}), ["DOGE"])
+        self.assertEqual(portfolio.total, 31255.0)
+
+        update = Update("spot", None, {"LTC": SpotPrice("LTC", Decimal("200"))}, 0.0)
+        self.assertEqual(portfolio.record(update), ["LTC"])
+        self.assertEqual(portfolio.record(Update("orders", "BTC", None, 0.0)), [])
+        self.assertEqual(portfolio.total, 32250.0)
+
+    def test_running_total_matches_a_full_sum(self):
+        portfolio = Portfolio({"C%d" % i: 0.1 * i for i in range(100)})
+        with patch.object(portfolio_module, "_RESUM", 50):
+            for tick in range(200):
+                portfolio.set_prices({"C%d" % ((tick * 7 + i) % 100): tick * 0.01 + i for i in range(5)})
+        expected = sum(portfolio.balance(c) * (portfolio.price(c) or 0) for c in portfolio.coins)
+        self.assertAlmostEqual(portfolio.total, expected, places=6)
+
+    def test_refresh_and_errors(self):
+        client = CoinSpot(pool_size=0, transport=fixture_transport())
+        portfolio = Portfolio()
+        changed = portfolio.refresh(client)
+        self.assertIn("BTC", changed)
+        self.assertEqual(portfolio.total, 0.0)
+        with self.assertRaises(APIError):
+            portfolio.apply_spot(json.dumps({"status": "error", "message": "down"}))
+
+
+class ValueAccountsTestCase(unittest.TestCase):
+    balances = {
+        "main": BALANCES,
+        "trading": {"BTC": 0.25, "ETH": 2},
+    }
+
+    def check(self, valuation):
+        self.assertEqual(valuation.accounts, ["main", "trading"])
+        self.assertEqual(valuation.coins, ["BTC", "DOGE", "ETH", "LTC"])
+        self.assertEqual(valuation.totals, {"main": 26005.0, "trading": 12500.0})
+        self.assertEqual(
+            valuation.by_coin, {"BTC": 37500.0, "DOGE": 0.0, "ETH": 0.0, "LTC": 1005.0}
+        )
+        self.assertEqual(valuation.total, 38505.0)
+        self.assertAlmostEqual(sum(valuation.exposures().values()), 1.0)
+
+    def test_vectorized(self):
+        self.check(value_accounts(self.balances, SPOT))
+
+    def test_without_numpy(self):
+        with patch.object(portfolio_module, "numpy", None):
+            valuation = value_accounts(self.balances, SPOT)
+        self.check(valuation)
+        self.assertEqual(list(valuation.values[1]), [12500.0, 0.0, 0.0, 0.0])
+
+    def test_failed_account_raises(self):
+        with self.assertRaises(IOError):
+            value_accounts({"main": IOError("down")}, SPOT)
+
+
+if __name__ == "__main__":
+    unittest.main()
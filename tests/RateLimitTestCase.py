@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""RateLimitTestCase.py: Unittests for the request scheduler."""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from mock import Mock
+
+from coinspot import CoinSpot
+from coinspot.ratelimit import PRIORITY_TRADE, RequestScheduler
+
+
+class RateLimitTestCase(unittest.TestCase):
+    def queue(self, scheduler, paths, order):
+        threads = []
+        for path in paths:
+            thread = threading.Thread(
+                target=lambda path=path: order.append((scheduler.acquire(path), path)[1])
+            )
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.01)
+        return threads
+
+    def test_requests_are_paced(self):
+        scheduler = RequestScheduler(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            scheduler.acquire("/api/spot")
+        self.assertTrue(time.monotonic() - start >= 0.09)
+
+    def test_trades_go_ahead_of_polls(self):
+        scheduler = RequestScheduler(rate=20, burst=1)
+        scheduler.acquire("/api/spot")
+        order = []
+        threads = self.queue(
+            scheduler, ["/api/spot", "/api/orders", "/api/my/balances", "/api/my/buy"], order
+        )
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order[0], "/api/my/buy")
+        self.assertEqual(order[1], "/api/my/balances")
+        stats = scheduler.stats()
+        self.assertEqual(stats["waits"]["poll"]["count"], 3)
+        self.assertEqual(stats["waits"]["/api/my/buy"]["count"], 1)
+        self.assertEqual(scheduler.queue_depth, 0)
+
+    def test_cancels_share_the_trade_lane(self):
+        scheduler = RequestScheduler()
+        for path in ("/api/my/buy/cancel", "/api/my/sell/cancel"):
+            self.assertEqual(scheduler.priority(path), PRIORITY_TRADE)
+
+    def test_endpoint_budget_does_not_block_other_endpoints(self):
+        scheduler = RequestScheduler(rate=1000, burst=10, budgets={"/api/spot": (2, 1)})
+        scheduler.acquire("/api/spot")
+        order = []
+        threads = self.queue(scheduler, ["/api/spot", "/api/orders"], order)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["/api/orders", "/api/spot"])
+
+    def test_async_acquire(self):
+        scheduler = RequestScheduler(rate=50, burst=1)
+
+        async def run():
+            return await asyncio.gather(
+                *[scheduler.acquire_async("/api/spot") for _ in range(4)]
+            )
+
+        waited = asyncio.run(run())
+        self.assertEqual(len(waited), 4)
+        self.assertTrue(max(waited) >= 0.05)
+        self.assertEqual(scheduler.stats()["queue_depth"]["poll"], 0)
+
+    def test_client_acquires_before_request(self):
+        scheduler = Mock()
+        client = CoinSpot(scheduler=scheduler)
+        client._pool = Mock()
+        client._pool.request.return_value = (Mock(status=200), b'{"status":"ok"}')
+        client.buy("BTC", 1, 100)
+        scheduler.acquire.assert_called_once_with("/api/my/buy")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ReplayTestCase.py: Unittests for the recording and replay transports."""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from coinspot import AsyncCoinSpot, CoinSpot, HTTPStatusError, TransportError
+from coinspot.models import OrderBook
+from coinspot.replay import (
+    AsyncReplayTransport,
+    Exchange,
+    RecordingTransport,
+    ReplayTransport,
+    from_fixtures,
+    load,
+    request_key,
+)
+
+import fixtures
+from helpers import fixture_transport
+
+
+def body(path):
+    return json.dumps(fixtures.calls()[path]).encode("utf-8")
+
+
+class ReplayTestCase(unittest.TestCase):
+    def test_clients_run_on_fixtures(self):
+        client = CoinSpot(transport=fixture_transport())
+        self.assertEqual(client.spot(), body("/api/spot"))
+        self.assertEqual(len(list(client.orders_stream("DOGE"))), 11)
+        models = CoinSpot(transport=fixture_transport(), models=True)
+        self.assertIsInstance(models.orders("DOGE"), OrderBook)
+
+    def test_async_client_runs_on_fixtures(self):
+        client = AsyncCoinSpot(
+            transport=AsyncReplayTransport(from_fixtures(fixtures.calls()))
+        )
+
+        async def run():
+            async with client:
+                spot = await client.spot()
+                history = [order async for order in client.orderhistory_stream("DOGE", 64)]
+                return spot, history
+
+        spot, history = asyncio.run(run())
+        self.assertEqual(spot, body("/api/spot"))
+        self.assertEqual(len(history), 14)
+
+    def test_requests_match_on_payload_without_nonce(self):
+        exchanges = [
+            Exchange("/api/orders", request_key(b'{"cointype":"BTC"}'), 200, b'{"coin":"BTC"}'),
+            Exchange("/api/orders", request_key(b'{"cointype":"DOGE"}'), 200, b'{"coin":"DOGE"}'),
+        ]
+        client = CoinSpot(transport=ReplayTransport(exchanges))
+        self.assertEqual(client.orders("DOGE"), b'{"coin":"DOGE"}')
+        self.assertEqual(client.orders("BTC"), b'{"coin":"BTC"}')
+        # an unrecorded payload falls back to the path's recordings
+        self.assertIn(client.orders("LTC"), (b'{"coin":"BTC"}', b'{"coin":"DOGE"}'))
+        self.assertIn(b"no recording", client.myorders())
+
+    def test_latency_and_injected_failures(self):
+        client = CoinSpot(transport=fixture_transport(latency=lambda: 0.03))
+        started = time.perf_counter()
+        client.spot()
+        self.assertGreaterEqual(time.perf_counter() - started, 0.03)
+
+        client = CoinSpot(transport=fixture_transport(error_rate=1.0))
+        self.assertRaises(TransportError, client.spot)
+        client = CoinSpot(transport=fixture_transport(status_error_rate=1.0))
+        with self.assertRaises(HTTPStatusError) as caught:
+            client.spot()
+        self.assertEqual(caught.exception.status, 503)
+
+    def test_seeded_runs_repeat(self):
+        def outcomes(seed):
+            client = CoinSpot(transport=fixture_transport(error_rate=0.3, seed=seed))
+            results = []
+            for _ in range(50):
+                try:
+                    client.spot()
+                    results.append(True)
+                except TransportError:
+                    results.append(False)
+            return results
+
+        first = outcomes(7)
+        self.assertEqual(first, outcomes(7))
+        self.assertTrue(0 < first.count(False) < 50)
+
+
+class RecordingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_record_save_and_replay(self):
+        recorder = RecordingTransport(fixture_transport())
+        client = CoinSpot(transport=recorder)
+        client.spot()
+        client.orders("DOGE")
+        list(client.orderhistory_stream("DOGE", chunk_size=100))
+        self.assertEqual(
+            [e.path for e in recorder.exchanges],
+            ["/api/spot", "/api/orders", "/api/orders/history"],
+        )
+        self.assertEqual(recorder.exchanges[1].request, '{"cointype":"DOGE"}')
+        self.assertEqual(recorder.exchanges[2].body, body("/api/orders/history"))
+
+        filename = os.path.join(self.directory, "session.jsonl")
+        recorder.save(filename)
+        replayed = CoinSpot(transport=ReplayTransport(load(filename)))
+        self.assertEqual(replayed.orders("DOGE"), body("/api/orders"))
+
+    def test_binary_bodies_survive_a_round_trip(self):
+        exchange = Exchange("/api/spot", "", 502, b"\xff\xfe", "Bad Gateway")
+        copy = Exchange.from_dict(json.loads(json.dumps(exchange.to_dict())))
+        self.assertEqual((copy.body, copy.status, copy.reason), (b"\xff\xfe", 502, "Bad Gateway"))
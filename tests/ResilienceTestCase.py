@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ResilienceTestCase.py: Unittests for typed errors, retries, circuit breaking and hedging."""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from mock import Mock, patch
+
+from coinspot import (
+    AsyncCoinSpot,
+    CircuitBreaker,
+    CircuitOpenError,
+    CoinSpot,
+    HTTPStatusError,
+    RetryPolicy,
+    TransportError,
+)
+
+OK = b'{"status":"ok"}'
+EMPTY_BOOK = b'{"status":"ok","buyorders":[],"sellorders":[]}'
+
+
+def response(status=200):
+    return Mock(status=status, reason="Reason")
+
+
+def client_with(outcomes, **kwargs):
+    """
+    A client whose pool answers each request with the next of ``outcomes``,
+    an exception to raise or a ``(response, data)`` tuple
+    """
+    client = CoinSpot(**kwargs)
+    client._pool = Mock()
+    client._pool.request.side_effect = outcomes
+    return client
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(attempts=6, base=0.1, cap=0.5)
+        for _ in range(50):
+            delays = list(policy.delays("/api/spot"))
+            self.assertEqual(len(delays), 5)
+            for retry, delay in enumerate(delays):
+                self.assertTrue(0 <= delay <= min(0.5, 0.1 * 2 ** retry))
+
+    def test_only_read_endpoints_are_retried(self):
+        policy = RetryPolicy()
+        self.assertEqual(list(policy.delays("/api/my/buy")), [])
+        self.assertEqual(list(policy.delays("/api/my/coin/send")), [])
+        self.assertEqual(len(list(policy.delays("/api/my/balances"))), 2)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+        for _ in range(2):
+            breaker.before("/api/spot")
+            breaker.failure("/api/spot")
+        breaker.success("/api/spot")
+        for _ in range(3):
+            breaker.before("/api/spot")
+            breaker.failure("/api/spot")
+        self.assertEqual(breaker.state("/api/spot"), "open")
+        with self.assertRaises(CircuitOpenError) as caught:
+            breaker.before("/api/spot")
+        self.assertTrue(0 < caught.exception.retry_after <= 60)
+        breaker.before("/api/orders")
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+        breaker.failure("/api/spot")
+        time.sleep(0.06)
+        self.assertEqual(breaker.state("/api/spot"), "half-open")
+        breaker.before("/api/spot")
+        self.assertRaises(CircuitOpenError, breaker.before, "/api/spot")
+        breaker.failure("/api/spot")
+        self.assertEqual(breaker.state("/api/spot"), "open")
+        time.sleep(0.06)
+        breaker.before("/api/spot")
+        breaker.success("/api/spot")
+        self.assertEqual(breaker.state("/api/spot"), "closed")
+
+    def test_abandoned_trial_is_given_back(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+        breaker.failure("/api/spot")
+        time.sleep(0.06)
+        breaker.before("/api/spot")
+        breaker.abandon("/api/spot")
+        self.assertEqual(breaker.state("/api/spot"), "half-open")
+        breaker.before("/api/spot")
+        self.assertRaises(CircuitOpenError, breaker.before, "/api/spot")
+
+
+@patch("coinspot.coinspot.sleep")
+class ClientResilienceTestCase(unittest.TestCase):
+    def test_connection_errors_raise_instead_of_exiting(self, sleep):
+        client = client_with([ConnectionResetError(104, "Connection reset")])
+        with self.assertRaises(TransportError) as caught:
+            client.spot()
+        self.assertEqual(caught.exception.path, "/api/spot")
+        self.assertIsInstance(caught.exception, IOError)
+
+    def test_server_errors_are_typed(self, sleep):
+        client = client_with([(response(503), b"<html>")])
+        with self.assertRaises(HTTPStatusError) as caught:
+            client.spot()
+        self.assertEqual(caught.exception.status, 503)
+        self.assertEqual(caught.exception.body, b"<html>")
+
+    def test_read_requests_are_retried_with_fresh_nonces(self, sleep):
+        client = client_with(
+            [TimeoutError(), (response(502), b""), (response(), OK)], retry=RetryPolicy()
+        )
+        self.assertEqual(client.spot(), OK)
+        self.assertEqual(sleep.call_count, 2)
+        bodies = [call[0][2] for call in client._pool.request.call_args_list]
+        self.assertEqual(len(set(bodies)), 3)
+
+    def test_orders_are_never_retried(self, sleep):
+        client = client_with([ConnectionResetError(), (response(), OK)], retry=RetryPolicy())
+        self.assertRaises(TransportError, client.buy, "BTC", 1, 100)
+        self.assertEqual(client._pool.request.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_open_circuit_refuses_without_sending(self, sleep):
+        breaker = CircuitBreaker(threshold=2, reset_timeout=60)
+        client = client_with([ConnectionResetError()] * 2, breaker=breaker)
+        for _ in range(2):
+            self.assertRaises(TransportError, client.orders, "BTC")
+        self.assertRaises(CircuitOpenError, client.orders, "BTC")
+        self.assertEqual(client._pool.request.call_count, 2)
+
+    def test_half_open_trial_that_fails_to_parse_reopens(self, sleep):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+        client = client_with(
+            [ConnectionResetError(), (response(), b"<html>"), (response(), EMPTY_BOOK)],
+            breaker=breaker,
+            models=True,
+        )
+        self.assertRaises(TransportError, client.orders, "BTC")
+        time.sleep(0.06)
+        self.assertRaises(ValueError, client.orders, "BTC")
+        self.assertEqual(breaker.state("/api/orders"), "open")
+        time.sleep(0.06)
+        client.orders("BTC")
+        self.assertEqual(breaker.state("/api/orders"), "closed")
+
+    def test_interrupted_half_open_trial_is_not_a_failure(self, sleep):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+        breaker.failure("/api/orders")
+        time.sleep(0.06)
+        client = client_with([KeyboardInterrupt(), (response(), EMPTY_BOOK)], breaker=breaker)
+        self.assertRaises(KeyboardInterrupt, client.orders, "BTC")
+        self.assertEqual(breaker.state("/api/orders"), "half-open")
+        client.orders("BTC")
+        self.assertEqual(breaker.state("/api/orders"), "closed")
+
+    def test_slow_spot_requests_are_hedged(self, sleep):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow_then_fast(method, path, body, headers, trace=None):
+            if not slow_then_fast.calls:
+                slow_then_fast.calls += 1
+                release.wait(5)
+                return response(), b'{"status":"ok","slow":1}'
+            return response(), OK
+
+        slow_then_fast.calls = 0
+        client = client_with(None, hedge_after=0.02)
+        client._pool.request.side_effect = slow_then_fast
+        started = time.monotonic()
+        self.assertEqual(client.spot(), OK)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(client._pool.request.call_count, 2)
+
+
+class AsyncResilienceTestCase(unittest.TestCase):
+    def client(self, request, **kwargs):
+        client = AsyncCoinSpot(**kwargs)
+        client._pool = Mock()
+        client._pool.request = request
+        return client
+
+    def test_transport_errors_are_typed_and_retried(self):
+        outcomes = [asyncio.TimeoutError(), EOFError(), (response(), OK)]
+
+        async def request(method, path, body, headers, trace=None):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        client = self.client(request, retry=RetryPolicy(base=0.001))
+        self.assertEqual(asyncio.run(client.orders("BTC")), OK)
+        outcomes[:] = [ConnectionResetError()]
+        self.assertRaises(TransportError, asyncio.run, client.sell("BTC", 1, 100))
+
+    def test_half_open_trial_that_fails_to_parse_reopens(self):
+        outcomes = [(response(), b"<html>"), (response(), EMPTY_BOOK)]
+
+        async def request(method, path, body, headers, trace=None):
+            return outcomes.pop(0)
+
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+        breaker.failure("/api/orders")
+        time.sleep(0.06)
+        client = self.client(request, breaker=breaker, models=True)
+        self.assertRaises(ValueError, asyncio.run, client.orders("BTC"))
+        self.assertEqual(breaker.state("/api/orders"), "open")
+        time.sleep(0.06)
+        asyncio.run(client.orders("BTC"))
+        self.assertEqual(breaker.state("/api/orders"), "closed")
+
+    def test_cancelled_half_open_trial_is_not_a_failure(self):
+        async def request(method, path, body, headers, trace=None):
+            await asyncio.sleep(5)
+
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+        breaker.failure("/api/orders")
+        time.sleep(0.06)
+        client = self.client(request, breaker=breaker)
+
+        async def cancel():
+            task = asyncio.ensure_future(client.orders("BTC"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(cancel())
+        self.assertEqual(breaker.state("/api/orders"), "half-open")
+        breaker.before("/api/orders")
+
+    def test_hedged_spot_takes_the_first_answer(self):
+        calls = []
+
+        async def request(method, path, body, headers, trace=None):
+            calls.append(path)
+            if len(calls) == 1:
+                await asyncio.sleep(5)
+            return response(), OK
+
+        client = self.client(request, hedge_after=0.02)
+        started = time.monotonic()
+        self.assertEqual(asyncio.run(client.spot()), OK)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(len(calls), 2)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""SigningTestCase.py: Unittests for request serialisation and signing."""
+
+import hashlib
+import hmac
+import json
+import unittest
+
+from mock import patch
+
+from coinspot import CoinSpot
+from coinspot.signing import SigningContext
+
+
+def reference_sign(secret, data):
+    return hmac.new(secret.encode("utf-8"), data, hashlib.sha512).hexdigest()
+
+
+class SigningTestCase(unittest.TestCase):
+    def setUp(self):
+        self.context = SigningContext("key", "secret", "0.3.0")
+
+    def test_prepare_matches_a_freshly_keyed_hmac(self):
+        postdata = {"cointype": "DOGE", "amount": 12.5, "nonce": 1}
+        body, headers = self.context.prepare(postdata)
+        self.assertEqual(body, b'{"cointype":"DOGE","amount":12.5,"nonce":1}')
+        self.assertEqual(headers["sign"], reference_sign("secret", body))
+        self.assertEqual(headers["key"], "key")
+        self.assertEqual(headers["Content-type"], "application/json")
+        self.assertTrue(headers["User-Agent"].startswith("py-coinspot-api/0.3.0 "))
+
+    def test_requests_do_not_share_state(self):
+        first = self.context.prepare({"nonce": 1})[1]
+        second = self.context.prepare({"nonce": 2})[1]
+        self.assertNotEqual(first["sign"], second["sign"])
+        self.assertEqual(first["sign"], reference_sign("secret", b'{"nonce":1}'))
+        self.assertNotIn("sign", self.context._headers)
+
+    def test_sign_accepts_text_and_bytes(self):
+        self.assertEqual(self.context.sign('{"nonce":1}'), self.context.sign(b'{"nonce":1}'))
+
+    def test_non_ascii_payloads_are_signed_as_sent(self):
+        body, headers = self.context.prepare({"address": "adresseé", "nonce": 1})
+        self.assertEqual(headers["sign"], reference_sign("secret", body))
+        self.assertEqual(json.loads(body.decode("utf-8"))["address"], "adresseé")
+
+    @patch.dict("os.environ", {"COINSPOT_API_KEY": "key", "COINSPOT_SECRET_KEY": "secret"})
+    def test_client_rekeys_when_the_secret_changes(self):
+        client = CoinSpot(pool_size=0)
+        signer = client._signing_context()
+        self.assertIs(client._signing_context(), signer)
+        client._api_secret = "rotated"
+        body, headers = client._prepare_request({})
+        self.assertIsNot(client._signing_context(), signer)
+        self.assertEqual(headers["sign"], reference_sign("rotated", body))
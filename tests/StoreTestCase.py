@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""StoreTestCase.py: Unittests for the on-disk tick store."""
+
+import random
+import shutil
+import tempfile
+import unittest
+from array import array
+from datetime import timedelta
+
+from mock import patch
+
+from coinspot import CoinSpot, store
+from coinspot.feed import MarketDataHub
+from coinspot.store import TickStore
+
+import fixtures
+from helpers import fixture_transport
+
+
+def trades(times, rate=1.0):
+    return [
+        {"solddate": t, "rate": rate + i, "amount": 2.0, "total": 2.0 * (rate + i)}
+        for i, t in enumerate(times)
+    ]
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.store = self.open()
+
+    def open(self):
+        opened = TickStore(self.root)
+        self.addCleanup(opened.close)
+        return opened
+
+    def test_overlapping_polls_are_stored_once(self):
+        history = fixtures.calls()["/api/orders/history"]["orders"]
+        self.assertEqual(self.store.append_trades("DOGE", history), len(history))
+        self.assertEqual(self.store.append_trades("DOGE", history), 0)
+        stored = self.store.range("DOGE")
+        self.assertEqual(list(stored.solddate), sorted(t["solddate"] for t in history))
+        self.assertAlmostEqual(stored.volume(), sum(t["amount"] for t in history))
+        self.assertEqual(self.store.coins(), ["DOGE"])
+
+    def test_range_across_index_blocks(self):
+        rng = random.Random(7)
+        times = sorted(rng.randrange(0, 2000) for _ in range(1000))
+        with patch.object(store, "BLOCK", 16):
+            writer = self.open()
+            for start in range(0, len(times), 97):
+                batch = times[start : start + 97]
+                writer._get("BTC", "trades").append(
+                    array("q", batch), [array("d", batch)] * 3
+                )
+            # a separate reader sees the index and columns the writer wrote
+            reader = self.open()
+            for _ in range(200):
+                t0 = rng.randrange(-10, 2010)
+                t1 = t0 + rng.randrange(0, 300)
+                expected = [t for t in times if t0 <= t < t1]
+                self.assertEqual(list(reader.range("BTC", t0, t1).solddate), expected)
+            self.assertEqual(len(reader.range("BTC", 500)), len([t for t in times if t >= 500]))
+
+            writer._get("BTC", "trades").append(array("q", [5000]), [array("d", [1.0])] * 3)
+            self.assertEqual(list(reader.range("BTC", 2000).solddate), [5000])
+
+    def test_index_survives_reopening(self):
+        with patch.object(store, "BLOCK", 4):
+            self.store.append_trades("BTC", trades(range(0, 100, 3)))
+            self.store.close()
+            reopened = self.open()
+            reopened.append_trades("BTC", trades([200, 201, 202]))
+            index = array("q")
+            with open(reopened._get("BTC", "trades")._index_path, "rb") as source:
+                index.frombytes(source.read())
+            self.assertEqual(list(index), list(range(0, 100, 12)) + [202])
+            self.assertEqual(list(reopened.range("BTC", 96, 201).solddate), [96, 99, 200])
+
+    def test_failed_append_does_not_misalign_columns(self):
+        self.store.append_trades("BTC", trades([1, 2]))
+        series = self.store._get("BTC", "trades")
+        # a crash after writing some value columns but not the time column
+        series.columns[0].append(array("d", [99.0]))
+        series.columns[1].append(array("d", [99.0, 99.0]))
+        self.assertEqual(len(series), 2)
+        self.store.append_trades("BTC", trades([3], rate=7.0))
+        self.assertEqual([len(column) for column in series.columns], [3, 3, 3])
+        stored = self.open().range("BTC")
+        self.assertEqual(list(stored.solddate), [1, 2, 3])
+        self.assertEqual(list(stored.rate), [1.0, 2.0, 7.0])
+        self.assertEqual(list(stored.amount), [2.0, 2.0, 2.0])
+
+    def test_ohlcv(self):
+        self.store.append_trades("BTC", trades([0, 5, 9, 10, 31, 35], rate=10.0))
+        for numpy in (store.numpy, None):
+            with patch.object(store, "numpy", numpy):
+                bars = self.store.ohlcv("BTC", 10)
+                self.assertEqual(
+                    list(bars),
+                    [
+                        (0, 10.0, 12.0, 10.0, 12.0, 6.0),
+                        (10, 13.0, 13.0, 13.0, 13.0, 2.0),
+                        (30, 14.0, 15.0, 14.0, 15.0, 4.0),
+                    ],
+                )
+                self.assertEqual(len(self.store.ohlcv("BTC", 10, 10, 31)), 1)
+        self.assertRaises(ValueError, self.store.ohlcv, "BTC", 0)
+
+    def test_spot_history(self):
+        self.store.append_spot({"BTC": 100.0, "DOGE": 0.1}, 1000)
+        self.store.append_spot({"BTC": 110.0}, 2000.0)
+        # a clock set back is skipped rather than stored out of order
+        self.store.append_spot({"BTC": 90.0}, 1500)
+        spot = self.store.range("BTC", kind="spot")
+        self.assertEqual((list(spot.time), list(spot.price)), ([1000, 2000], [100.0, 110.0]))
+        bars = self.store.ohlcv("BTC", timedelta(seconds=5), kind="spot")
+        self.assertEqual(list(bars), [(0, 100.0, 110.0, 100.0, 110.0, 0.0)])
+        # a number is always milliseconds, whatever its type
+        self.assertEqual(len(self.store.ohlcv("BTC", 60.0, kind="spot")), 2)
+
+    def test_poll_and_hub_updates(self):
+        client = CoinSpot(transport=fixture_transport())
+        self.store.poll(client, ["DOGE"])
+        self.assertEqual(len(self.store.range("DOGE", kind="spot")), 1)
+        self.assertEqual(len(self.store.range("DOGE")), 14)
+
+        hub = MarketDataHub(client, ["LTC"], orders_interval=None, history_interval=1)
+        subscription = hub.subscribe()
+        hub.poll_due()
+        for update in iter(lambda: subscription.get(0), None):
+            self.store.record(update)
+        self.assertEqual(len(self.store.range("LTC", kind="spot")), 2)
+        self.assertEqual(len(self.store.range("LTC")), 14)
+
+    def test_rejects_bad_input(self):
+        self.assertRaises(ValueError, self.store.range, "../etc")
+        series = self.store._get("BTC", "trades")
+        series.append(array("q", [10]), [array("d", [1.0])] * 3)
+        self.assertRaises(ValueError, series.append, array("q", [5]), [array("d", [1.0])] * 3)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ThreadSafetyTestCase.py: Unittests for sharing one client across threads."""
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from mock import patch
+
+from coinspot import CoinSpot, ResponseCache, RetryPolicy
+from coinspot.metrics import Metrics
+
+from helpers import fixture_transport
+
+
+class NonceCapture:
+    """Passes requests through and keeps the nonce of each."""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.nonces = []
+
+    def request(self, method, path, body=None, headers=None, trace=None):
+        self.nonces.append(json.loads(body)["nonce"])
+        return self.transport.request(method, path, body, headers, trace=trace)
+
+    def clear(self):
+        pass
+
+
+class ThreadSafetyTestCase(unittest.TestCase):
+    def test_one_client_many_threads(self):
+        transport = NonceCapture(fixture_transport())
+        metrics = Metrics()
+        client = CoinSpot(
+            transport=transport,
+            cache=ResponseCache(ttls={"/api/spot": 0.001}),
+            retry=RetryPolicy(base=0),
+            metrics=metrics,
+        )
+        calls = ["spot", ("orders", "DOGE"), "balances", ("quotebuy", "DOGE", 1)] * 200
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(
+                executor.map(lambda call: client.map_requests([call], max_workers=1)[0], calls)
+            )
+
+        for call, result in zip(calls, results):
+            self.assertNotIsInstance(result, Exception)
+            self.assertEqual(json.loads(result)["status"], "ok")
+        self.assertEqual(len(set(transport.nonces)), len(transport.nonces))
+        self.assertEqual(metrics.in_flight, 0)
+        self.assertEqual(
+            sum(stats["requests"] for stats in metrics.stats().values()), len(transport.nonces)
+        )
+
+
+class LoggingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.logger = logging.getLogger("coinspot.test.%s" % id(self))
+        self.addCleanup(self.close_handlers)
+
+    def close_handlers(self):
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+
+    def client(self):
+        client = CoinSpot(transport=fixture_transport(), logger=self.logger)
+        client._debug = True
+        client._logging = "coinspot.log"
+        return client
+
+    def test_debug_log_is_per_client_and_timestamped(self):
+        root_handlers = list(logging.getLogger().handlers)
+        with patch("sys.argv", [os.path.join(self.directory, "script.py")]):
+            first, second = self.client(), self.client()
+            first.start_logging()
+            second.start_logging()
+        self.assertEqual(logging.getLogger().handlers, root_handlers)
+        self.assertEqual(len(self.logger.handlers), 1)
+        self.assertIsNot(CoinSpot(transport=fixture_transport()).logger, self.logger)
+
+        first.spot()
+        second.orders("DOGE")
+        with open(os.path.join(self.directory, "coinspot.log")) as log:
+            # the response headers end in a blank line of their own
+            lines = [line for line in log.read().splitlines() if line]
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r"^\d\d/\d\d/\d{4} \d\d:\d\d:\d\d ")
+        self.assertTrue(any(re.search(r"'sign': '<redacted>'", line) for line in lines))
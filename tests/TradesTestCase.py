@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""TradesTestCase.py: Unittests for the de-duplicating trade stream."""
+
+import itertools
+import json
+import unittest
+
+from mock import patch
+
+from coinspot import CoinSpot
+from coinspot.trades import TradeDeduplicator
+
+import fixtures
+
+
+def trade(solddate, amount=1, rate=0.1):
+    return {"amount": amount, "rate": rate, "total": amount * rate, "coin": "DOGE", "solddate": solddate}
+
+
+def window(end, size=10):
+    return [trade(solddate) for solddate in range(end, end - size, -1)]
+
+
+class TradesTestCase(unittest.TestCase):
+    def test_overlapping_polls_yield_only_new_trades(self):
+        orders = fixtures.calls()["/api/orders/history"]["orders"]
+        trades = TradeDeduplicator()
+        first = trades.new_trades("DOGE", orders)
+        self.assertEqual(len(first), len(orders))
+        self.assertEqual(first[0]["solddate"], 1413944359771)
+
+        newer = [trade(1414029447347), trade(1414029447346, amount=5)]
+        second = trades.new_trades("DOGE", newer + orders[:-2])
+        self.assertEqual(second, sorted(newer, key=lambda t: t["solddate"]))
+        self.assertEqual(trades.new_trades("DOGE", orders), [])
+        self.assertEqual(len(trades.new_trades("LTC", orders)), len(orders))
+
+    def test_memory_is_bounded(self):
+        trades = TradeDeduplicator(maxlen=15)
+        seen = []
+        for end in range(10, 200, 3):
+            seen.extend(trades.new_trades("DOGE", window(end)))
+            self.assertTrue(len(trades._seen["DOGE"]) <= 15)
+        solddates = [t["solddate"] for t in seen]
+        self.assertEqual(solddates, list(range(1, 200)))
+
+    @patch("coinspot.CoinSpot._request")
+    def test_iter_trades(self, get):
+        polls = iter(
+            [
+                {"status": "ok", "orders": window(10)},
+                {"status": "ok", "orders": window(12)},
+                {"status": "error", "message": "try again"},
+                {"status": "ok", "orders": window(15)},
+            ]
+        )
+        get.side_effect = lambda path, postdata: json.dumps(next(polls))
+        client = CoinSpot()
+        stream = client.iter_trades(["DOGE"], interval=0)
+        trades = list(itertools.islice(stream, 15))
+        self.assertEqual([t["solddate"] for coin, t in trades], list(range(1, 16)))
+        self.assertEqual(get.call_count, 4)
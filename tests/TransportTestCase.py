@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""TransportTestCase.py: Unittests for the keep-alive connection pool."""
+
+import asyncio
+import http.client
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mock import AsyncMock, Mock
+
+from coinspot.transport import STALE_ERRORS, AsyncConnectionPool, ConnectionPool, _AsyncConnection
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    drop_after_response = False
+    # echo each request body back, and say Connection: close after this many
+    echo = False
+    close_after = None
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        type(self).connections += 1
+        self.served = 0
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"status":"ok"}'
+        if self.echo:
+            body = b'{"status":"ok","request":' + request + b"}"
+        self.served += 1
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if self.served == self.close_after:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+        # hang up without telling the client, like an idle keep-alive reaper
+        if self.drop_after_response:
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PlainPool(ConnectionPool):
+    def _new_connection(self):
+        return http.client.HTTPConnection(self.host)
+
+
+class PlainAsyncPool(AsyncConnectionPool):
+    async def _new_connection(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return _AsyncConnection(reader, writer)
+
+
+def plain_pool(testcase, *args, **kwargs):
+    pool = PlainPool(*args, **kwargs)
+    testcase.addCleanup(pool.clear)
+    return pool
+
+
+class TransportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.handler = type("CountingHandler", (Handler,), {})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.host = "127.0.0.1:%d" % self.httpd.server_address[1]
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_connection_is_reused(self):
+        pool = plain_pool(self, self.host, maxsize=2)
+        for _ in range(5):
+            response, data = pool.request("POST", "/api/spot", "{}")
+            self.assertEqual(data, b'{"status":"ok"}')
+        self.assertEqual(self.handler.connections, 1)
+        self.assertEqual(len(pool), 1)
+
+    def test_zero_size_pool_closes_every_connection(self):
+        pool = plain_pool(self, self.host, maxsize=0)
+        for _ in range(3):
+            pool.request("POST", "/api/spot", "{}")
+        self.assertEqual(self.handler.connections, 3)
+        self.assertEqual(len(pool), 0)
+
+    def test_idle_connections_expire(self):
+        pool = plain_pool(self, self.host, idle_timeout=0)
+        pool.request("POST", "/api/spot", "{}")
+        pool.request("POST", "/api/spot", "{}")
+        self.assertEqual(self.handler.connections, 2)
+
+    def test_stale_connection_reconnects(self):
+        self.handler.drop_after_response = True
+        pool = plain_pool(self, self.host)
+        pool.request("POST", "/api/spot", "{}")
+        response, data = pool.request("POST", "/api/spot", "{}")
+        self.assertEqual(data, b'{"status":"ok"}')
+        self.assertEqual(self.handler.connections, 2)
+
+    def test_orders_are_not_resent_once_written(self):
+        pool = plain_pool(self, self.host)
+        for path, resent in (("/api/my/buy", False), ("/api/spot", True)):
+            stale = Mock(sock=object())
+            stale.getresponse.side_effect = http.client.RemoteDisconnected()
+            pool._idle.append((stale, time.monotonic()))
+            if resent:
+                self.assertEqual(pool.request("POST", path, "{}")[1], b'{"status":"ok"}')
+            else:
+                # the server may have placed the order before the connection dropped
+                self.assertRaises(STALE_ERRORS, pool.request, "POST", path, "{}")
+            stale.request.assert_called_once_with("POST", path, "{}", {})
+        self.assertEqual(self.handler.connections, 1)
+
+    def test_orders_are_resent_if_never_written(self):
+        pool = plain_pool(self, self.host)
+        stale = Mock(sock=object())
+        stale.request.side_effect = BrokenPipeError()
+        pool._idle.append((stale, time.monotonic()))
+        response, data = pool.request("POST", "/api/my/buy", "{}")
+        self.assertEqual(data, b'{"status":"ok"}')
+        stale.close.assert_called_with()
+
+    def test_async_orders_are_not_resent_once_written(self):
+        def stale():
+            reader = Mock(readline=AsyncMock(return_value=b""))
+            reader.at_eof.return_value = False
+            writer = Mock(drain=AsyncMock())
+            writer.is_closing.return_value = False
+            return _AsyncConnection(reader, writer)
+
+        async def run():
+            pool = PlainAsyncPool(self.host)
+            try:
+                pool._idle.append((stale(), time.monotonic()))
+                with self.assertRaises(STALE_ERRORS):
+                    await pool.request("POST", "/api/my/buy", "{}")
+                # a read-only request is sent again over a new connection
+                pool._idle.append((stale(), time.monotonic()))
+                response, data = await pool.request("POST", "/api/spot", "{}")
+                self.assertEqual(data, b'{"status":"ok"}')
+            finally:
+                pool.clear()
+
+        asyncio.run(run())
+        self.assertEqual(self.handler.connections, 1)
+
+    def test_pipelined_responses_come_back_in_order(self):
+        self.handler.echo = True
+        pool = plain_pool(self, self.host)
+        with pool.pipeline() as pipeline:
+            for i in range(5):
+                pipeline.send("POST", "/api/my/buy", json.dumps({"leg": i}), {})
+            self.assertEqual(pipeline.outstanding, 5)
+            legs = [json.loads(pipeline.receive()[1])["request"]["leg"] for _ in range(5)]
+        self.assertEqual(legs, list(range(5)))
+        self.assertEqual(self.handler.connections, 1)
+        # the connection is pooled once every response has been read
+        self.assertEqual(len(pool), 1)
+
+    def test_pipeline_stops_when_the_server_closes(self):
+        self.handler.close_after = 2
+        pool = plain_pool(self, self.host)
+        with pool.pipeline() as pipeline:
+            for i in range(4):
+                pipeline.send("POST", "/api/my/buy", "{}", {})
+            pipeline.receive()
+            self.assertFalse(pipeline.closed)
+            pipeline.receive()
+            self.assertTrue(pipeline.closed)
+        self.assertEqual(len(pool), 0)
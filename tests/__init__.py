@@ -9,10 +9,74 @@ __source__ = 'http://github.com/geekpete/py-coinspot-api/coinspot.py'
 """__init__.py: Init for unit testing this module."""
 
 from CoinSpotTestCase import CoinSpotTestCase
+from TransportTestCase import TransportTestCase
+from AsyncCoinSpotTestCase import AsyncCoinSpotTestCase
+from BatchTestCase import BatchTestCase
+from RateLimitTestCase import RateLimitTestCase
+from CacheTestCase import CacheTestCase
+from ModelsTestCase import ModelsTestCase
+from ColumnarTestCase import ColumnarTestCase
+from OrderBookTestCase import OrderBookTestCase
+from TradesTestCase import TradesTestCase
+from JsonStreamTestCase import JsonStreamTestCase, ClientStreamTestCase
+from SigningTestCase import SigningTestCase
+from NonceTestCase import NonceTestCase
+from ResilienceTestCase import (
+    RetryPolicyTestCase,
+    CircuitBreakerTestCase,
+    ClientResilienceTestCase,
+    AsyncResilienceTestCase,
+)
+from MetricsTestCase import LatencyHistogramTestCase, ClientMetricsTestCase, RedactionTestCase
+from ReplayTestCase import ReplayTestCase, RecordingTestCase
+from FeedTestCase import SubscriptionTestCase, MarketDataHubTestCase, FeedServerTestCase
+from BoardTestCase import BoardTestCase
+from StoreTestCase import StoreTestCase
+from ThreadSafetyTestCase import ThreadSafetyTestCase, LoggingTestCase
+from ImportTestCase import ImportTestCase, ConfigTestCase
+from AccountsTestCase import CoinSpotPoolTestCase
+from PortfolioTestCase import PortfolioTestCase, ValueAccountsTestCase
+from BulkTestCase import BulkOrdersTestCase, PipelinedServerTestCase
 import unittest
 
 
 def all_tests():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(CoinSpotTestCase))
+    suite.addTest(unittest.makeSuite(TransportTestCase))
+    suite.addTest(unittest.makeSuite(AsyncCoinSpotTestCase))
+    suite.addTest(unittest.makeSuite(BatchTestCase))
+    suite.addTest(unittest.makeSuite(RateLimitTestCase))
+    suite.addTest(unittest.makeSuite(CacheTestCase))
+    suite.addTest(unittest.makeSuite(ModelsTestCase))
+    suite.addTest(unittest.makeSuite(ColumnarTestCase))
+    suite.addTest(unittest.makeSuite(OrderBookTestCase))
+    suite.addTest(unittest.makeSuite(TradesTestCase))
+    suite.addTest(unittest.makeSuite(JsonStreamTestCase))
+    suite.addTest(unittest.makeSuite(ClientStreamTestCase))
+    suite.addTest(unittest.makeSuite(SigningTestCase))
+    suite.addTest(unittest.makeSuite(NonceTestCase))
+    suite.addTest(unittest.makeSuite(RetryPolicyTestCase))
+    suite.addTest(unittest.makeSuite(CircuitBreakerTestCase))
+    suite.addTest(unittest.makeSuite(ClientResilienceTestCase))
+    suite.addTest(unittest.makeSuite(AsyncResilienceTestCase))
+    suite.addTest(unittest.makeSuite(LatencyHistogramTestCase))
+    suite.addTest(unittest.makeSuite(ClientMetricsTestCase))
+    suite.addTest(unittest.makeSuite(RedactionTestCase))
+    suite.addTest(unittest.makeSuite(ReplayTestCase))
+    suite.addTest(unittest.makeSuite(RecordingTestCase))
+    suite.addTest(unittest.makeSuite(SubscriptionTestCase))
+    suite.addTest(unittest.makeSuite(MarketDataHubTestCase))
+    suite.addTest(unittest.makeSuite(FeedServerTestCase))
+    suite.addTest(unittest.makeSuite(BoardTestCase))
+    suite.addTest(unittest.makeSuite(StoreTestCase))
+    suite.addTest(unittest.makeSuite(ThreadSafetyTestCase))
+    suite.addTest(unittest.makeSuite(LoggingTestCase))
+    suite.addTest(unittest.makeSuite(ImportTestCase))
+    suite.addTest(unittest.makeSuite(ConfigTestCase))
+    suite.addTest(unittest.makeSuite(CoinSpotPoolTestCase))
+    suite.addTest(unittest.makeSuite(PortfolioTestCase))
+    suite.addTest(unittest.makeSuite(ValueAccountsTestCase))
+    suite.addTest(unittest.makeSuite(BulkOrdersTestCase))
+    suite.addTest(unittest.makeSuite(PipelinedServerTestCase))
     return suite
@@ -48,6 +48,24 @@ def calls():
                 {"ftc": 0}
             ]
         },
+        '/api/orders': {
+            "status": "ok",
+            "buyorders": [
+                {"amount":250000,"rate":0.000291,"total":72.75,"coin":"DOGE"},
+                {"amount":100000,"rate":0.00029,"total":29,"coin":"DOGE"},
+                {"amount":58620.68965517,"rate":0.00029,"total":17,"coin":"DOGE"},
+                {"amount":400000,"rate":0.000285,"total":114,"coin":"DOGE"},
+                {"amount":35087.71929824,"rate":0.000285,"total":10,"coin":"DOGE"},
+                {"amount":1000000,"rate":0.00028,"total":280,"coin":"DOGE"}
+            ],
+            "sellorders": [
+                {"amount":25000,"rate":0.000297,"total":7.425,"coin":"DOGE"},
+                {"amount":132441.2,"rate":0.000298,"total":39.467478,"coin":"DOGE"},
+                {"amount":50000,"rate":0.0003,"total":15,"coin":"DOGE"},
+                {"amount":300000,"rate":0.00031,"total":93,"coin":"DOGE"},
+                {"amount":12000,"rate":0.000319,"total":3.828,"coin":"DOGE"}
+            ]
+        },
         '/api/orders/history': {
             "status": "ok",
             "orders": [
@@ -17,3 +17,9 @@ def mock_api_request(path=None, *args, **kwargs):
     resp.content = json.dumps(data)
     resp.headers = kwargs.get('headers')
     return resp
+
+
+def fixture_transport(**kwargs):
+    """A ReplayTransport answering every path with its fixture."""
+    from coinspot.replay import ReplayTransport, from_fixtures
+    return ReplayTransport(from_fixtures(fixtures.calls()), **kwargs)